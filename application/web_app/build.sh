@@ -20,4 +20,8 @@ python manage.py migrate --noinput
 
 # Collect static files
 echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear
\ No newline at end of file
+python manage.py collectstatic --noinput --clear
+
+# Build the static question packs for quick play
+echo "Building question packs..."
+python manage.py build_question_packs
@@ -0,0 +1,176 @@
+"""
+Daily activity.
+
+DailyActivity holds, per player and day, how many questions they completed
+and how much XP they earned, along with the streak of consecutive active days
+ending that day. xp.award_xp() adds to the day's row as first completions pay
+out; rebuild_activity() (`python manage.py backfill_activity`) recomputes every
+row in bulk from QuestionProgress and the XP ledger, a batch of players at a
+time.
+
+The dashboard's streak, activity heatmap and XP chart come from
+activity_summary(), which reads a few weeks of one player's rows through the
+(user, day) key and nothing else.
+"""
+import heapq
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Cap_Ace_User, DailyActivity, QuestionProgress, XPAward
+
+HEATMAP_WEEKS = 12
+
+# Questions completed in a day from which a heatmap cell gets each shade darker
+HEATMAP_LEVELS = (1, 3, 6, 10)
+
+
+def record_activity(user, completed: int, xp: int, day: Optional[date] = None) -> None:
+    """
+    Add to the player's row of the day: one UPDATE, or one INSERT for the
+    day's first activity, which carries the streak on from the day before.
+
+    Callers hold the player's row lock (xp.award_xp()), so no other request
+    inserts the same day's row meanwhile.
+    """
+    day = day or timezone.localdate()
+    updated = DailyActivity.objects.filter(user=user, day=day).update(
+        completed=F('completed') + completed, xp=F('xp') + xp
+    )
+    if not updated:
+        yesterday = DailyActivity.objects.filter(user=user, day=day - timedelta(days=1)).values('streak')[:1]
+        DailyActivity.objects.bulk_create([DailyActivity(
+            user=user, day=day, completed=completed, xp=xp,
+            streak=Coalesce(Subquery(yesterday), Value(0)) + 1,
+        )])
+
+
+def _merged_days(progress, awards) -> Iterator[Tuple[int, date, int, int]]:
+    """(user id, day, completed, xp) from two (user id, day, value) streams sorted by user and day."""
+    completions = ((user_id, day, count, 0) for user_id, day, count in progress)
+    earnings = ((user_id, day, 0, xp) for user_id, day, xp in awards)
+    current = None
+    for user_id, day, completed, xp in heapq.merge(completions, earnings, key=lambda row: (row[0], row[1])):
+        if current and current[:2] == (user_id, day):
+            current = (user_id, day, current[2] + completed, current[3] + xp)
+            continue
+        if current:
+            yield current
+        current = (user_id, day, completed, xp)
+    if current:
+        yield current
+
+
+def rebuild_activity(batch_size: int = 1000) -> int:
+    """
+    Recompute every player's daily rows from QuestionProgress.completed_at and
+    the XP ledger.
+
+    Players are rebuilt batch_size at a time in id order, each batch in its
+    own transaction: their user rows are locked, their daily rows deleted and
+    written again from one grouped aggregate over each source for their id
+    range, merged in (user, day) order. Awards take the same lock
+    (xp.award_xp()), so an award waits for at most its player's batch instead
+    of the whole rebuild, and memory is bounded by one batch's rows.
+
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            user_ids = list(
+                Cap_Ace_User.objects.select_for_update().filter(id__gt=last_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                return written
+            written += _rebuild_users(user_ids[0], user_ids[-1])
+        last_id = user_ids[-1]
+
+
+def _rebuild_users(first_id: int, last_id: int) -> int:
+    """Rebuild the daily rows of the players with ids in [first_id, last_id]."""
+    progress = (
+        QuestionProgress.objects
+        .filter(user_id__gte=first_id, user_id__lte=last_id, completed_at__isnull=False)
+        .annotate(day=TruncDate('completed_at'))
+        .values_list('user_id', 'day')
+        .annotate(count=Count('id'))
+        .order_by('user_id', 'day')
+    )
+    awards = (
+        XPAward.objects
+        .filter(user_id__gte=first_id, user_id__lte=last_id)
+        .annotate(day=TruncDate('awarded_at'))
+        .values_list('user_id', 'day')
+        .annotate(total=Sum('xp'))
+        .order_by('user_id', 'day')
+    )
+
+    rows = []
+    previous = None
+    for user_id, day, completed, xp in _merged_days(progress, awards):
+        consecutive = previous and previous.user_id == user_id and previous.day == day - timedelta(days=1)
+        previous = DailyActivity(user_id=user_id, day=day, completed=completed, xp=xp,
+                                 streak=previous.streak + 1 if consecutive else 1)
+        rows.append(previous)
+    DailyActivity.objects.filter(user_id__gte=first_id, user_id__lte=last_id).delete()
+    DailyActivity.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _heatmap_level(completed: int) -> int:
+    return sum(completed >= threshold for threshold in HEATMAP_LEVELS)
+
+
+def activity_summary(user, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    The player's current streak, a heatmap of the last HEATMAP_WEEKS weeks
+    (one column per week, Monday first) and their XP at the end of each of
+    those days, from one query.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=today.weekday() + 7 * (HEATMAP_WEEKS - 1))
+    days = {
+        row.day: row
+        for row in DailyActivity.objects.filter(user=user, day__gte=start, day__lte=today).only(
+            'day', 'completed', 'xp', 'streak'
+        )
+    }
+
+    latest = days.get(today) or days.get(today - timedelta(days=1))
+    weeks = []
+    for week in range(HEATMAP_WEEKS):
+        cells = []
+        for weekday in range(7):
+            day = start + timedelta(days=7 * week + weekday)
+            completed = days[day].completed if day in days else 0
+            cells.append({
+                'day': day,
+                'completed': completed,
+                'level': _heatmap_level(completed),
+                'future': day > today,
+            })
+        weeks.append(cells)
+
+    # XP before the window: the total less what was earned within it
+    xp = max(user.total_xp - sum(row.xp for row in days.values()), 0)
+    labels, totals = [], []
+    for offset in range((today - start).days + 1):
+        day = start + timedelta(days=offset)
+        xp += days[day].xp if day in days else 0
+        labels.append(day.isoformat())
+        totals.append(xp)
+
+    return {
+        'streak': latest.streak if latest else 0,
+        'active_days': len(days),
+        'heatmap': weeks,
+        'xp_chart': {'labels': labels, 'totals': totals},
+    }
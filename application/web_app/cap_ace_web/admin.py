@@ -2,9 +2,10 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import MultipleChoice, MultipleChoiceDistractor, BudgetSimulation, Expense, FlashCard, MatchAndDrag, TermsAndDefinitions, FillInTheBlank
+from .models import MultipleChoice, MultipleChoiceDistractor, BudgetSimulation, Expense, FlashCard, MatchAndDrag, TermsAndDefinitions, FillInTheBlank, Question
 from django.core.exceptions import ValidationError
 from django.forms.models import BaseInlineFormSet
+from django.db.models import Sum, Q
 from decimal import Decimal
 
 User = get_user_model()
@@ -177,11 +178,18 @@ class BudgetSimulationAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Annotate the essential expense total so the changelist doesn't query once per row"""
+        return super().get_queryset(request).annotate(
+            essential_total=Sum('expenses__amount', filter=Q(expenses__essential=True))
+        )
+
     def essential_expenses_sum(self, obj):
         """Calculate and display the sum of all essential expenses"""
-        total = sum(expense.amount for expense in obj.expenses.filter(essential=True))
+        total = obj.essential_total or Decimal('0.00')
         return f"${total:.2f}"
     essential_expenses_sum.short_description = "Essential Expenses"
+    essential_expenses_sum.admin_order_field = 'essential_total'
     
     def save_related(self, request, form, formsets, change):
         """
@@ -233,9 +241,20 @@ class MatchAndDragAdmin(admin.ModelAdmin):
 
 
 
+class QuestionAdmin(admin.ModelAdmin):
+    # Rows follow the question tables; only the active flag is edited here
+    list_display = ('__str__', 'category', 'difficulty', 'is_active')
+    list_filter = ('question_type', 'category', 'difficulty', 'is_active')
+    list_editable = ('is_active',)
+    readonly_fields = ('question_type', 'object_id', 'category', 'difficulty')
+
+    def has_add_permission(self, request):
+        return False
+
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(MultipleChoice, MultipleChoiceAdmin)
 admin.site.register(BudgetSimulation, BudgetSimulationAdmin)
 admin.site.register(FlashCard, FlashCardAdmin)
 admin.site.register(MatchAndDrag, MatchAndDragAdmin)
-admin.site.register(FillInTheBlank, FillInTheBlankAdmin)
\ No newline at end of file
+admin.site.register(FillInTheBlank, FillInTheBlankAdmin)
+admin.site.register(Question, QuestionAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CapAceWebConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cap_ace_web'
+
+    def ready(self):
+        from .signals import connect_signals
+        connect_signals()
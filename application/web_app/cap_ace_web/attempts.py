@@ -0,0 +1,256 @@
+"""
+Answer attempt log.
+
+Every answer to a game question, right or wrong, is recorded as an
+AnswerAttempt. Attempts are collected in an in-process buffer and written with
+one bulk INSERT, so a request that grades several answers (a quiz) and
+requests answered at the same time by other threads share it. The buffer is
+written once ATTEMPT_BUFFER_SIZE are waiting or, checked on every request, the
+oldest has waited ATTEMPT_BUFFER_SECONDS; most answers add no query at all.
+
+Answers that pay out XP skip the buffer: xp.award_xp() writes them with its
+own transaction (write_attempts()), where the INSERT adds no extra commit.
+
+Serverless instances may be frozen or recycled between requests without
+running atexit, losing what is still buffered. Deployments that can't accept
+that set ATTEMPT_FLUSH_EACH_REQUEST, and AttemptFlushMiddleware then writes
+the buffer before every response goes out.
+
+A batch the database can't take right now (connection errors, or another
+thread of the process still busy writing the previous batch when answering)
+is appended to the spill file at ATTEMPT_SPILL_PATH, and written along with
+the next batch that gets through. The file lives on the machine (or
+serverless instance) that wrote it unless ATTEMPT_SPILL_PATH is on shared
+storage. A batch the database rejects is written again row by row, so only
+the rows at fault are dropped.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from .models import AnswerAttempt, Question
+
+logger = logging.getLogger(__name__)
+
+# Latencies above this are a player who walked away, not time spent answering
+MAX_LATENCY_MS = 60 * 60 * 1000
+
+# Columns of the attempt log's INSERT, the id is left to the database
+INSERT_FIELDS = [field for field in AnswerAttempt._meta.concrete_fields if not field.primary_key]
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_buffer: List[Dict[str, Any]] = []
+_oldest: Optional[float] = None
+
+
+def answer_latency(request) -> Optional[int]:
+    """Milliseconds the player took to answer, as measured by the game page, if it sent one."""
+    try:
+        latency = int(request.POST.get('latency_ms', ''))
+    except ValueError:
+        return None
+    return latency if 0 <= latency <= MAX_LATENCY_MS else None
+
+
+def record_attempt(user, question_type: str, question_id, answer, is_correct: bool,
+                   latency_ms: Optional[int] = None) -> None:
+    """Queue one attempt, writing the buffer if it is full or old enough."""
+    record_attempts(user, [(question_type, question_id, answer, is_correct, latency_ms)])
+
+
+def record_attempts(user, attempts: Iterable[Tuple[str, Any, Any, bool, Optional[int]]]) -> None:
+    """
+    Queue several attempts of one player, each (type, id, answer, is_correct,
+    latency_ms), checking the thresholds once for all of them.
+    """
+    global _oldest
+    queued = _rows(user, attempts)
+    if not queued:
+        return
+    with _lock:
+        _buffer.extend(queued)
+        if _oldest is None:
+            _oldest = time.monotonic()
+        due = _due()
+    if due:
+        flush()
+
+
+def write_attempts(user, attempts: Iterable[Tuple[str, Any, Any, bool, Optional[int]]]) -> None:
+    """
+    Write attempts of one player right away with one INSERT, bypassing the
+    buffer. For callers already in a transaction (xp.award_xp()), which a
+    failure rolls back too.
+    """
+    rows = _rows(user, attempts)
+    if rows:
+        _write(rows)
+
+
+def _rows(user, attempts: Iterable[Tuple[str, Any, Any, bool, Optional[int]]]) -> List[Dict[str, Any]]:
+    """Buffered form of attempts: plain values, so they can be spilled as JSON."""
+    answered_at = timezone.now().isoformat()
+    return [
+        {
+            'user_id': user.pk,
+            'question_type': question_type,
+            'question_id': int(question_id),
+            'answer': answer if isinstance(answer, str) else json.dumps(answer),
+            'is_correct': bool(is_correct),
+            'latency_ms': latency_ms,
+            'answered_at': answered_at,
+        }
+        for question_type, question_id, answer, is_correct, latency_ms in attempts
+    ]
+
+
+def _due() -> bool:
+    """Whether the buffer is full or old enough, with _lock held."""
+    return bool(_buffer) and (len(_buffer) >= settings.ATTEMPT_BUFFER_SIZE
+                              or time.monotonic() - _oldest >= settings.ATTEMPT_BUFFER_SECONDS)
+
+
+def flush_after_request() -> int:
+    """
+    Write what a finished request leaves behind: the buffer and any spilled
+    attempts with ATTEMPT_FLUSH_EACH_REQUEST, otherwise only a buffer that is
+    due. Waits for a flush running in another thread rather than spilling.
+
+    Returns:
+        Number of attempts written
+    """
+    if settings.ATTEMPT_FLUSH_EACH_REQUEST:
+        if not _buffer and not os.path.exists(settings.ATTEMPT_SPILL_PATH):
+            return 0
+    else:
+        with _lock:
+            if not _due():
+                return 0
+    return flush(wait=True)
+
+
+def _take_buffer() -> List[Dict[str, Any]]:
+    global _buffer, _oldest
+    with _lock:
+        batch, _buffer, _oldest = _buffer, [], None
+    return batch
+
+
+def _spill(batch: List[Dict[str, Any]]) -> None:
+    """Append attempts to the spill file and make sure they reached the disk."""
+    with open(settings.ATTEMPT_SPILL_PATH, 'a', encoding='utf-8') as spill:
+        spill.writelines(json.dumps(attempt) + '\n' for attempt in batch)
+        spill.flush()
+        os.fsync(spill.fileno())
+
+
+def _take_spill() -> List[Dict[str, Any]]:
+    """Claim the spilled attempts. Renaming first means only one process writes each spilled batch."""
+    claimed = f'{settings.ATTEMPT_SPILL_PATH}.{os.getpid()}.{threading.get_ident()}'
+    try:
+        os.rename(settings.ATTEMPT_SPILL_PATH, claimed)
+    except FileNotFoundError:
+        return []
+    with open(claimed, encoding='utf-8') as spill:
+        batch = [json.loads(line) for line in spill if line.strip()]
+    os.remove(claimed)
+    return batch
+
+
+def _write(batch: List[Dict[str, Any]]) -> None:
+    rows = [
+        AnswerAttempt(
+            user_id=attempt['user_id'],
+            # Resolved within the INSERT, like QuestionProgress.registry
+            question_id=Question.id_for(attempt['question_type'], attempt['question_id']),
+            answer=attempt['answer'],
+            is_correct=attempt['is_correct'],
+            latency_ms=attempt['latency_ms'],
+            answered_at=datetime.fromisoformat(attempt['answered_at']),
+        )
+        for attempt in batch
+    ]
+    # The registry lookup adds two parameters per row
+    size = max(connection.ops.bulk_batch_size(INSERT_FIELDS + ['question_type', 'object_id'], rows), 1)
+    if len(rows) <= size:
+        # One INSERT, atomic on its own in autocommit. bulk_create() would wrap it in
+        # a transaction, adding a BEGIN and a COMMIT round trip to every flush
+        AnswerAttempt.objects._insert(rows, fields=INSERT_FIELDS)
+        return
+    # A backlog from the spill file takes several INSERTs, written all or none
+    with transaction.atomic():
+        for start in range(0, len(rows), size):
+            AnswerAttempt.objects._insert(rows[start:start + size], fields=INSERT_FIELDS)
+
+
+def _write_each(batch: List[Dict[str, Any]]) -> int:
+    """Write a rejected batch row by row, dropping the rows the database rejects again."""
+    written = 0
+    for position, attempt in enumerate(batch):
+        try:
+            _write([attempt])
+        except (OperationalError, InterfaceError):
+            rest = batch[position:]
+            logger.warning("Spilling %d answer attempts, the database is unavailable", len(rest), exc_info=True)
+            _spill(rest)
+            break
+        except DatabaseError:
+            # A bad row (a deleted player, say) would fail again on every retry, so it isn't spilled
+            logger.exception("Dropping an answer attempt that could not be written: %s", attempt)
+        else:
+            written += 1
+    return written
+
+
+def flush(wait: bool = False) -> int:
+    """
+    Write the buffered attempts, and any spilled ones, with one bulk INSERT.
+
+    Args:
+        wait: Wait for a flush running in another thread instead of spilling
+
+    Returns:
+        Number of attempts written (0 when they were spilled instead)
+    """
+    batch = _take_buffer()
+    if not _flush_lock.acquire(blocking=wait):
+        # The previous batch is still being written; don't queue up behind it
+        if batch:
+            _spill(batch)
+        return 0
+    try:
+        batch = _take_spill() + batch
+        if not batch:
+            return 0
+        try:
+            _write(batch)
+        except (OperationalError, InterfaceError):
+            logger.warning("Spilling %d answer attempts, the database is unavailable", len(batch), exc_info=True)
+            _spill(batch)
+            return 0
+        except DatabaseError:
+            logger.warning("Writing %d answer attempts one by one, the batch was rejected", len(batch),
+                           exc_info=True)
+            return _write_each(batch)
+        return len(batch)
+    finally:
+        _flush_lock.release()
+
+
+def reset() -> None:
+    """Forget buffered attempts (tests)."""
+    _take_buffer()
+
+
+# Don't lose what is still buffered when a long running process exits
+atexit.register(flush)
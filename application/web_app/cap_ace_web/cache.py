@@ -0,0 +1,241 @@
+"""
+Two-tier cache for aggregates and other values that are expensive to compute.
+
+Values are looked up in a bounded in-process LRU first, then in the shared
+Django cache (CACHES['default']: local memory by default, a file or Redis
+backend when configured), and computed only when both miss.
+
+Keys are namespaced and versioned: invalidate('question_counts') bumps the
+namespace version in the shared cache, which orphans every key of the old
+version at once. Processes pick up a new version within LOCAL_CACHE_TTL.
+
+A cold key is computed once: threads of one process wait on a per-key lock,
+other processes wait on a short lock entry in the shared cache and then read
+the value the winner stored.
+
+    @cached('question_counts', timeout=300)
+    def category_totals():
+        ...
+
+    value = get_or_compute('leaderboard', ('BUD',), compute, timeout=60)
+"""
+import functools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread safe, size bounded in-process cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheStats:
+    """Hit/miss counters for this process."""
+
+    FIELDS = ('local_hits', 'shared_hits', 'misses', 'computes', 'lock_waits', 'invalidations')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            self.counts[field] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {field: 0 for field in self.FIELDS}
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts['local_hits'] + counts['shared_hits'] + counts['misses']
+        counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / lookups, 4) if lookups else 0
+        counts['local_entries'] = len(local_cache)
+        return counts
+
+
+local_cache = LRUCache(settings.LOCAL_CACHE_MAX_ENTRIES)
+stats = CacheStats()
+
+# Striped so the number of locks stays fixed however many keys there are
+_key_locks = [threading.Lock() for _ in range(64)]
+
+
+def shared_cache():
+    return caches['default']
+
+
+def namespace_version(namespace: str) -> int:
+    """Current version of a namespace (cached locally for LOCAL_CACHE_TTL)."""
+    version_key = f'cap_ace:{namespace}:version'
+    version = local_cache.get(version_key)
+    if version is _MISSING:
+        version = shared_cache().get(version_key)
+        if version is None:
+            # add() so concurrent first readers agree on the starting version
+            shared_cache().add(version_key, 1, None)
+            version = shared_cache().get(version_key, 1)
+        local_cache.set(version_key, version, settings.LOCAL_CACHE_TTL)
+    return version
+
+
+def make_key(namespace: str, parts: Iterable[Any] = ()) -> str:
+    """Versioned cache key for ``parts`` in ``namespace``."""
+    suffix = ':'.join(str(part) for part in parts)
+    return f'cap_ace:{namespace}:v{namespace_version(namespace)}:{suffix}'
+
+
+def invalidate(namespace: str) -> None:
+    """Drop every key in ``namespace`` by bumping its version."""
+    version_key = f'cap_ace:{namespace}:version'
+    try:
+        version = shared_cache().incr(version_key)
+    except ValueError:
+        # Not set yet (or evicted): start past any version a process may still hold
+        version = int(time.time())
+        shared_cache().set(version_key, version, None)
+    local_cache.set(version_key, version, settings.LOCAL_CACHE_TTL)
+    stats.incr('invalidations')
+
+
+def _lock_for(key: str) -> threading.Lock:
+    return _key_locks[hash(key) % len(_key_locks)]
+
+
+def _lookup(key: str):
+    value = local_cache.get(key)
+    if value is not _MISSING:
+        stats.incr('local_hits')
+        return value
+    value = shared_cache().get(key, _MISSING)
+    if value is not _MISSING:
+        stats.incr('shared_hits')
+        local_cache.set(key, value, settings.LOCAL_CACHE_TTL)
+        return value
+    return _MISSING
+
+
+def get_or_compute(namespace: str, parts: Iterable[Any], compute: Callable[[], Any],
+                   timeout: Union[float, Callable[[Any], float], None] = None) -> Any:
+    """
+    Return the cached value for ``parts`` in ``namespace``, computing it once on a miss.
+
+    Args:
+        namespace: Invalidation namespace, see invalidate()
+        parts: Values identifying the entry within the namespace
+        compute: Called without arguments to produce the value
+        timeout: Shared cache timeout in seconds (default CACHE_DEFAULT_TIMEOUT), or
+            a function of the computed value returning it, 0 to not store the value
+    """
+    timeout = settings.CACHE_DEFAULT_TIMEOUT if timeout is None else timeout
+    key = make_key(namespace, parts)
+    value = _lookup(key)
+    if value is not _MISSING:
+        return value
+
+    # Single flight within this process
+    with _lock_for(key):
+        value = _lookup(key)
+        if value is not _MISSING:
+            stats.incr('lock_waits')
+            return value
+
+        # Single flight across processes sharing the cache
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        lock_timeout = settings.CACHE_LOCK_TIMEOUT
+        if not shared_cache().add(lock_key, token, lock_timeout):
+            stats.incr('lock_waits')
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                computing = shared_cache().get(lock_key) is not None
+                value = shared_cache().get(key, _MISSING)
+                if value is not _MISSING:
+                    local_cache.set(key, value, settings.LOCAL_CACHE_TTL)
+                    return value
+                if not computing:
+                    # Finished without storing a value (it failed, or the value isn't cached)
+                    break
+            # Otherwise the other computation is taking too long, compute it here as well
+
+        stats.incr('misses')
+        try:
+            value = compute()
+            stats.incr('computes')
+            value_timeout = timeout(value) if callable(timeout) else timeout
+            if value_timeout != 0:
+                shared_cache().set(key, value, value_timeout)
+                local_cache.set(key, value, min(value_timeout, settings.LOCAL_CACHE_TTL)
+                                if value_timeout else settings.LOCAL_CACHE_TTL)
+        finally:
+            if shared_cache().get(lock_key) == token:
+                shared_cache().delete(lock_key)
+        return value
+
+
+def cached(namespace: str, timeout: Optional[float] = None, key: Optional[Callable[..., Iterable[Any]]] = None):
+    """
+    Decorator caching a function's result with get_or_compute().
+
+    ``key`` maps the call's arguments to the key parts (default: the positional
+    arguments), so it must identify everything the result depends on.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parts = key(*args, **kwargs) if key else args
+            return get_or_compute(namespace, (func.__name__, *parts), lambda: func(*args, **kwargs), timeout)
+        wrapper.invalidate = lambda: invalidate(namespace)
+        return wrapper
+    return decorator
+
+
+def clear() -> None:
+    """Empty both tiers (the whole shared cache) and reset the counters."""
+    local_cache.clear()
+    shared_cache().clear()
+    stats.reset()
@@ -0,0 +1,255 @@
+"""
+In-memory question store backed by a memory-mapped content snapshot.
+
+The question bank is read-mostly and small, so compile_content writes every
+question payload (see payloads.py) into one file, and the game views read
+questions from it without a database round trip. The file is memory mapped:
+loading it only parses the fixed size index, payloads are decoded on access
+and the pages are shared by every process on the machine.
+
+File layout (little endian):
+
+    header   magic, version, content version, created (unix time), record count
+    index    one entry per question, sorted by (type, id):
+             type, category, difficulty, id, offset, length
+    data     the compact JSON payloads, back to back
+
+The version is a hash of the index and data, so recompiling unchanged content
+keeps the version. get_store() checks the file every
+CONTENT_SNAPSHOT_CHECK_SECONDS and loads it again when the version changes.
+
+Editing a question invalidates the 'content_snapshot' cache namespace (see
+signals.py). The content version is that namespace's version when the
+snapshot was compiled, so any process, including one started after the edit,
+stops using the snapshot (get_store() returns None and the views read from
+the database again) until a recompiled snapshot is loaded. Recompile after
+editing content.
+
+The namespace version only reaches other processes through a shared cache, so
+with a per-process cache backend (locmem, the default) the snapshot is never
+served.
+"""
+import hashlib
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Collection, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from . import cache, payloads
+
+MAGIC = b'CAPSNAP2'
+HEADER = struct.Struct('<8sQQdI')
+ENTRY = struct.Struct('<3s3s1sqQI')
+
+# Invalidated whenever question content changes (see signals.py)
+SNAPSHOT_NAMESPACE = 'content_snapshot'
+
+# Cache backends that keep the namespace version in one process only
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _code(value: Optional[str]) -> bytes:
+    return (value or '').encode()
+
+
+def _text(value: bytes) -> Optional[str]:
+    return value.rstrip(b'\0').decode() or None
+
+
+def write_snapshot(path: str, records: Iterable[Tuple[str, int, Optional[str], str, bytes]],
+                   content_version: int) -> int:
+    """
+    Write a snapshot file, replacing ``path`` atomically.
+
+    Processes that have the previous file mapped keep reading it until they
+    reload.
+
+    Args:
+        path: Snapshot file to write
+        records: (question type, id, category, difficulty, serialized payload)
+        content_version: Version of SNAPSHOT_NAMESPACE read before the records were
+            built, so an edit made while compiling marks the snapshot stale
+
+    Returns:
+        The snapshot version
+    """
+    records = sorted(records, key=lambda record: (record[0], record[1]))
+    index = bytearray()
+    data = bytearray()
+    for question_type, pk, category, difficulty, payload in records:
+        index += ENTRY.pack(_code(question_type), _code(category), _code(difficulty), pk, len(data), len(payload))
+        data += payload
+    digest = hashlib.blake2b(index, digest_size=8)
+    digest.update(data)
+    version = int.from_bytes(digest.digest(), 'little')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, version, content_version, time.time(), len(records)))
+            f.write(index)
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return version
+
+
+def read_version(path: str) -> int:
+    """Version of a snapshot file, read from its header"""
+    with open(path, 'rb') as f:
+        magic, version, _, _, _ = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a content snapshot")
+    return version
+
+
+class _TypeIndex:
+    """Sorted ids of one question type with the location of each payload."""
+    __slots__ = ('ids', 'offsets', 'lengths')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.offsets = array('Q')
+        self.lengths = array('I')
+
+
+class ContentStore:
+    """Questions of one snapshot file, see the module docstring."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.content_version, self.created, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a content snapshot")
+        self._data_start = HEADER.size + count * ENTRY.size
+
+        self._types: Dict[str, _TypeIndex] = {}
+        # (type, category, difficulty or None) -> ids, for sampling
+        self._groups: Dict[Tuple[str, Optional[str], Optional[str]], array] = {}
+        entries = self._map[HEADER.size:self._data_start]
+        for question_type, category, difficulty, pk, offset, length in ENTRY.iter_unpack(entries):
+            question_type, category, difficulty = _text(question_type), _text(category), _text(difficulty)
+            index = self._types.get(question_type)
+            if index is None:
+                index = self._types[question_type] = _TypeIndex()
+            index.ids.append(pk)
+            index.offsets.append(offset)
+            index.lengths.append(length)
+            for key in ((question_type, category, None), (question_type, category, difficulty)):
+                self._groups.setdefault(key, array('q')).append(pk)
+
+    def __len__(self):
+        return sum(len(index.ids) for index in self._types.values())
+
+    def stale(self) -> bool:
+        """True once question content was edited after this snapshot was compiled."""
+        return cache.namespace_version(SNAPSHOT_NAMESPACE) != self.content_version
+
+    def get(self, question_type: str, pk: int) -> Optional['payloads.QuestionPayload']:
+        """Payload of one question, None if it isn't in the snapshot."""
+        index = self._types.get(question_type)
+        if index is None:
+            return None
+        position = bisect_left(index.ids, pk)
+        if position == len(index.ids) or index.ids[position] != pk:
+            return None
+        start = self._data_start + index.offsets[position]
+        return payloads.deserialize(self._map[start:start + index.lengths[position]])
+
+    def ids(self, question_type: str, category: Optional[str], difficulty: Optional[str] = None) -> Collection[int]:
+        """Ids of the questions of a type in a category (and difficulty)."""
+        return self._groups.get((question_type, category, difficulty), ())
+
+    def sample(self, question_type: str, category: Optional[str], completed: Collection[int] = (),
+               difficulty: Optional[str] = None, exclude_id=None) -> Optional['payloads.QuestionPayload']:
+        """
+        Random question of a type in a category, preferring ones not completed.
+
+        Like the game views, falls back to any question in the category when
+        every one has been completed, and returns None when there are none.
+        """
+        ids = self.ids(question_type, category, difficulty)
+        if exclude_id is not None:
+            exclude_id = int(exclude_id)
+            ids = [pk for pk in ids if pk != exclude_id]
+        candidates = [pk for pk in ids if pk not in completed] if completed else ids
+        if not candidates:
+            candidates = ids
+        if not candidates:
+            return None
+        return self.get(question_type, random.choice(candidates))
+
+    def close(self) -> None:
+        self._map.close()
+
+
+_store: Optional[ContentStore] = None
+_loaded_path = None
+_file_signature = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _signature(path: str):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _refresh(path: str) -> None:
+    global _store, _loaded_path, _file_signature, _checked_at
+    with _lock:
+        _checked_at = time.monotonic()
+        try:
+            signature = _signature(path)
+        except FileNotFoundError:
+            _store, _loaded_path, _file_signature = None, path, None
+            return
+        if path == _loaded_path and signature == _file_signature:
+            return
+        # Replaced maps are left to the garbage collector, other threads may still read them
+        if _store is None or path != _loaded_path or read_version(path) != _store.version:
+            _store = ContentStore(path)
+        _loaded_path, _file_signature = path, signature
+
+
+def get_store() -> Optional[ContentStore]:
+    """
+    The content store, or None when the views should read from the database.
+
+    That is when CONTENT_SNAPSHOT_PATH isn't set or doesn't exist, the cache
+    backend isn't shared between processes, or the question content changed
+    after the snapshot was compiled.
+    """
+    path = settings.CONTENT_SNAPSHOT_PATH
+    if not path or settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS:
+        return None
+    if path != _loaded_path or time.monotonic() - _checked_at >= settings.CONTENT_SNAPSHOT_CHECK_SECONDS:
+        _refresh(path)
+    store = _store
+    if store is None or store.stale():
+        return None
+    return store
+
+
+def reset() -> None:
+    """Forget the loaded snapshot (the next get_store() loads it again)."""
+    global _store, _loaded_path, _file_signature, _checked_at
+    with _lock:
+        _store, _loaded_path, _file_signature, _checked_at = None, None, None, 0.0
@@ -0,0 +1,110 @@
+"""
+Database backend that adds artificial network latency to another backend.
+
+Production talks to a serverless Postgres over TLS where every round trip
+costs milliseconds, while local SQLite makes extra queries look free. This
+backend wraps any Django backend and sleeps before each query, commit and
+rollback and when a connection is opened, so tests and benchmarks pay a
+realistic price for every round trip.
+
+Configure it in DATABASES (settings.py does this from the DB_LATENCY_*
+environment variables):
+
+    "ENGINE": "cap_ace_web.db_backends.latency",
+    "WRAPPED_ENGINE": "django.db.backends.sqlite3",
+    "LATENCY": {"QUERY_MS": 3, "CONNECT_MS": 40, "JITTER_MS": 1, "SEED": 0},
+"""
+import functools
+import random
+import time
+from typing import Dict, Any
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import load_backend
+
+DEFAULT_LATENCY = {
+    'QUERY_MS': 0.0,
+    'CONNECT_MS': 0.0,
+    'JITTER_MS': 0.0,
+    'SEED': None,
+}
+
+
+def latency_settings(settings_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """The LATENCY options of a database with the defaults filled in."""
+    return {**DEFAULT_LATENCY, **settings_dict.get('LATENCY', {})}
+
+
+class LatencyCursor:
+    """Driver cursor proxy that pays one round trip per execute."""
+
+    def __init__(self, cursor, wrapper):
+        self.cursor = cursor
+        self.wrapper = wrapper
+
+    def execute(self, *args, **kwargs):
+        self.wrapper.round_trip(self.wrapper.latency['QUERY_MS'])
+        return self.cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self.wrapper.round_trip(self.wrapper.latency['QUERY_MS'])
+        return self.cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+@functools.lru_cache(maxsize=None)
+def latency_wrapper_class(engine: str):
+    """Subclass the DatabaseWrapper of ``engine`` with latency injection."""
+    base = load_backend(engine).DatabaseWrapper
+
+    class LatencyDatabaseWrapper(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.latency = latency_settings(self.settings_dict)
+            self.latency_rng = random.Random(self.latency['SEED'])
+
+        def round_trip(self, milliseconds: float) -> None:
+            """Sleep for ``milliseconds`` plus or minus the configured jitter."""
+            jitter = self.latency['JITTER_MS']
+            delay = milliseconds + (self.latency_rng.uniform(-jitter, jitter) if jitter else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+        def create_cursor(self, name=None):
+            # Delay at the driver cursor, below any execute_wrapper(), so query
+            # instrumentation sees the emulated round trip
+            return LatencyCursor(super().create_cursor(name), self)
+
+        def get_new_connection(self, conn_params):
+            self.round_trip(self.latency['CONNECT_MS'])
+            return super().get_new_connection(conn_params)
+
+        def _commit(self):
+            if self.connection is not None:
+                self.round_trip(self.latency['QUERY_MS'])
+            return super()._commit()
+
+        def _rollback(self):
+            if self.connection is not None:
+                self.round_trip(self.latency['QUERY_MS'])
+            return super()._rollback()
+
+    LatencyDatabaseWrapper.__name__ = LatencyDatabaseWrapper.__qualname__ = 'LatencyDatabaseWrapper'
+    return LatencyDatabaseWrapper
+
+
+class DatabaseWrapper:
+    """
+    Entry point Django loads for this ENGINE.
+
+    Builds an instance of the wrapped engine's DatabaseWrapper subclass, so
+    vendor checks, features and operations are those of the real backend.
+    """
+    def __new__(cls, settings_dict, alias=DEFAULT_DB_ALIAS):
+        engine = settings_dict.get('WRAPPED_ENGINE', 'django.db.backends.sqlite3')
+        return latency_wrapper_class(engine)(settings_dict, alias)
@@ -0,0 +1,269 @@
+"""
+Database instrumentation: slow query logging with EXPLAIN capture, and
+per-request connection timings.
+
+SlowQueryLogger is installed around every request by SlowQueryMiddleware via
+connection.execute_wrapper(). Queries slower than SLOW_QUERY_THRESHOLD_MS are
+written as JSON lines to a rotating file together with the view that issued
+them and their (redacted) parameters. The first time a normalized SQL
+fingerprint is seen in a process, its EXPLAIN plan is captured as well.
+
+ConnectionTimings is used by ServerTimingMiddleware to split a request's
+database time into connection handshakes, health checks and queries.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import List, Dict, Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger('cap_ace_web.slow_queries')
+logger.propagate = False
+
+_handler_lock = threading.Lock()
+_explained_lock = threading.Lock()
+_explained_fingerprints = set()
+
+# Literals and IN lists are replaced so queries differing only in values share a fingerprint
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Strip literal values and collapse IN lists and whitespace."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    """Short stable hash of the normalized SQL."""
+    return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()[:16]
+
+
+def redact_params(params) -> Optional[List[Any]]:
+    """Keep numbers, booleans and NULLs, replace anything else with its type and size."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        params = list(params.values())
+    redacted = []
+    for value in params:
+        if value is None or isinstance(value, (bool, int, float)):
+            redacted.append(value)
+        elif isinstance(value, (str, bytes)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+def get_log_handler() -> RotatingFileHandler:
+    """Rotating file handler for the configured log file, recreated if the setting changes."""
+    path = settings.SLOW_QUERY_LOG_FILE
+    with _handler_lock:
+        for handler in logger.handlers:
+            if getattr(handler, 'baseFilename', None) == os.path.abspath(path):
+                return handler
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+            delay=True,
+        )
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        return handler
+
+
+def capture_explain(connection, sql: str, params) -> Optional[str]:
+    """
+    EXPLAIN a SELECT with the original parameters.
+
+    Uses the backend cursor directly so the plan query is neither logged nor
+    counted by the debug cursor.
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+
+
+class SlowQueryLogger:
+    """execute_wrapper that logs queries slower than the configured threshold."""
+
+    def __init__(self, request=None, threshold_ms: Optional[float] = None):
+        self.request = request
+        self.threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS if threshold_ms is None else threshold_ms
+
+    def view_name(self) -> str:
+        match = getattr(self.request, 'resolver_match', None)
+        if match is not None:
+            return match.view_name
+        return getattr(self.request, 'path', '-')
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.log(sql, params, many, duration_ms, context['connection'])
+
+    def log(self, sql, params, many, duration_ms, connection):
+        key = fingerprint(sql)
+        record = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'fingerprint': key,
+            'sql': normalize_sql(sql),
+            'duration_ms': round(duration_ms, 3),
+            'view': self.view_name(),
+            'vendor': connection.vendor,
+            'params': None if many else redact_params(params),
+        }
+
+        with _explained_lock:
+            first_occurrence = key not in _explained_fingerprints
+            _explained_fingerprints.add(key)
+        if first_occurrence and not many:
+            record['explain'] = capture_explain(connection, sql, params)
+
+        get_log_handler()
+        logger.info(json.dumps(record))
+
+
+class ConnectionTimings:
+    """Time spent connecting to, health checking and querying the database."""
+
+    def __init__(self):
+        self.connect_ms = 0.0
+        self.connects = 0
+        self.health_check_ms = 0.0
+        self.query_ms = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+    @contextmanager
+    def track(self, connection):
+        """
+        Time ``connection`` while the block runs.
+
+        connect() and is_usable() are wrapped on the instance (connections are
+        per thread) since Django has no signal before a connection is opened.
+        """
+        connect, is_usable = connection.connect, connection.is_usable
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self.connect_ms += (time.perf_counter() - start) * 1000
+                self.connects += 1
+
+        def timed_is_usable():
+            start = time.perf_counter()
+            try:
+                return is_usable()
+            finally:
+                self.health_check_ms += (time.perf_counter() - start) * 1000
+
+        # Restore whatever was set on the instance before (the test runner wraps connect() too)
+        shadowed = {name: vars(connection)[name] for name in ('connect', 'is_usable') if name in vars(connection)}
+        connection.connect, connection.is_usable = timed_connect, timed_is_usable
+        try:
+            with connection.execute_wrapper(self):
+                yield self
+        finally:
+            for name in ('connect', 'is_usable'):
+                if name in shadowed:
+                    setattr(connection, name, shadowed[name])
+                else:
+                    delattr(connection, name)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. db-connect;dur=41.2, db;dur=3.1;desc="2 queries"."""
+        metrics = []
+        if self.connects:
+            metrics.append(f'db-connect;dur={self.connect_ms:.1f}')
+        if self.health_check_ms:
+            metrics.append(f'db-health;dur={self.health_check_ms:.1f}')
+        metrics.append(f'db;dur={self.query_ms:.1f};desc="{self.queries} queries"')
+        return ', '.join(metrics)
+
+
+def read_log_records(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read every record from the log file and its rotated backups."""
+    path = path or settings.SLOW_QUERY_LOG_FILE
+    files = [path] + [f"{path}.{i}" for i in range(1, settings.SLOW_QUERY_LOG_BACKUP_COUNT + 1)]
+    records = []
+    for file_path in files:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, 'r') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def aggregate_by_fingerprint(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group log records by fingerprint, slowest total time first."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'],
+            'sql': record['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'sample_params': record.get('params'),
+            'explain': None,
+            'last_seen': record['timestamp'],
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        group['views'].add(record['view'])
+        group['explain'] = group['explain'] or record.get('explain')
+        group['last_seen'] = max(group['last_seen'], record['timestamp'])
+
+    for group in groups.values():
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 3)
+        group['total_ms'] = round(group['total_ms'], 3)
+        group['views'] = sorted(group['views'])
+    return sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)
@@ -3,7 +3,7 @@ from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth import get_user_model
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column
-from .models import MultipleChoice, MultipleChoiceDistractor, QuestionProgress, FillInTheBlank
+from .models import MultipleChoice, MultipleChoiceDistractor, QuestionProgress, FillInTheBlank, CATEGORIES
 
 User = get_user_model()
 
@@ -75,7 +75,7 @@ class MultipleChoiceForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Ensure the category choices are properly set
-        self.fields['category'].choices = MultipleChoice.CATEGORIES
+        self.fields['category'].choices = CATEGORIES
         self.fields['category'].widget.attrs.update({'class': 'form-select'})
 
 class MultipleChoiceDistractorForm(forms.ModelForm):
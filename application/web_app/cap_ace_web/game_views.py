@@ -3,31 +3,112 @@ from .models import MultipleChoice, MultipleChoiceDistractor, QuestionProgress,
 from django.contrib.auth import get_user_model
 from django.urls import reverse_lazy
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from .forms import CustomUserCreationForm, CustomUserChangeForm, StockTickerForm, MultipleChoiceForm, MultipleChoiceDistractorFormSet, FillInTheBlankForm
 from django.views.generic import CreateView, UpdateView, DeleteView, DetailView, ListView
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef
 from django.contrib import messages
 from django.shortcuts import redirect
 from django.shortcuts import get_object_or_404
 import random
+from django.conf import settings
 from django.views import View
 from django.urls import reverse
 import json
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from .payloads import get_payload
+from .question_packs import PACK_TYPES, PACK_DIRECTORY, MANIFEST_NAME
+from .models import CATEGORIES
+from django.templatetags.static import static
+from . import content_store
+from .attempts import record_attempt, answer_latency
+from .registry import inactive
+from .templatetags.xp_tags import get_xp_data
+from .scheduler import next_card_id, review_card
+from .xp import XP_BY_DIFFICULTY, award_xp
 
 
 
 class StaffRequiredMixin(UserPassesTestMixin):
     def test_func(self):
         return self.request.user.is_staff
+
+
+# Salt of the signed cookies naming the question picked for each game while grading the previous answer
+RESERVED_COOKIE_SALT = 'cap_ace_web.reserved_question'
+
+
+def reserved_cookie_name(question_type, category):
+    """Cookie holding the question reserved for one game."""
+    return f'reserved_{question_type}_{category}'
+
+
+def reserve_question(response, question_type, category, question_id):
+    """
+    Remember the question the next GET of a game should show.
+
+    The answer POST picks the next question's id while it grades the current
+    one, in one query, so the "next" page skips the random selection and only
+    loads the question. The reservation is a signed cookie on the response
+    rather than a session write, so it adds no queries to the answer.
+    """
+    name = reserved_cookie_name(question_type, category)
+    if question_id is None:
+        response.delete_cookie(name)
+    else:
+        response.set_signed_cookie(
+            name, question_id, salt=RESERVED_COOKIE_SALT,
+            max_age=settings.RESERVED_QUESTION_MAX_AGE, httponly=True, samesite='Lax'
+        )
+
+
+def reserved_question(request, question_type, category):
+    """
+    The question reserved for a game, if any.
+
+    The reservation is kept until the next answer replaces it or it expires
+    (its signed timestamp is checked here), so reloading the page shows the
+    same question without writing anything.
+    """
+    question_id = request.get_signed_cookie(
+        reserved_cookie_name(question_type, category), default=None,
+        salt=RESERVED_COOKIE_SALT, max_age=settings.RESERVED_QUESTION_MAX_AGE
+    )
+    if question_id is None:
+        return None
+    return get_payload(question_type, question_id)
+
+
+def answer_fragments(request, result_context, next_template, next_context):
+    """
+    Partial response to an AJAX answer: the result fragment, the next
+    question's game fragment and the player's XP bar in the category (with
+    this answer's XP added), without the page around them.
+
+    Args:
+        result_context: Context of the result page
+        next_template: The game's game_content.html
+        next_context: Context for the next question, None if there isn't one
+    """
+    xp_data = get_xp_data(request.user, request.path)
+    return JsonResponse({
+        'is_correct': result_context['is_correct'],
+        'result_html': render_to_string('multiple_choice/result_content.html', result_context, request=request),
+        'next_html': render_to_string(next_template, next_context, request=request) if next_context else '',
+        'xp': xp_data,
+        'xp_html': render_to_string('xp_bar_content.html', xp_data, request=request) if xp_data else '',
+    })
     
 # Fill in the Blank Views
 
 class FillInTheBlankGameView(LoginRequiredMixin, View):
     template_name = 'fill_blank/game.html'
-    def get_random_question(self, category, user):
-        """Get a random question from the specified category that the user hasn't completed"""
+    def random_question_id(self, category, user):
+        """
+        Id of a random question from the specified category, preferring ones the user
+        hasn't completed, in one query (None if the category has none)
+        """
         category_mapping = {
             'budget': 'BUD',
             'investing': 'INV',
@@ -37,46 +118,64 @@ class FillInTheBlankGameView(LoginRequiredMixin, View):
             'taxes': 'TAX',
         }
         category = category_mapping[category]
-        # First, get all completed question IDs for this user and category
-        completed_ids = QuestionProgress.objects.filter(
+        # Sample from the content snapshot when one is loaded, only progress is read from the database
+        store = content_store.get_store()
+        if store is not None:
+            completed_ids = QuestionProgress.objects.filter(
+                user=user,
+                question_type='FIB',
+                category=category
+            ).values_list('question_id', flat=True)
+            question = store.sample('FIB', category, completed=set(completed_ids))
+            return question.id if question else None
+
+        # Ids of the category's questions, each flagged when the user has completed it
+        completed = QuestionProgress.objects.filter(
             user=user,
             question_type='FIB',
-            category=category
-        ).values_list('question_id', flat=True)
-        
-        # Find questions in this category that haven't been completed
-        available_questions = FillInTheBlank.objects.filter(
+            category=category,
+            question_id=OuterRef('pk')
+        )
+        questions = list(FillInTheBlank.objects.filter(
             category=category
         ).exclude(
-            id__in=completed_ids
-        )
-        
-        # If there are no uncompleted questions, get all questions in this category
-        if not available_questions.exists():
-            available_questions = FillInTheBlank.objects.filter(category=category)
-            
-        # If there are still no questions, return None
-        if not available_questions.exists():
+            inactive('FIB')
+        ).values_list('id', Exists(completed)))
+
+        # Prefer questions that haven't been completed, or any once they all have
+        question_ids = [pk for pk, done in questions if not done] or [pk for pk, _ in questions]
+
+        # If there are no questions, return None
+        if not question_ids:
             return None
-         # Select a random question
-        question = random.choice(list(available_questions))
-        return question
+
+        # Select a random question
+        return random.choice(question_ids)
+
+    def get_random_question(self, category, user):
+        """Get a random question from the specified category that the user hasn't completed"""
+        question_id = self.random_question_id(category, user)
+        # Only the id is selected, the question itself comes from its cached payload
+        return get_payload('FIB', question_id) if question_id is not None else None
     
     def get(self, request, category):
-        # Get a random question for this category
-        question = self.get_random_question(category, request.user)
+        # Use the question picked while grading the last answer, or a random one for this category
+        question = reserved_question(request, 'FIB', category) or self.get_random_question(category, request.user)
         
         if not question:
             messages.error(request, f"No questions available for this category.")
             return redirect('learn')
         
-        context = {
+        return render(request, self.template_name, self.get_game_context(question, category))
+
+    def get_game_context(self, question, category):
+        """Context of game_content.html for one question"""
+        return {
             'question': question,
             'category': question.get_category_display(),
             'category_code': category,
         }
-        
-        return render(request, self.template_name, context)
+
     def post(self, request, category):
         inp_category = category
         category_mapping = {
@@ -91,10 +190,14 @@ class FillInTheBlankGameView(LoginRequiredMixin, View):
         question_id = request.POST.get('question_id')
         selected_answer = request.POST.get('missing_word')
         
-        question = get_object_or_404(FillInTheBlank, id=question_id)
+        question = get_payload('FIB', question_id)
+        if question is None:
+            raise Http404("Question not found")
         
         # Check if the answer is correct
         is_correct = (selected_answer == question.missing_word)
+        # This answer's attempt is written with its award, or goes to the attempt buffer
+        attempt = ('FIB', question.id, selected_answer, is_correct, answer_latency(request))
         
         # If this is first time completing this question
         if is_correct:
@@ -108,33 +211,18 @@ class FillInTheBlankGameView(LoginRequiredMixin, View):
             
             # Only add XP if this is the first time completing the question
             if created:
-                # Determine which XP field to update based on category
-                xp_field_mapping = {
-                    'BUD': 'budget_xp',
-                    'INV': 'investing_xp',
-                    'SAV': 'savings_xp',
-                    'BAL': 'balance_sheet_xp',
-                    'CRD': 'credit_xp',
-                    'TAX': 'taxes_xp',
-                }
-                
-                # Get the field name to update
-                xp_field = xp_field_mapping.get(category)
-
-                xp_mapping = {
-                    'B': 50,
-                    'I': 100,
-                    'A': 150,
-                }
-                xp = xp_mapping.get(question.difficulty, 0)
+                xp = XP_BY_DIFFICULTY.get(question.difficulty, 0)
                 
-                # Update the user's XP (add 10 XP per question)
-                if xp_field:
-                    user = request.user
-                    current_xp = getattr(user, xp_field)
-                    setattr(user, xp_field, current_xp + xp)
-                    user.save(update_fields=[xp_field])
-        
+                # Record the award and add it to the user's XP
+                award_xp(request.user, category, xp, 'FIB', question.id, attempts=[attempt])
+                attempt = None
+        if attempt:
+            record_attempt(request.user, *attempt)
+        
+        # Pick the next question now, with this answer's progress already recorded. Only its id:
+        # the next page loads the question, unless this answer's fragments show it right away
+        next_question_id = self.random_question_id(inp_category, request.user)
+
         context = {
             'question': question,
             'selected_answer': selected_answer,
@@ -144,7 +232,14 @@ class FillInTheBlankGameView(LoginRequiredMixin, View):
             'home_url': reverse('learn'),
         }
         
-        return render(request, 'multiple_choice/result.html', context)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            next_question = get_payload('FIB', next_question_id) if next_question_id is not None else None
+            next_context = self.get_game_context(next_question, inp_category) if next_question else None
+            response = answer_fragments(request, context, 'fill_blank/game_content.html', next_context)
+        else:
+            response = render(request, 'multiple_choice/result.html', context)
+        reserve_question(response, 'FIB', inp_category, next_question_id)
+        return response
     
 
 class FillInTheBlankListView(LoginRequiredMixin, StaffRequiredMixin, ListView):
@@ -279,8 +374,11 @@ class MultipleChoiceDeleteView(LoginRequiredMixin, StaffRequiredMixin, DeleteVie
 class MultipleChoiceGameView(LoginRequiredMixin, View):
     template_name = 'multiple_choice/game.html'
     
-    def get_random_question(self, category, user):
-        """Get a random question from the specified category that the user hasn't completed"""
+    def random_question_id(self, category, user):
+        """
+        Id of a random question from the specified category, preferring ones the user
+        hasn't completed, in one query (None if the category has none)
+        """
         category_mapping = {
             'budget': 'BUD',
             'investing': 'INV',
@@ -290,53 +388,68 @@ class MultipleChoiceGameView(LoginRequiredMixin, View):
             'taxes': 'TAX',
         }
         category = category_mapping[category]
-        # First, get all completed question IDs for this user and category
-        completed_ids = QuestionProgress.objects.filter(
+        # Sample from the content snapshot when one is loaded, only progress is read from the database
+        store = content_store.get_store()
+        if store is not None:
+            completed_ids = QuestionProgress.objects.filter(
+                user=user,
+                question_type='MC',
+                category=category
+            ).values_list('question_id', flat=True)
+            question = store.sample('MC', category, completed=set(completed_ids))
+            return question.id if question else None
+
+        # Ids of the category's questions, each flagged when the user has completed it
+        completed = QuestionProgress.objects.filter(
             user=user,
             question_type='MC',
-            category=category
-        ).values_list('question_id', flat=True)
-        
-        # Find questions in this category that haven't been completed
-        available_questions = MultipleChoice.objects.filter(
+            category=category,
+            question_id=OuterRef('pk')
+        )
+        questions = list(MultipleChoice.objects.filter(
             category=category
         ).exclude(
-            id__in=completed_ids
-        )
-        
-        # If there are no uncompleted questions, get all questions in this category
-        if not available_questions.exists():
-            available_questions = MultipleChoice.objects.filter(category=category)
-            
-        # If there are still no questions, return None
-        if not available_questions.exists():
+            inactive('MC')
+        ).values_list('id', Exists(completed)))
+
+        # Prefer questions that haven't been completed, or any once they all have
+        question_ids = [pk for pk, done in questions if not done] or [pk for pk, _ in questions]
+
+        # If there are no questions, return None
+        if not question_ids:
             return None
-            
+
         # Select a random question
-        question = random.choice(list(available_questions))
-        return question
+        return random.choice(question_ids)
+
+    def get_random_question(self, category, user):
+        """Get a random question from the specified category that the user hasn't completed"""
+        question_id = self.random_question_id(category, user)
+        # Only the id is selected, the question itself comes from its cached payload
+        return get_payload('MC', question_id) if question_id is not None else None
     
     def get(self, request, category):
-        # Get a random question for this category
-        question = self.get_random_question(category, request.user)
+        # Use the question picked while grading the last answer, or a random one for this category
+        question = reserved_question(request, 'MC', category) or self.get_random_question(category, request.user)
         
         if not question:
             messages.error(request, f"No questions available for this category.")
             return redirect('learn')
         
-        # Get distractors and shuffle them with the correct answer
-        distractors = list(question.distractors.values_list('distractor', flat=True))
-        choices = distractors + [question.answer]
+        return render(request, self.template_name, self.get_game_context(question, category))
+
+    def get_game_context(self, question, category):
+        """Context of game_content.html for one question"""
+        # Shuffle the distractors with the correct answer
+        choices = question.distractors + [question.answer]
         random.shuffle(choices)
         
-        context = {
+        return {
             'question': question,
             'choices': choices,
             'category': question.get_category_display(),
             'category_code': category,
         }
-        
-        return render(request, self.template_name, context)
     
     def post(self, request, category):
         inp_category = category
@@ -352,10 +465,14 @@ class MultipleChoiceGameView(LoginRequiredMixin, View):
         question_id = request.POST.get('question_id')
         selected_answer = request.POST.get('answer')
         
-        question = get_object_or_404(MultipleChoice, id=question_id)
+        question = get_payload('MC', question_id)
+        if question is None:
+            raise Http404("Question not found")
         
         # Check if the answer is correct
         is_correct = (selected_answer == question.answer)
+        # This answer's attempt is written with its award, or goes to the attempt buffer
+        attempt = ('MC', question.id, selected_answer, is_correct, answer_latency(request))
         
         # If this is first time completing this question
         if is_correct:
@@ -369,33 +486,18 @@ class MultipleChoiceGameView(LoginRequiredMixin, View):
             
             # Only add XP if this is the first time completing the question
             if created:
-                # Determine which XP field to update based on category
-                xp_field_mapping = {
-                    'BUD': 'budget_xp',
-                    'INV': 'investing_xp',
-                    'SAV': 'savings_xp',
-                    'BAL': 'balance_sheet_xp',
-                    'CRD': 'credit_xp',
-                    'TAX': 'taxes_xp',
-                }
+                xp = XP_BY_DIFFICULTY.get(question.difficulty, 0)
                 
-                # Get the field name to update
-                xp_field = xp_field_mapping.get(category)
-
-                xp_mapping = {
-                    'B': 50,
-                    'I': 100,
-                    'A': 150,
-                }
-                xp = xp_mapping.get(question.difficulty, 0)
-                
-                # Update the user's XP (add 10 XP per question)
-                if xp_field:
-                    user = request.user
-                    current_xp = getattr(user, xp_field)
-                    setattr(user, xp_field, current_xp + xp)
-                    user.save(update_fields=[xp_field])
-        
+                # Record the award and add it to the user's XP
+                award_xp(request.user, category, xp, 'MC', question.id, attempts=[attempt])
+                attempt = None
+        if attempt:
+            record_attempt(request.user, *attempt)
+        
+        # Pick the next question now, with this answer's progress already recorded. Only its id:
+        # the next page loads the question, unless this answer's fragments show it right away
+        next_question_id = self.random_question_id(inp_category, request.user)
+
         context = {
             'question': question,
             'selected_answer': selected_answer,
@@ -405,7 +507,14 @@ class MultipleChoiceGameView(LoginRequiredMixin, View):
             'home_url': reverse('learn'),
         }
         
-        return render(request, 'multiple_choice/result.html', context)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            next_question = get_payload('MC', next_question_id) if next_question_id is not None else None
+            next_context = self.get_game_context(next_question, inp_category) if next_question else None
+            response = answer_fragments(request, context, 'multiple_choice/game_content.html', next_context)
+        else:
+            response = render(request, 'multiple_choice/result.html', context)
+        reserve_question(response, 'MC', inp_category, next_question_id)
+        return response
     
 class BudgetSimulationGameView(LoginRequiredMixin, View):
     template_name = 'budgetq/game.html'
@@ -430,26 +539,34 @@ class BudgetSimulationGameView(LoginRequiredMixin, View):
             category=db_category
         ).values_list('question_id', flat=True)
         
+        # Sample from the content snapshot when one is loaded, only progress is read from the database
+        store = content_store.get_store()
+        if store is not None:
+            return store.sample('BS', db_category, completed=set(completed_ids), difficulty=difficulty if difficulty in ['B', 'I', 'A'] else None)
+        
         # Base query - find simulations for this category that haven't been completed
-        query = BudgetSimulation.objects.filter(category=db_category).exclude(id__in=completed_ids)
+        query = BudgetSimulation.objects.filter(category=db_category).exclude(id__in=completed_ids).exclude(inactive('BS'))
         
         # Apply difficulty filter if specified
         if difficulty and difficulty in ['B', 'I', 'A']:
             query = query.filter(difficulty=difficulty)
             
+        # Only ids are loaded here, the simulation itself comes from its cached payload
+        simulation_ids = list(query.values_list('id', flat=True))
+
         # If there are no uncompleted questions, get all questions for this category
-        if not query.exists():
-            query = BudgetSimulation.objects.filter(category=db_category)
+        if not simulation_ids:
+            query = BudgetSimulation.objects.filter(category=db_category).exclude(inactive('BS'))
             if difficulty and difficulty in ['B', 'I', 'A']:
                 query = query.filter(difficulty=difficulty)
+            simulation_ids = list(query.values_list('id', flat=True))
                 
         # If there are still no questions, return None
-        if not query.exists():
+        if not simulation_ids:
             return None
             
         # Select a random simulation
-        simulation = random.choice(list(query))
-        return simulation
+        return get_payload('BS', random.choice(simulation_ids))
     
     def get(self, request, category, difficulty=None):
         # Get a random simulation for this category
@@ -459,12 +576,9 @@ class BudgetSimulationGameView(LoginRequiredMixin, View):
             messages.error(request, f"No budget simulations available for {category}.")
             return redirect(f'learn_{category}')
         
-        # Get all expenses for this simulation
-        expenses = Expense.objects.filter(BudgetSimulation=simulation)
-        
         context = {
             'simulation': simulation,
-            'expenses': expenses,
+            'expenses': simulation.expenses,
             'monthly_income': simulation.monthly_income,
             'difficulty': simulation.get_difficulty_display(),
             'category': category,
@@ -480,9 +594,12 @@ class BudgetSimulationGameView(LoginRequiredMixin, View):
         simulation_id = request.POST.get('simulation_id')
         selected_expenses = json.loads(request.POST.get('selected_expenses', '[]'))
         
-        simulation = get_object_or_404(BudgetSimulation, id=simulation_id)
-        all_expenses = Expense.objects.filter(BudgetSimulation=simulation)
-        
+        simulation = get_payload('BS', simulation_id)
+        if simulation is None:
+            raise Http404("Simulation not found")
+        # The payload carries every expense of the simulation
+        all_expenses = {expense.id: expense for expense in simulation.expenses}
+
         # Map URL category to database category code
         category_mapping = {
             'budget': 'BUD',
@@ -500,21 +617,25 @@ class BudgetSimulationGameView(LoginRequiredMixin, View):
         selected_expense_objects = []
         
         for expense_id in selected_expenses:
-            expense = get_object_or_404(Expense, id=expense_id)
+            expense = all_expenses.get(int(expense_id))
+            if expense is None:
+                raise Http404("Expense not found in this simulation")
             selected_expense_objects.append(expense)
             total_selected += float(expense.amount)
             if expense.essential:
                 essential_expenses.append(expense)
-        
+
         # Check if all essential expenses are included
-        all_essential_expenses = all_expenses.filter(essential=True)
-        missing_essential = [e for e in all_essential_expenses if e.id not in selected_expenses]
+        selected_ids = {e.id for e in selected_expense_objects}
+        missing_essential = [e for e in all_expenses.values() if e.essential and e.id not in selected_ids]
         
         # Check if the budget is within limits
         is_within_budget = total_selected <= float(simulation.monthly_income)
         
         # Determine if the user's budget is successful
         is_successful = is_within_budget and not missing_essential
+        # This answer's attempt is written with its award, or goes to the attempt buffer
+        attempt = ('BS', simulation.id, sorted(selected_ids), is_successful, answer_latency(request))
         
         # Generate feedback
         feedback = []
@@ -567,34 +688,18 @@ class BudgetSimulationGameView(LoginRequiredMixin, View):
             
             # Only add XP if this is the first time completing the simulation
             if created:
-                xp_mapping = {
-                    'B': 50,
-                    'I': 100,
-                    'A': 150,
-                }
-                xp = xp_mapping.get(simulation.difficulty, 0)
+                xp = XP_BY_DIFFICULTY.get(simulation.difficulty, 0)
                 xp_earned = xp
                 
-                # Update the user's XP based on category
-                user = request.user
-                xp_field_mapping = {
-                    'BUD': 'budget_xp',
-                    'INV': 'investing_xp',
-                    'SAV': 'savings_xp',
-                    'BAL': 'balance_sheet_xp',
-                    'CRD': 'credit_xp',
-                    'TAX': 'taxes_xp',
-                }
-                xp_field = xp_field_mapping.get(db_category)
-                
-                if xp_field:
-                    current_xp = getattr(user, xp_field)
-                    setattr(user, xp_field, current_xp + xp)
-                    user.save(update_fields=[xp_field])
+                # Record the award and add it to the user's XP
+                award_xp(request.user, db_category, xp, 'BS', simulation.id, attempts=[attempt])
+                attempt = None
                 
                 feedback.append(f"Great job! You've earned {xp} {simulation.get_category_display()} XP.")
             else:
                 feedback.append("Great job creating a balanced budget!")
+        if attempt:
+            record_attempt(request.user, *attempt)
         
         # Select a random feedback item if there are any
         random_feedback = None
@@ -653,7 +758,7 @@ class FlashCardGameView(LoginRequiredMixin, View):
     template_name = 'fcq/game.html'
     
     def get_random_card(self, category, user, exclude_id=None):
-        """Get a random flash card from the specified category that the user hasn't completed"""
+        """Get the flash card the user should review next in the specified category (scheduler.py)"""
         category_mapping = {
             'budget': 'BUD',
             'investing': 'INV',
@@ -663,37 +768,12 @@ class FlashCardGameView(LoginRequiredMixin, View):
             'taxes': 'TAX',
         }
         category = category_mapping[category]
-        
-        # First, get all completed card IDs for this user and category
-        completed_ids = QuestionProgress.objects.filter(
-            user=user,
-            question_type='FC',
-            category=category
-        ).values_list('question_id', flat=True)
-        
-        # Find cards in this category that haven't been completed
-        query = FlashCard.objects.filter(category=category)
-        
-        # Exclude current card if provided
-        if exclude_id:
-            query = query.exclude(id=exclude_id)
-            
-        # Exclude completed cards
-        available_cards = query.exclude(id__in=completed_ids)
-        
-        # If there are no uncompleted cards, get all cards in this category except current
-        if not available_cards.exists():
-            available_cards = FlashCard.objects.filter(category=category)
-            if exclude_id:
-                available_cards = available_cards.exclude(id=exclude_id)
-            
-        # If there are still no cards, return None
-        if not available_cards.exists():
+
+        card_id = next_card_id(user, category, exclude_id=exclude_id)
+        if card_id is None:
             return None
-            
-        # Select a random card
-        card = random.choice(list(available_cards))
-        return card
+        # Only the id is picked from the database, the card itself comes from its cached payload
+        return get_payload('FC', card_id)
     
     def get(self, request, category):
         # Check if we're processing a POST response (redirected after form submit)
@@ -738,10 +818,16 @@ class FlashCardGameView(LoginRequiredMixin, View):
         # Convert string to boolean to match model field
         selected_answer_bool = (selected_answer.lower() == 'true')
         
-        card = get_object_or_404(FlashCard, id=card_id)
+        card = get_payload('FC', card_id)
+        if card is None:
+            raise Http404("Flash card not found")
         
         # Check if the answer is correct
         is_correct = (selected_answer_bool == card.answer)
+        latency_ms = answer_latency(request)
+        # This answer's attempt is written with its award, or goes to the attempt buffer
+        attempt = ('FC', card.id, selected_answer, is_correct, latency_ms)
+        review_card(request.user, card, is_correct, latency_ms)
         
         # If this is first time completing this card and answer is correct
         if is_correct:
@@ -755,33 +841,14 @@ class FlashCardGameView(LoginRequiredMixin, View):
             
             # Only add XP if this is the first time completing the card
             if created:
-                # Determine which XP field to update based on category
-                xp_field_mapping = {
-                    'BUD': 'budget_xp',
-                    'INV': 'investing_xp',
-                    'SAV': 'savings_xp',
-                    'BAL': 'balance_sheet_xp',
-                    'CRD': 'credit_xp',
-                    'TAX': 'taxes_xp',
-                }
-                
-                # Get the field name to update
-                xp_field = xp_field_mapping.get(category)
-
                 # XP mapping based on difficulty
-                xp_mapping = {
-                    'B': 50,
-                    'I': 100,
-                    'A': 150,
-                }
-                xp = xp_mapping.get(card.difficulty, 0)
+                xp = XP_BY_DIFFICULTY.get(card.difficulty, 0)
                 
-                # Update the user's XP
-                if xp_field:
-                    user = request.user
-                    current_xp = getattr(user, xp_field)
-                    setattr(user, xp_field, current_xp + xp)
-                    user.save(update_fields=[xp_field])
+                # Record the award and add it to the user's XP
+                award_xp(request.user, category, xp, 'FC', card.id, attempts=[attempt])
+                attempt = None
+        if attempt:
+            record_attempt(request.user, *attempt)
         
         # AJAX request for card flipping
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -796,4 +863,96 @@ class FlashCardGameView(LoginRequiredMixin, View):
         request.session['is_correct'] = is_correct
         
         # Redirect to GET to avoid form resubmission issues
-        return redirect(reverse('play_flash_card', kwargs={'category': inp_category}))
\ No newline at end of file
+        return redirect(reverse('play_flash_card', kwargs={'category': inp_category}))
+
+class QuestionPackGameView(LoginRequiredMixin, View):
+    """
+    Quick play: the page loads its questions from the static question packs
+    (question_packs.py), so only the answers reach the server.
+    """
+    template_name = 'packs/game.html'
+
+    def get(self, request, category):
+        category_mapping = {
+            'budget': 'BUD',
+            'investing': 'INV',
+            'savings': 'SAV',
+            'balance': 'BAL',
+            'credit': 'CRD',
+            'taxes': 'TAX',
+        }
+        if category not in category_mapping:
+            raise Http404("Unknown category")
+        db_category = category_mapping[category]
+
+        # Completed questions of every pack type in one query, so the client can skip them
+        completed = {question_type: [] for question_type in PACK_TYPES}
+        progress = QuestionProgress.objects.filter(
+            user=request.user,
+            category=db_category,
+            question_type__in=PACK_TYPES
+        ).values_list('question_type', 'question_id')
+        for question_type, question_id in progress:
+            completed[question_type].append(question_id)
+
+        context = {
+            'category': dict(CATEGORIES)[db_category],
+            'category_code': category,
+            'db_category': db_category,
+            'completed': completed,
+            'manifest_url': static(f'{PACK_DIRECTORY}/{MANIFEST_NAME}'),
+            'static_url': static(''),
+        }
+        return render(request, self.template_name, context)
+
+
+class GradePackAnswerView(LoginRequiredMixin, View):
+    """Check one quick play answer, record progress and award XP like the other games."""
+
+    def post(self, request):
+        question_type = request.POST.get('question_type')
+        if question_type not in PACK_TYPES:
+            return JsonResponse({'error': 'Unknown question type'}, status=400)
+        question = get_payload(question_type, request.POST.get('question_id'))
+        if question is None:
+            raise Http404("Question not found")
+        answer = request.POST.get('answer', '')
+
+        # Check if the answer is correct
+        if question_type == 'MC':
+            correct_answer = question.answer
+            is_correct = (answer == correct_answer)
+        elif question_type == 'FIB':
+            correct_answer = question.missing_word
+            is_correct = (answer == correct_answer)
+        else:
+            correct_answer = 'True' if question.answer else 'False'
+            is_correct = ((answer.lower() == 'true') == question.answer)
+        # This answer's attempt is written with its award, or goes to the attempt buffer
+        attempt = (question_type, question.id, answer, is_correct, answer_latency(request))
+        if question_type == 'FC':
+            review_card(request.user, question, is_correct, attempt[-1])
+
+        xp_earned = 0
+        if is_correct:
+            _, created = QuestionProgress.objects.get_or_create(
+                user=request.user,
+                question_id=question.id,
+                question_type=question_type,
+                category=question.category
+            )
+
+            # Only add XP if this is the first time completing the question
+            if created:
+                xp_earned = XP_BY_DIFFICULTY.get(question.difficulty, 0)
+                award_xp(request.user, question.category, xp_earned, question_type, question.id, attempts=[attempt])
+                attempt = None
+        if attempt:
+            record_attempt(request.user, *attempt)
+
+        return JsonResponse({
+            'is_correct': is_correct,
+            'correct_answer': correct_answer,
+            'feedback': question.feedback,
+            'xp_earned': xp_earned,
+        })
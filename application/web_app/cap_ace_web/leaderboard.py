@@ -0,0 +1,198 @@
+"""
+Leaderboards.
+
+There is an overall board ranked by total_xp and one per category ranked by
+its XP column. The top of a board is read straight off the descending index
+on its column. A player's rank comes from LeaderboardScore, a count of the
+players at every XP value of every board: the players ahead of someone are the
+sum of the buckets above their XP, one range read of the (board, xp) key. XP
+is paid in multiples of 50, so a board has few buckets however many players
+it has.
+
+Awards don't touch the buckets: every player's awards would otherwise queue
+up on the few rows holding the popular XP values. xp.award_xp() queues a
+ScoreMove per board instead, and apply_score_moves() moves the players along
+in batches, locking the buckets in key order. It runs from
+`python manage.py apply_score_moves`, periodically like rollup_attempts; the
+leaderboard page only reads. Other players are ranked where the last run put
+them, the player reading the page at the XP they have now.
+
+rebuild_leaderboards() (`python manage.py rebuild_leaderboards`) recounts
+every bucket from the user table in bulk, after changes that bypass
+award_xp() such as admin edits or reconcile_xp.
+"""
+import operator
+from collections import Counter
+from functools import reduce
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from . import cache
+from .models import Cap_Ace_User, LeaderboardScore, ScoreMove, XP_FIELDS
+
+TOTAL_FIELD = 'total_xp'
+
+# Board -> XP column it ranks by
+BOARDS = {'ALL': TOTAL_FIELD, **XP_FIELDS}
+
+TOP_SIZE = 10
+# Top lists are read off the XP columns, which awards move right away; this
+# bounds how long a cached list lags behind them
+TOP_TIMEOUT = 60
+
+# Players whose queued moves are applied per transaction
+MOVE_BATCH_SIZE = 1000
+
+
+def _move_buckets(changes: Dict[Tuple[str, int], int]) -> None:
+    """
+    Add to the player counts of buckets by (board, xp), creating the missing
+    ones. The buckets are created and locked in (board, xp) order, so
+    concurrent moves queue up on them instead of deadlocking: three queries
+    however many buckets change. Buckets at 0 XP are not counted.
+    """
+    changes = {key: players for key, players in sorted(changes.items()) if players and key[1] > 0}
+    if not changes:
+        return
+    LeaderboardScore.objects.bulk_create(
+        [LeaderboardScore(board=board, xp=xp, players=0) for board, xp in changes], ignore_conflicts=True
+    )
+    keys = reduce(operator.or_, (Q(board=board, xp=xp) for board, xp in changes))
+    locked = list(
+        LeaderboardScore.objects.select_for_update().filter(keys).order_by('board', 'xp').values_list('id', flat=True)
+    )
+    by_change: Dict[int, List[Q]] = {}
+    for (board, xp), players in changes.items():
+        by_change.setdefault(players, []).append(Q(board=board, xp=xp))
+    change = Case(
+        *[When(reduce(operator.or_, group), then=Value(players)) for players, group in by_change.items()],
+        default=Value(0),
+    )
+    LeaderboardScore.objects.filter(id__in=locked).update(players=F('players') + change)
+
+
+def apply_score_moves(limit: int = MOVE_BATCH_SIZE) -> int:
+    """
+    Move the players with queued ScoreMoves between buckets, up to ``limit``
+    players in id order, in one transaction.
+
+    The players are locked first, so awards to them wait until their moves are
+    applied. Their buckets go from what the columns hold now less the queued
+    XP to what they hold now, and the moves are deleted. Each batch commits
+    whole, so a player is either moved by all of their queued XP or not at all.
+
+    Returns:
+        Number of players moved
+    """
+    # No savepoint: within a surrounding transaction a failure rolls that back too
+    with transaction.atomic(savepoint=False):
+        user_ids = list(
+            ScoreMove.objects.order_by('user_id').values_list('user_id', flat=True).distinct()[:limit]
+        )
+        if not user_ids:
+            return 0
+        current = {
+            row['id']: row
+            for row in Cap_Ace_User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values(
+                'id', *BOARDS.values()
+            )
+        }
+        moves = ScoreMove.objects.filter(user_id__in=user_ids)
+        changes: Counter = Counter()
+        for user_id, board, xp in moves.values_list('user_id', 'board').annotate(total=Sum('xp')).order_by():
+            if user_id in current and xp:
+                changes[(board, current[user_id][board] - xp)] -= 1
+                changes[(board, current[user_id][board])] += 1
+        moves.delete()
+        _move_buckets(changes)
+    return len(user_ids)
+
+
+def leave_leaderboards(user) -> None:
+    """
+    Take a player about to be deleted off every board, from the XP the
+    buckets count them at (their columns less their queued moves).
+    """
+    with transaction.atomic(savepoint=False):
+        current = Cap_Ace_User.objects.select_for_update().filter(pk=user.pk).values(*BOARDS.values()).first()
+        if current is None:
+            return
+        moves = ScoreMove.objects.filter(user=user)
+        queued = dict(moves.values_list('board').annotate(total=Sum('xp')).order_by())
+        moves.delete()
+        _move_buckets({(field, current[field] - queued.get(field, 0)): -1 for field in BOARDS.values()})
+    cache.invalidate('leaderboard')
+
+
+def top_players(field: str, limit: int = TOP_SIZE) -> List[Dict[str, Any]]:
+    """
+    The ``limit`` players with the most XP in a board column, each with their
+    rank (players with the same XP share one).
+    """
+    def compute():
+        rows = list(
+            Cap_Ace_User.objects
+            .filter(**{f'{field}__gt': 0})
+            .order_by(f'-{field}', 'id')
+            .values('id', 'username', xp=F(field))[:limit]
+        )
+        for position, row in enumerate(rows):
+            same = position and rows[position - 1]['xp'] == row['xp']
+            row['rank'] = rows[position - 1]['rank'] if same else position + 1
+        return rows
+    return cache.get_or_compute('leaderboard', (field, limit), compute, timeout=TOP_TIMEOUT)
+
+
+def player_rank(user, field: str) -> Tuple[Optional[int], int]:
+    """
+    A player's rank on a board (None without XP) and the number of players on
+    it, in two queries and without applying any moves.
+
+    The player is ranked at the XP they have now against the buckets as the
+    last apply_score_moves() left them. Awards only add XP, so the buckets
+    count the player at or below it, never ahead of themselves; a player whose
+    first award is still queued isn't counted yet and is added to the total.
+    """
+    xp = getattr(user, field)
+    queued = ScoreMove.objects.filter(user=user, board=field).aggregate(total=Sum('xp'))['total'] or 0
+    counts = LeaderboardScore.objects.filter(board=field).aggregate(
+        ahead=Sum('players', filter=Q(xp__gt=xp)),
+        players=Sum('players'),
+    )
+    players = counts['players'] or 0
+    if xp > 0 and xp - queued <= 0:
+        players += 1
+    rank = (counts['ahead'] or 0) + 1 if xp > 0 else None
+    return rank, players
+
+
+def rebuild_leaderboards() -> int:
+    """
+    Recompute total_xp from the category columns and recount every bucket:
+    one UPDATE and one grouped aggregate per board. Queued moves are dropped,
+    as the recount already includes them.
+
+    Returns:
+        Number of buckets written
+    """
+    total = reduce(operator.add, (F(field) for field in XP_FIELDS.values()))
+    with transaction.atomic():
+        ScoreMove.objects.all().delete()
+        Cap_Ace_User.objects.exclude(**{TOTAL_FIELD: total}).update(**{TOTAL_FIELD: total})
+        LeaderboardScore.objects.all().delete()
+        buckets = [
+            LeaderboardScore(board=field, xp=xp, players=players)
+            for field in BOARDS.values()
+            for xp, players in (
+                Cap_Ace_User.objects
+                .filter(**{f'{field}__gt': 0})
+                .values_list(field)
+                .annotate(players=Count('id'))
+                .order_by()
+            )
+        ]
+        LeaderboardScore.objects.bulk_create(buckets, batch_size=1000)
+    cache.invalidate('leaderboard')
+    return len(buckets)
@@ -0,0 +1,35 @@
+"""
+Move the players awarded XP since the last run between the leaderboard score
+buckets (see leaderboard.py).
+
+    python manage.py apply_score_moves
+
+Run it periodically (e.g. every minute from cron, next to rollup_attempts):
+the leaderboard page only reads, so other players' ranks move with each run.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...leaderboard import MOVE_BATCH_SIZE, apply_score_moves
+
+
+class Command(BaseCommand):
+    help = 'Apply the queued leaderboard moves of players awarded XP since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=MOVE_BATCH_SIZE,
+                            help=f'Players moved per transaction (default: {MOVE_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        start = time.perf_counter()
+        total = 0
+        while True:
+            moved = apply_score_moves(options['batch_size'])
+            if not moved:
+                break
+            total += moved
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Moved {total} players in {elapsed:.2f}s"))
@@ -0,0 +1,33 @@
+"""
+Rebuild the daily activity rollups (see activity.py) from question progress
+and the XP ledger.
+
+    python manage.py backfill_activity
+    python manage.py backfill_activity --batch-size 5000
+
+Awards keep the rollups up to date as they happen; run this after progress or
+ledger rows were loaded or edited some other way (imports, reconcile_xp
+--backfill, bulk loads).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...activity import rebuild_activity
+
+
+class Command(BaseCommand):
+    help = 'Recompute every player\'s daily completions, XP and streaks from progress and the XP ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Players rebuilt per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        start = time.perf_counter()
+        days = rebuild_activity(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {days} daily activity rows in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,145 @@
+"""
+Benchmark the leaderboards (see leaderboard.py) at a large number of players.
+
+    python manage.py benchmark_leaderboard                 # 1M players
+    python manage.py benchmark_leaderboard --users 100000
+
+Seeds a throwaway test database with players holding random XP in every
+category (no question histories, so a million players seed in a few
+minutes), rebuilds the leaderboards, then times reading the top of a board,
+looking up a player's rank and awarding XP, and reports p50/p95/p99 latency
+and query counts like benchmark_views. Applying the leaderboard moves the
+awards queued is timed once, as one batch.
+"""
+import random
+import time
+from typing import Callable, Dict, Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from ... import cache
+from ...leaderboard import BOARDS, apply_score_moves, player_rank, rebuild_leaderboards, top_players
+from ...models import XP_FIELDS
+from ...xp import XP_BY_DIFFICULTY, award_xp
+from .benchmark_views import summarize
+
+User = get_user_model()
+
+
+def seed_players(count: int, seed: int = 0, chunk_size: int = 10000) -> None:
+    """Players with XP in multiples of 50, a long tail of casual players and a few heavy ones."""
+    rng = random.Random(seed)
+    fields = list(XP_FIELDS.values())
+    for start in range(0, count, chunk_size):
+        User.objects.bulk_create([
+            User(
+                username=f'leaderboard_{number}',
+                password='!',
+                **{field: 50 * int((rng.paretovariate(1.2) - 1) * 10) for field in fields},
+            )
+            for number in range(start, min(start + chunk_size, count))
+        ], batch_size=chunk_size)
+
+
+def time_operation(operation: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """Run an operation repeatedly and summarize its latency and query counts."""
+    timings, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            operation()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+    return summarize(timings, queries)
+
+
+def run_benchmark(iterations: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Time the leaderboard operations on the seeded players.
+
+    Returns:
+        A report dictionary with per-operation statistics
+    """
+    rng = random.Random(seed)
+    low = User.objects.order_by('id').values_list('id', flat=True).first()
+    high = User.objects.order_by('-id').values_list('id', flat=True).first()
+    boards = list(BOARDS.values())
+    categories = list(XP_FIELDS)
+
+    def random_player():
+        return User.objects.filter(id__gte=rng.randint(low, high)).order_by('id').first()
+
+    def top_cold():
+        cache.invalidate('leaderboard')
+        top_players(rng.choice(boards))
+
+    players = [random_player() for _ in range(iterations)]
+    ranks = iter(players)
+    awards = iter(players)
+    operations = {
+        'top_players:cold': top_cold,
+        'top_players:cached': lambda: top_players(rng.choice(boards)),
+        'player_rank': lambda: player_rank(next(ranks), rng.choice(boards)),
+        'award_xp': lambda: award_xp(next(awards), rng.choice(categories), rng.choice(list(XP_BY_DIFFICULTY.values()))),
+    }
+    routes = {name: time_operation(operation, iterations) for name, operation in operations.items()}
+
+    # The moves the awards queued, applied in one batch as the periodic job would
+    start = time.perf_counter()
+    moved = apply_score_moves()
+    moves_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buckets = rebuild_leaderboards()
+    rebuild_seconds = time.perf_counter() - start
+    return {
+        'routes': routes,
+        'moves': {'seconds': moves_seconds, 'players': moved},
+        'rebuild': {'seconds': rebuild_seconds, 'buckets': buckets},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark leaderboard reads, rank lookups and XP awards against a large seeded player base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Number of players to seed')
+        parser.add_argument('--iterations', type=int, default=200, help='Runs per operation')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for seeding and the operations')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['users']} players...")
+            start = time.perf_counter()
+            seed_players(options['users'], options['seed'])
+            seeded = time.perf_counter()
+            buckets = rebuild_leaderboards()
+            self.stdout.write(
+                f"Seeded in {seeded - start:.1f}s, built {buckets} buckets in {time.perf_counter() - seeded:.2f}s"
+            )
+            report = run_benchmark(options['iterations'], options['seed'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write("-" * 60)
+        self.stdout.write(f"{'operation':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}")
+        for name, stats in report['routes'].items():
+            self.stdout.write(
+                f"{name:<22}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                f"{stats['queries_max']:>9}"
+            )
+        self.stdout.write(
+            f"Applied the queued moves of {report['moves']['players']} players in {report['moves']['seconds']:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {report['rebuild']['buckets']} buckets in {report['rebuild']['seconds']:.2f}s"
+        ))
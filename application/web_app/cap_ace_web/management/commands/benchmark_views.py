@@ -0,0 +1,296 @@
+"""
+Benchmark the game, learning and category views against a seeded database.
+
+Seeds a throwaway test database at a configurable scale, drives every game
+GET/POST, the learning dashboard, the category pages and the leaderboards
+through the Django test client, and writes p50/p95/p99 latency and query
+counts to a JSON report. With --compare the report is checked against a stored
+baseline and the command fails if any route regressed.
+
+Set DB_LATENCY_QUERY_MS/DB_LATENCY_CONNECT_MS to run on the latency backend and
+see what each query costs with production round trips.
+"""
+import io
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from ...models import (MultipleChoice, QuestionProgress, FillInTheBlank, BudgetSimulation, Expense, FlashCard,
+                       CATEGORIES)
+
+User = get_user_model()
+
+# Number of questions (across all five types) seeded for each scale
+SCALES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+# URL slugs used by the game views for each category code
+CATEGORY_SLUGS = {
+    'BUD': 'budget',
+    'INV': 'investing',
+    'SAV': 'savings',
+    'BAL': 'balance',
+    'CRD': 'credit',
+    'TAX': 'taxes',
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(timings_ms: List[float], query_counts: List[int]) -> Dict[str, Any]:
+    """Reduce raw per-request samples for one route to the reported statistics."""
+    summary = {'requests': len(timings_ms)}
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(timings_ms, pct), 3)
+    summary['mean_ms'] = round(sum(timings_ms) / len(timings_ms), 3) if timings_ms else 0
+    summary['queries_p50'] = percentile(query_counts, 50)
+    summary['queries_max'] = max(query_counts) if query_counts else 0
+    return summary
+
+
+def compare_reports(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare a report with a baseline report.
+
+    A route regresses when its p95 latency grows by more than ``threshold``
+    (a fraction, e.g. 0.2 for 20%) or when it issues more queries than before.
+
+    Returns:
+        A list of human readable regression messages (empty if none)
+    """
+    regressions = []
+    for route, current in report['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if previous is None:
+            continue
+
+        allowed_ms = previous['p95_ms'] * (1 + threshold)
+        if current['p95_ms'] > allowed_ms:
+            regressions.append(
+                f"{route}: p95 {current['p95_ms']:.2f}ms exceeds baseline {previous['p95_ms']:.2f}ms "
+                f"by more than {threshold:.0%}"
+            )
+        if current['queries_max'] > previous['queries_max']:
+            regressions.append(
+                f"{route}: {current['queries_max']} queries, baseline was {previous['queries_max']}"
+            )
+    return regressions
+
+
+def seed_dataset(num_questions: int, num_users: int, seed: int = 0, stdout=None) -> None:
+    """
+    Seed questions of every type and users with QuestionProgress histories.
+
+    Delegates to the seed_synthetic command, so benchmark data matches what is
+    used for capacity planning.
+    """
+    call_command(
+        'seed_synthetic',
+        questions=num_questions,
+        users=num_users,
+        seed=seed,
+        stdout=stdout or io.StringIO(),
+    )
+
+
+def _timed_request(client: Client, method: str, url: str, data: Optional[Dict[str, Any]] = None,
+                   ajax: bool = False):
+    """Issue a single request and return (elapsed_ms, query_count, status_code)."""
+    headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if ajax else {}
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        if method == 'GET':
+            response = client.get(url, **headers)
+        else:
+            response = client.post(url, data or {}, **headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms, len(queries), response.status_code
+
+
+def _route_requests(rng: random.Random, category: str) -> List[Dict[str, Any]]:
+    """Build the list of requests (one per route) for a single benchmark iteration."""
+    slug = CATEGORY_SLUGS[category]
+    mc_id, mc_answer = rng.choice(list(
+        MultipleChoice.objects.filter(category=category).values_list('id', 'answer')[:50]
+    ))
+    fib_id, fib_word = rng.choice(list(
+        FillInTheBlank.objects.filter(category=category).values_list('id', 'missing_word')[:50]
+    ))
+    card_id = rng.choice(list(FlashCard.objects.filter(category=category).values_list('id', flat=True)[:50]))
+    simulation_id = rng.choice(list(
+        BudgetSimulation.objects.filter(category=category).values_list('id', flat=True)[:50]
+    ))
+    expense_ids = list(Expense.objects.filter(BudgetSimulation_id=simulation_id).values_list('id', flat=True))
+
+    return [
+        {'route': 'learn', 'method': 'GET', 'url': reverse('learn')},
+        {'route': 'learn_category', 'method': 'GET', 'url': reverse(f'learn_{slug}')},
+        {'route': 'leaderboard', 'method': 'GET', 'url': reverse('leaderboard')},
+        {'route': 'leaderboard_category', 'method': 'GET',
+         'url': reverse('leaderboard_category', kwargs={'category': slug})},
+        {'route': 'play_multiple_choice:GET', 'method': 'GET',
+         'url': reverse('play_multiple_choice', kwargs={'category': slug})},
+        {'route': 'play_multiple_choice:POST', 'method': 'POST',
+         'url': reverse('play_multiple_choice', kwargs={'category': slug}),
+         'data': {'question_id': mc_id, 'answer': mc_answer if rng.random() < 0.7 else 'wrong'}},
+        {'route': 'play_fill_blank:GET', 'method': 'GET',
+         'url': reverse('play_fill_blank', kwargs={'category': slug})},
+        {'route': 'play_fill_blank:POST', 'method': 'POST',
+         'url': reverse('play_fill_blank', kwargs={'category': slug}),
+         'data': {'question_id': fib_id, 'missing_word': fib_word if rng.random() < 0.7 else 'wrong'}},
+        {'route': 'play_flash_card:GET', 'method': 'GET',
+         'url': reverse('play_flash_card', kwargs={'category': slug})},
+        {'route': 'play_flash_card:POST', 'method': 'POST', 'ajax': True,
+         'url': reverse('play_flash_card', kwargs={'category': slug}),
+         'data': {'card_id': card_id, 'answer': rng.choice(['True', 'False'])}},
+        {'route': 'play_budget_simulation:GET', 'method': 'GET',
+         'url': reverse('play_budget_simulation', kwargs={'category': slug})},
+        {'route': 'play_budget_simulation:POST', 'method': 'POST', 'ajax': True,
+         'url': reverse('play_budget_simulation', kwargs={'category': slug}),
+         'data': {'simulation_id': simulation_id,
+                  'selected_expenses': json.dumps(rng.sample(expense_ids, rng.randint(1, len(expense_ids))))}},
+    ]
+
+
+def run_benchmark(user, iterations: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Drive every benchmarked route ``iterations`` times as ``user``.
+
+    Returns:
+        A report dictionary with per-route statistics
+    """
+    rng = random.Random(seed)
+    client = Client()
+    client.force_login(user)
+
+    samples: Dict[str, Dict[str, List]] = {}
+    errors: Dict[str, int] = {}
+    category_codes = [code for code, _ in CATEGORIES]
+
+    for iteration in range(iterations):
+        category = category_codes[iteration % len(category_codes)]
+        for request in _route_requests(rng, category):
+            elapsed_ms, query_count, status = _timed_request(
+                client, request['method'], request['url'], request.get('data'), request.get('ajax', False)
+            )
+            route_samples = samples.setdefault(request['route'], {'timings': [], 'queries': []})
+            route_samples['timings'].append(elapsed_ms)
+            route_samples['queries'].append(query_count)
+            if status >= 400:
+                errors[request['route']] = errors.get(request['route'], 0) + 1
+
+    routes = {}
+    for route, route_samples in samples.items():
+        routes[route] = summarize(route_samples['timings'], route_samples['queries'])
+        routes[route]['errors'] = errors.get(route, 0)
+    return {'routes': routes}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark view latency and query counts against a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=list(SCALES),
+            default='1k',
+            help='Number of questions to seed (split across all question types)'
+        )
+        parser.add_argument('--users', type=int, default=10_000, help='Number of users to seed')
+        parser.add_argument('--iterations', type=int, default=30, help='Requests per route')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for seeding and request order')
+        parser.add_argument('--output', type=str, default='benchmark_report.json', help='Path of the JSON report')
+        parser.add_argument('--compare', type=str, help='Baseline report to compare against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Allowed p95 latency growth over the baseline, as a fraction (default 0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the benchmark database between runs (skips seeding if it is already populated)'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], 'r') as file:
+                    baseline = json.load(file)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f"Could not read baseline {options['compare']}: {e}")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not options['keepdb'] or not MultipleChoice.objects.exists():
+                seed_dataset(SCALES[options['scale']], options['users'], options['seed'], stdout=self.stdout)
+
+            # Benchmark as the user with the longest history, the worst case for the exclusion queries
+            user_id = (
+                QuestionProgress.objects.values('user').order_by().annotate(n=Count('id'))
+                .order_by('-n').values_list('user', flat=True).first()
+            )
+            user = User.objects.get(pk=user_id) if user_id else User.objects.create_user('bench_user_empty', password='!')
+
+            self.stdout.write(f"Running {options['iterations']} iterations per route...")
+            report = run_benchmark(user, options['iterations'], options['seed'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report['meta'] = {
+            'scale': options['scale'],
+            'users': options['users'],
+            'iterations': options['iterations'],
+            'vendor': connection.vendor,
+            # Set when running on the latency backend, see db_backends/latency
+            'db_latency': connection.settings_dict.get('LATENCY'),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+        self.stdout.write("-" * 50)
+        self.stdout.write(f"{'route':<32}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}")
+        for route, stats in sorted(report['routes'].items()):
+            self.stdout.write(
+                f"{route:<32}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                f"{stats['queries_max']:>9}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if baseline is not None:
+            regressions = compare_reports(report, baseline, options['threshold'])
+            if regressions:
+                for message in regressions:
+                    self.stdout.write(self.style.ERROR(f"  - {message}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
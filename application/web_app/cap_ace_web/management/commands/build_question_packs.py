@@ -0,0 +1,32 @@
+"""
+Build the static question packs for the quick play game (see question_packs.py).
+
+Runs in build.sh after collectstatic, so the packs are deployed with the
+other static files:
+
+    python manage.py build_question_packs
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...question_packs import build_packs, PACK_DIRECTORY
+
+
+class Command(BaseCommand):
+    help = 'Write per category, type and difficulty question packs into the static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default=os.path.join(settings.STATIC_ROOT, PACK_DIRECTORY),
+                            help='Directory to write the packs to (default: STATIC_ROOT/packs)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        manifest = build_packs(options['output'])
+        count = sum(len(difficulties) for types in manifest['packs'].values() for difficulties in types.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} question packs (version {manifest['version']}) to {options['output']} "
+            f"in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,134 @@
+"""
+Calibrate question difficulty labels from the answer attempt log (see calibration.py).
+
+    python manage.py calibrate_difficulty                   # report only
+    python manage.py calibrate_difficulty --discrimination  # 2PL instead of Rasch
+    python manage.py calibrate_difficulty --apply           # write the relabels
+
+Prints the questions whose fitted difficulty falls under another label than
+the one they have. With --apply the new labels are written in bulk to the
+question tables and the registry. XP already awarded is left as it is; new
+completions pay out by the new label.
+"""
+import time
+from collections import Counter
+
+import numpy as np
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ...calibration import ADVANCED_ABOVE, BEGINNER_BELOW, first_responses, fit, suggested_relabels
+from ...models import AnswerAttempt, Question, DIFFICULTIES
+from ...registry import REGISTRY_MODELS
+from ...signals import invalidate_content
+
+RESPONSE_DTYPE = np.dtype([('player', np.int64), ('item', np.int64), ('correct', np.bool_)])
+
+
+class Command(BaseCommand):
+    help = 'Fit question difficulty to the answer attempts and report (or apply) suggested relabels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--discrimination', action='store_true',
+                            help='Also fit how well each question separates strong and weak players (2PL)')
+        parser.add_argument('--min-responses', type=int, default=30,
+                            help='Only relabel questions answered by at least this many players (default: 30)')
+        parser.add_argument('--beginner-below', type=float, default=BEGINNER_BELOW,
+                            help=f'Difficulty (logits) under which a question is Beginner (default: {BEGINNER_BELOW})')
+        parser.add_argument('--advanced-above', type=float, default=ADVANCED_ABOVE,
+                            help=f'Difficulty (logits) over which a question is Advanced (default: {ADVANCED_ABOVE})')
+        parser.add_argument('--max-iterations', type=int, default=100,
+                            help='Most fitting iterations (default: 100)')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Relabels to list in the report (default: 50, 0 for all)')
+        parser.add_argument('--apply', action='store_true',
+                            help='Write the suggested labels')
+
+    def handle(self, *args, **options):
+        if options['beginner_below'] > options['advanced_above']:
+            raise CommandError('--beginner-below must not be above --advanced-above')
+
+        start = time.perf_counter()
+        attempts = (
+            AnswerAttempt.objects
+            .filter(question__isnull=False)
+            .order_by('id')
+            .values_list('user_id', 'question_id', 'is_correct')
+            .iterator(chunk_size=20000)
+        )
+        raw = np.fromiter(attempts, dtype=RESPONSE_DTYPE)
+        if not len(raw):
+            self.stdout.write("No answer attempts to calibrate from")
+            return
+        responses = first_responses(raw['player'], raw['item'], raw['correct'])
+        loaded = time.perf_counter()
+
+        calibration = fit(responses, options['discrimination'], options['max_iterations'])
+        fitted = time.perf_counter()
+
+        questions = {
+            pk: (question_type, object_id, difficulty)
+            for pk, question_type, object_id, difficulty
+            in Question.objects.values_list('id', 'question_type', 'object_id', 'difficulty').iterator()
+        }
+        relabels = suggested_relabels(
+            calibration, responses, {pk: question[2] for pk, question in questions.items()},
+            options['min_responses'], options['beginner_below'], options['advanced_above'],
+        )
+
+        self.stdout.write(
+            f"Fitted {len(responses.item_ids)} questions and {len(responses.player_ids)} players from "
+            f"{len(raw)} attempts ({len(responses.correct)} first attempts) in {calibration.iterations} iterations; "
+            f"loading {loaded - start:.2f}s, fitting {fitted - loaded:.2f}s"
+        )
+        self.report(relabels, questions, options['limit'])
+
+        if options['apply'] and relabels:
+            self.apply(relabels, questions)
+            self.stdout.write(self.style.SUCCESS(f"Relabelled {len(relabels)} questions"))
+        elif relabels:
+            self.stdout.write("Run with --apply to write these labels")
+
+    def report(self, relabels, questions, limit):
+        if not relabels:
+            self.stdout.write(self.style.SUCCESS("Every calibrated question already has the right label"))
+            return
+        names = dict(DIFFICULTIES)
+        transitions = Counter((change['current'], change['suggested']) for change in relabels.values())
+        self.stdout.write(f"{len(relabels)} questions to relabel:")
+        for (current, suggested), count in sorted(transitions.items()):
+            self.stdout.write(f"  {names[current]} -> {names[suggested]}: {count}")
+
+        self.stdout.write("-" * 72)
+        self.stdout.write(f"{'Type':<5}{'Id':>8}  {'Now':<4}{'New':<4}{'Difficulty':>11}{'Discrim.':>10}{'Responses':>11}")
+        # Furthest from their label first
+        ordered = sorted(relabels.items(), key=lambda item: -abs(item[1]['difficulty']))
+        for pk, change in ordered[:limit or None]:
+            question_type, object_id, _ = questions[pk]
+            self.stdout.write(
+                f"{question_type:<5}{object_id:>8}  {change['current']:<4}{change['suggested']:<4}"
+                f"{change['difficulty']:>+11.2f}{change['discrimination']:>10.2f}{change['responses']:>11}"
+            )
+        if limit and len(ordered) > limit:
+            self.stdout.write(f"... and {len(ordered) - limit} more")
+
+    def apply(self, relabels, questions):
+        by_type = {}
+        for pk, change in relabels.items():
+            question_type, object_id, _ = questions[pk]
+            by_type.setdefault(question_type, []).append((object_id, change['suggested']))
+
+        with transaction.atomic():
+            for question_type, changes in by_type.items():
+                model = apps.get_model('cap_ace_web', REGISTRY_MODELS[question_type])
+                model.objects.bulk_update(
+                    [model(id=object_id, difficulty=label) for object_id, label in changes], ['difficulty'],
+                    batch_size=1000
+                )
+            Question.objects.bulk_update(
+                [Question(id=pk, difficulty=change['suggested']) for pk, change in relabels.items()], ['difficulty'],
+                batch_size=1000
+            )
+        # bulk_update sends no signals
+        invalidate_content()
@@ -0,0 +1,235 @@
+"""
+Check that the hot queries of the game and learning views use their indexes.
+
+Seeds a throwaway test database (1M questions by default, the scale the index
+set in migrations 0016 and 0029 was designed for), refreshes planner
+statistics, then runs EXPLAIN on every hot lookup and fails if the plan does
+not use the expected index. Each query is also timed so the report doubles as a
+benchmark of the lookups on their own.
+"""
+import statistics
+import time
+from typing import List, Dict, Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ...models import (MultipleChoice, QuestionProgress, FillInTheBlank, BudgetSimulation, Expense, FlashCard,
+                       FlashCardReview, Question)
+from ...quiz_views import QUIZ_TYPES
+from ...registry import COMPLETABLE_TYPES, inactive
+from ...scheduler import card_id_range
+from .benchmark_views import SCALES, seed_dataset
+
+User = get_user_model()
+
+
+def unique_index(model, columns: List[str]) -> str:
+    """Name of the index behind a unique_together, which the database backend names."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return next(
+        name for name, constraint in constraints.items()
+        if constraint['unique'] and constraint['index'] and constraint['columns'] == columns
+    )
+
+
+def hot_queries(user, category: str) -> List[Dict[str, Any]]:
+    """
+    The lookups the views run on every request, with the indexes they must use.
+    A tuple stands for interchangeable indexes, any one of which will do: the
+    correlated probes of the completed and deactivated questions can as well
+    seek the unique index on the same columns.
+
+    Mirrors the querysets of game_views.py (random_question_id and the budget
+    simulation pick), scheduler.py (next_card_id), quiz_views.py
+    (question_candidates), views.py and category_views.py.
+    """
+    def completed_ids(question_type):
+        return QuestionProgress.objects.filter(
+            user=user, question_type=question_type, category=category
+        ).values_list('question_id', flat=True)
+
+    def flagged_pick(model, question_type):
+        # The category's playable ids, each flagged when the user has completed it
+        completed = QuestionProgress.objects.filter(
+            user=user, question_type=question_type, category=category, question_id=OuterRef('pk')
+        )
+        return model.objects.filter(category=category).exclude(inactive(question_type)).values_list(
+            'id', Exists(completed)
+        )
+
+    completed_probe = ('qp_user_cat_type_qid_idx',
+                       unique_index(QuestionProgress, ['user_id', 'question_id', 'question_type']))
+    inactive_probe = ('question_inactive_idx', unique_index(Question, ['question_type', 'object_id']))
+
+    simulation_id = BudgetSimulation.objects.filter(category=category).values_list('id', flat=True).first()
+    low, high = card_id_range(category)
+    pivot = (low + high) // 2 if low is not None else 0
+
+    return [
+        {
+            'name': 'completed_ids',
+            'queryset': completed_ids('MC'),
+            'indexes': ['qp_user_cat_type_qid_idx'],
+        },
+        {
+            'name': 'category_progress',
+            'queryset': QuestionProgress.objects.filter(user=user, category=category)
+            .values('question_type').annotate(completed=Count('question_id')),
+            'indexes': ['qp_user_cat_type_qid_idx'],
+        },
+        {
+            'name': 'dashboard_progress',
+            'queryset': QuestionProgress.objects.filter(user=user)
+            .values_list('category').annotate(completed=Count('question_id')).order_by(),
+            'indexes': ['qp_user_cat_type_qid_idx'],
+        },
+        {
+            'name': 'dashboard_totals',
+            'queryset': Question.objects.filter(is_active=True, question_type__in=COMPLETABLE_TYPES)
+            .values_list('category').annotate(total=Count('id')).order_by(),
+            'indexes': ['question_cat_active_idx'],
+        },
+        {
+            'name': 'quiz_candidates',
+            'queryset': Question.objects.filter(category=category, is_active=True, question_type__in=list(QUIZ_TYPES))
+            .exclude(Exists(QuestionProgress.objects.filter(user=user, registry=OuterRef('pk'))))
+            .values_list('question_type', 'object_id'),
+            'indexes': ['question_cat_active_idx', 'qp_user_registry_idx'],
+        },
+        {
+            'name': 'mc_pick',
+            'queryset': flagged_pick(MultipleChoice, 'MC'),
+            'indexes': ['mc_category_difficulty_idx', completed_probe, inactive_probe],
+        },
+        {
+            'name': 'fib_pick',
+            'queryset': flagged_pick(FillInTheBlank, 'FIB'),
+            'indexes': ['fib_category_difficulty_idx', completed_probe, inactive_probe],
+        },
+        {
+            'name': 'fc_due',
+            'queryset': FlashCardReview.objects.filter(user=user, category=category)
+            .exclude(inactive('FC', 'card_id')).order_by('due_at').values_list('card_id', 'due_at')[:1],
+            'indexes': ['review_user_cat_due_idx', inactive_probe],
+        },
+        {
+            'name': 'fc_new',
+            'queryset': FlashCard.objects.filter(category=category, id__gte=pivot)
+            .exclude(Exists(FlashCardReview.objects.filter(user=user, card=OuterRef('pk'))))
+            .exclude(inactive('FC')).order_by('id').values_list('id', flat=True)[:1],
+            'indexes': [unique_index(FlashCardReview, ['user_id', 'card_id']), inactive_probe],
+        },
+        {
+            'name': 'bs_available',
+            'queryset': BudgetSimulation.objects.filter(category=category, difficulty='A')
+            .exclude(id__in=completed_ids('BS')).exclude(inactive('BS')).values_list('id', flat=True),
+            'indexes': ['bs_category_difficulty_idx', completed_probe, inactive_probe],
+        },
+        {
+            'name': 'essential_total',
+            'queryset': Expense.objects.filter(BudgetSimulation_id=simulation_id, essential=True)
+            .values('BudgetSimulation').annotate(total=Sum('amount')),
+            'indexes': ['expense_essential_idx'],
+        },
+    ]
+
+
+def refresh_statistics() -> None:
+    """Give the planner up to date statistics, as autovacuum would in production."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # VACUUM also sets the visibility map that index-only scans depend on
+            cursor.execute('VACUUM ANALYZE')
+        else:
+            cursor.execute('ANALYZE')
+
+
+def check_plans(user, category: str, repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    EXPLAIN and time every hot query.
+
+    Returns:
+        One result per query with its plan, the expected indexes missing from
+        the plan and the median run time in milliseconds
+    """
+    results = []
+    for query in hot_queries(user, category):
+        plan = query['queryset'].explain()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # all() clones the queryset so every run hits the database
+            list(query['queryset'].all())
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append({
+            'name': query['name'],
+            'plan': plan,
+            'indexes': query['indexes'],
+            'missing': [
+                ' or '.join(names) for names in
+                (index if isinstance(index, tuple) else (index,) for index in query['indexes'])
+                if not any(name in plan for name in names)
+            ],
+            'median_ms': round(statistics.median(timings), 3) if timings else 0,
+        })
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Assert that hot queries use their indexes on a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=list(SCALES),
+            default='1m',
+            help='Number of questions to seed (split across all question types)'
+        )
+        parser.add_argument('--users', type=int, default=10_000, help='Number of users to seed')
+        parser.add_argument('--category', type=str, default='BUD', help='Category code to query')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for seeding')
+        parser.add_argument('--show-plans', action='store_true', help='Print every query plan')
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the database between runs (skips seeding if it is already populated)'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not options['keepdb'] or not MultipleChoice.objects.exists():
+                seed_dataset(SCALES[options['scale']], options['users'], options['seed'], stdout=self.stdout)
+            refresh_statistics()
+
+            # The user with the longest history has the largest exclusion lists
+            user_id = (
+                QuestionProgress.objects.values('user').order_by().annotate(n=Count('id'))
+                .order_by('-n').values_list('user', flat=True).first()
+            )
+            if user_id is None:
+                raise CommandError('No question progress was seeded')
+            results = check_plans(User.objects.get(pk=user_id), options['category'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write("-" * 60)
+        self.stdout.write(f"{'query':<24}{'median ms':>12}  index use")
+        for result in results:
+            status = 'ok' if not result['missing'] else f"MISSING {', '.join(result['missing'])}"
+            self.stdout.write(f"{result['name']:<24}{result['median_ms']:>12.2f}  {status}")
+            if options['show_plans'] or result['missing']:
+                self.stdout.write(result['plan'])
+
+        failures = [result['name'] for result in results if result['missing']]
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries don't use their indexes: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} hot queries use their indexes"))
@@ -0,0 +1,59 @@
+"""
+Compile every question into a content snapshot (see content_store.py).
+
+    python manage.py compile_content --output /var/cap_ace/content.snapshot
+
+Questions deactivated in the registry are left out, so the games never pick
+them (answering one still works, its payload comes from the cache then).
+Run it after deploying content changes; processes with CONTENT_SNAPSHOT_PATH
+pointing at the output pick the new version up within
+CONTENT_SNAPSHOT_CHECK_SECONDS.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import cache
+from ...content_store import SNAPSHOT_NAMESPACE, write_snapshot
+from ...payloads import PAYLOAD_FIELDS, build_payloads, serialize
+from ...registry import inactive_ids
+
+
+def snapshot_records():
+    """(type, id, category, difficulty, payload) for every question not deactivated in the registry"""
+    for question_type in PAYLOAD_FIELDS:
+        skipped = inactive_ids(question_type)
+        for pk, payload in build_payloads(question_type).items():
+            if pk in skipped:
+                continue
+            yield question_type, pk, payload['category'], payload['difficulty'], serialize(payload).encode()
+
+
+class Command(BaseCommand):
+    help = 'Compile all questions into a memory-mapped content snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default=settings.CONTENT_SNAPSHOT_PATH,
+                            help='Snapshot file to write (default: CONTENT_SNAPSHOT_PATH)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError('Pass --output or set CONTENT_SNAPSHOT_PATH')
+
+        start = time.perf_counter()
+        # Read before building, so edits made meanwhile leave the snapshot stale
+        content_version = cache.namespace_version(SNAPSHOT_NAMESPACE)
+        counts = {}
+        records = []
+        for record in snapshot_records():
+            counts[record[0]] = counts.get(record[0], 0) + 1
+            records.append(record)
+        version = write_snapshot(output, records, content_version)
+        elapsed = time.perf_counter() - start
+
+        summary = ', '.join(f"{count} {question_type}" for question_type, count in counts.items()) or 'no questions'
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote snapshot {version:016x} to {output} ({summary}) in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,353 @@
+"""
+Simulate concurrent learners against a running server.
+
+Every virtual user gets its own keep-alive HTTP connection and cookie jar,
+logs in through the real login form and then plays sessions of multiple
+choice, flash card, fill in the blank and budget simulation games, answering
+from what the rendered pages contain (CSRF tokens, question ids, expense ids).
+Flash card and budget simulation answers go through the same AJAX paths as
+the browser. The client is plain asyncio streams, so one process can keep
+hundreds of users in flight without threads.
+
+Reports throughput, error rate and p50/p95/p99 latency per route.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from http.cookies import SimpleCookie
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from .benchmark_views import percentile, CATEGORY_SLUGS, PERCENTILES
+
+User = get_user_model()
+
+# Relative share of each game in a session
+GAME_WEIGHTS = {
+    'play_multiple_choice': 4,
+    'play_flash_card': 3,
+    'play_fill_blank': 2,
+    'play_budget_simulation': 1,
+}
+
+_CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+_QUESTION_ID = re.compile(r'name="question_id" value="(\d+)"')
+_MC_CHOICE = re.compile(r'name="answer" id="choice\d+" value="([^"]*)"')
+_CARD_ID = re.compile(r'const cardId = "(\d+)"')
+_SIMULATION_ID = re.compile(r'name="simulation_id" value="(\d+)"')
+_EXPENSE_ID = re.compile(r'data-id="(\d+)"')
+
+
+def extract_game(route: str, html: str) -> Optional[Dict[str, Any]]:
+    """
+    Pull what a player needs to answer out of a rendered game page.
+
+    Returns:
+        A dictionary of ids and choices, or None if the page has no question
+    """
+    if route == 'play_multiple_choice':
+        match = _QUESTION_ID.search(html)
+        return match and {'question_id': match.group(1), 'choices': _MC_CHOICE.findall(html)}
+    if route == 'play_fill_blank':
+        match = _QUESTION_ID.search(html)
+        return match and {'question_id': match.group(1)}
+    if route == 'play_flash_card':
+        match = _CARD_ID.search(html)
+        return match and {'card_id': match.group(1)}
+    if route == 'play_budget_simulation':
+        match = _SIMULATION_ID.search(html)
+        return match and {'simulation_id': match.group(1), 'expense_ids': _EXPENSE_ID.findall(html)}
+    return None
+
+
+def answer_for(route: str, game: Dict[str, Any], rng: random.Random) -> Tuple[Dict[str, Any], bool]:
+    """Build the POST data for a game page. Returns (data, is_ajax)."""
+    if route == 'play_multiple_choice':
+        choices = game['choices'] or ['']
+        return {'question_id': game['question_id'], 'answer': rng.choice(choices)}, False
+    if route == 'play_fill_blank':
+        return {'question_id': game['question_id'], 'missing_word': rng.choice(['save', 'budget', 'interest'])}, False
+    if route == 'play_flash_card':
+        return {'card_id': game['card_id'], 'answer': rng.choice(['True', 'False'])}, True
+    expense_ids = [int(pk) for pk in game['expense_ids']]
+    selected = rng.sample(expense_ids, rng.randint(0, len(expense_ids))) if expense_ids else []
+    return {'simulation_id': game['simulation_id'], 'selected_expenses': json.dumps(selected)}, True
+
+
+class HttpSession:
+    """A minimal HTTP/1.1 client over one keep-alive connection, with a cookie jar."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, data: Optional[Dict[str, Any]] = None,
+                      ajax: bool = False) -> Tuple[int, str]:
+        """Send a request, retrying once on a fresh connection if the old one was dropped."""
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout
+                )
+            try:
+                return await asyncio.wait_for(self._exchange(method, path, data, ajax), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _exchange(self, method, path, data, ajax) -> Tuple[int, str]:
+        body = urlencode(data).encode() if data is not None else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'Connection': 'keep-alive',
+            'Content-Length': str(len(body)),
+        }
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        if ajax:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        head = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items()) + '\r\n'
+        self.writer.write(head.encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Server closed the connection')
+        status = int(status_line.split()[1])
+
+        response_headers: List[Tuple[str, str]] = []
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers.append((name.strip().lower(), value.strip()))
+
+        header_map = dict(response_headers)
+        if header_map.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+        elif 'content-length' in header_map:
+            content = await self.reader.readexactly(int(header_map['content-length']))
+        else:
+            content = await self.reader.read()
+            header_map['connection'] = 'close'
+
+        for name, value in response_headers:
+            if name == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    if morsel['max-age'] == '0' or not morsel.value:
+                        self.cookies.pop(morsel.key, None)
+                    else:
+                        self.cookies[morsel.key] = morsel.value
+        if header_map.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, content.decode('utf-8', errors='replace')
+
+
+class LoadStats:
+    """Per-route latency samples and error counts."""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, route: str, elapsed_ms: float, ok: bool):
+        self.timings.setdefault(route, []).append(elapsed_ms)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, elapsed_s: float) -> Dict[str, Any]:
+        routes = {}
+        for route, timings in self.timings.items():
+            errors = self.errors.get(route, 0)
+            routes[route] = {
+                'requests': len(timings),
+                'errors': errors,
+                'error_rate': round(errors / len(timings), 4),
+                'rps': round(len(timings) / elapsed_s, 2) if elapsed_s else 0,
+            }
+            for pct in PERCENTILES:
+                routes[route][f'p{pct}_ms'] = round(percentile(timings, pct), 3)
+        total = sum(len(timings) for timings in self.timings.values())
+        errors = sum(self.errors.values())
+        return {
+            'routes': routes,
+            'total': {
+                'requests': total,
+                'errors': errors,
+                'error_rate': round(errors / total, 4) if total else 0,
+                'rps': round(total / elapsed_s, 2) if elapsed_s else 0,
+                'elapsed_s': round(elapsed_s, 3),
+            },
+        }
+
+
+async def timed(session: HttpSession, stats: LoadStats, route: str, method: str, path: str,
+                data: Optional[Dict[str, Any]] = None, ajax: bool = False, ok_statuses=(200,)) -> Tuple[int, str]:
+    """Issue one request and record its latency. Network failures count as errors with status 0."""
+    start = time.perf_counter()
+    try:
+        status, body = await session.request(method, path, data, ajax)
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        status, body = 0, ''
+    stats.record(f'{route}:{method}', (time.perf_counter() - start) * 1000, status in ok_statuses)
+    return status, body
+
+
+async def login(session: HttpSession, stats: LoadStats, username: str, password: str) -> bool:
+    """Log in through the login form. Returns True when the server redirected after the POST."""
+    path = reverse('login')
+    status, body = await timed(session, stats, 'login', 'GET', path)
+    match = _CSRF_INPUT.search(body)
+    if status != 200 or not match:
+        return False
+    status, _ = await timed(session, stats, 'login', 'POST', path, {
+        'username': username,
+        'password': password,
+        'csrfmiddlewaretoken': match.group(1),
+    }, ok_statuses=(302,))
+    return status == 302
+
+
+async def play_round(session: HttpSession, stats: LoadStats, rng: random.Random) -> None:
+    """Open a random game in a random category and answer it."""
+    route = rng.choices(list(GAME_WEIGHTS), weights=list(GAME_WEIGHTS.values()))[0]
+    path = reverse(route, kwargs={'category': rng.choice(list(CATEGORY_SLUGS.values()))})
+
+    # A redirect means the category has no questions left for this user
+    status, body = await timed(session, stats, route, 'GET', path, ok_statuses=(200, 302))
+    game = extract_game(route, body) if status == 200 else None
+    if game is None:
+        return
+    data, ajax = answer_for(route, game, rng)
+    await timed(session, stats, route, 'POST', path, data, ajax, ok_statuses=(200, 302) if ajax else (200,))
+
+
+async def run_user(index: int, options: Dict[str, Any], stats: LoadStats, deadline: float) -> None:
+    """One virtual learner: log in, then play sessions until done or the deadline passes."""
+    rng = random.Random(options['seed'] * 100_003 + index)
+    session = HttpSession(options['host'], options['port'], options['timeout'])
+    try:
+        # Stagger logins so users don't arrive in lockstep
+        await asyncio.sleep(rng.random() * options['ramp_up'])
+        if not await login(session, stats, f"{options['prefix']}{index}", options['password']):
+            return
+        for _ in range(options['sessions']):
+            for _ in range(options['rounds']):
+                if time.perf_counter() >= deadline:
+                    return
+                await play_round(session, stats, rng)
+                if options['think_time']:
+                    await asyncio.sleep(rng.expovariate(1 / options['think_time']))
+    finally:
+        await session.close()
+
+
+async def run_load_test(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run every virtual user concurrently and return the report."""
+    stats = LoadStats()
+    start = time.perf_counter()
+    deadline = start + options['duration'] if options['duration'] else float('inf')
+    await asyncio.gather(*(run_user(i, options, stats, deadline) for i in range(options['users'])))
+    return stats.report(time.perf_counter() - start)
+
+
+def ensure_users(count: int, prefix: str, password: str) -> int:
+    """Create the virtual users that don't exist yet. Returns the number created."""
+    usernames = [f'{prefix}{i}' for i in range(count)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    # Hashing is slow, so every user shares one hash
+    password_hash = make_password(password)
+    User.objects.bulk_create(
+        [User(username=username, password=password_hash) for username in usernames if username not in existing],
+        batch_size=1000,
+    )
+    return count - len(existing)
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent learners against a running server and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='Base URL of the server')
+        parser.add_argument('--users', type=int, default=50, help='Number of concurrent virtual users')
+        parser.add_argument('--sessions', type=int, default=3, help='Sessions played by each user')
+        parser.add_argument('--rounds', type=int, default=10, help='Games per session')
+        parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds (0 = no limit)')
+        parser.add_argument('--think-time', type=float, default=0,
+                            help='Mean pause between games in seconds (0 = no pause)')
+        parser.add_argument('--ramp-up', type=float, default=0, help='Spread user logins over this many seconds')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--prefix', type=str, default='loadtest_user_', help='Username prefix of the virtual users')
+        parser.add_argument('--password', type=str, default='loadtest-password', help='Password of the virtual users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the simulated players')
+        parser.add_argument('--output', type=str, help='Write the JSON report to this path')
+        parser.add_argument('--skip-user-setup', action='store_true',
+                            help="Don't create missing users (when the server uses a different database)")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('--url must be a plain http:// URL, e.g. http://127.0.0.1:8000')
+        options['host'] = url.hostname
+        options['port'] = url.port or 80
+
+        if not options['skip_user_setup']:
+            created = ensure_users(options['users'], options['prefix'], options['password'])
+            self.stdout.write(f"Created {created} virtual users")
+
+        self.stdout.write(f"Running {options['users']} users against {options['url']}...")
+        report = asyncio.run(run_load_test(options))
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+
+        self.stdout.write("-" * 80)
+        self.stdout.write(f"{'route':<32}{'requests':>9}{'errors':>8}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for route, stats in sorted(report['routes'].items()):
+            self.stdout.write(
+                f"{route:<32}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            )
+        total = report['total']
+        self.stdout.write("-" * 80)
+        summary = (f"{total['requests']} requests in {total['elapsed_s']:.1f}s: {total['rps']:.1f} req/s, "
+                   f"{total['error_rate']:.2%} errors")
+        if total['errors']:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,24 @@
+"""
+Recount every leaderboard from the user table (see leaderboard.py).
+
+    python manage.py rebuild_leaderboards
+
+Awards keep the leaderboards up to date through apply_score_moves; run this after XP was
+changed some other way (admin edits, imports, bulk loads).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute total XP and recount the leaderboard score buckets of every board'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        buckets = rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {buckets} leaderboard buckets in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,79 @@
+"""
+Compare every user's XP columns to the XP ledger (see xp.py) and report, or
+correct, the drift.
+
+    python manage.py reconcile_xp            # report only
+    python manage.py reconcile_xp --apply    # correct the columns
+    python manage.py reconcile_xp --backfill # first add ledger rows for completed questions without one
+
+Users are read a chunk at a time in id order, and each chunk is compared with
+one grouped aggregate of the ledger rows in its id range, total_xp included.
+Corrections are measured again per chunk of drifted users with their rows
+locked, so XP awarded meanwhile is kept, and written with one UPDATE per group
+of users needing the same change.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...leaderboard import rebuild_leaderboards
+from ...xp import LEDGER_FIELDS, apply_drift, backfill_ledger, find_drift
+
+
+class Command(BaseCommand):
+    help = "Report (or correct) users whose XP columns differ from the XP ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true',
+                            help='Correct the drifted columns')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Add ledger rows for completed questions that have none first')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Users locked and corrected per transaction (default: 5000)')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Drifted users to list in the report (default: 20, 0 for all)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        start = time.perf_counter()
+        if options['backfill']:
+            written = backfill_ledger()
+            self.stdout.write(f"Backfilled {written} ledger rows")
+
+        drifted = list(find_drift())
+        checked = time.perf_counter()
+        self.report(drifted, options['limit'])
+
+        if options['apply'] and drifted:
+            corrected = apply_drift((user_id for user_id, _, _ in drifted), options['batch_size'])
+            # The corrections bypass award_xp() and its queued score moves, so the leaderboards are recounted
+            buckets = rebuild_leaderboards()
+            self.stdout.write(self.style.SUCCESS(
+                f"Corrected {corrected} users and rebuilt {buckets} leaderboard buckets "
+                f"in {time.perf_counter() - checked:.2f}s"
+            ))
+        elif drifted:
+            self.stdout.write("Run with --apply to correct these users")
+        self.stdout.write(f"Checked in {checked - start:.2f}s")
+
+    def report(self, drifted, limit):
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Every user's XP matches the ledger"))
+            return
+
+        self.stdout.write(f"{len(drifted)} users drifted from the ledger:")
+        for field in LEDGER_FIELDS:
+            differences = [drift[field] for _, _, drift in drifted if field in drift]
+            if differences:
+                self.stdout.write(f"  {field}: {len(differences)} users, {sum(differences):+d} XP in total")
+
+        self.stdout.write("-" * 60)
+        # Furthest off first
+        ordered = sorted(drifted, key=lambda user: -sum(abs(d) for d in user[2].values()))
+        for user_id, username, drift in ordered[:limit or None]:
+            changes = ", ".join(f"{field} {difference:+d}" for field, difference in drift.items())
+            self.stdout.write(f"{user_id:>8}  {username:<20} {changes}")
+        if limit and len(ordered) > limit:
+            self.stdout.write(f"... and {len(ordered) - limit} more")
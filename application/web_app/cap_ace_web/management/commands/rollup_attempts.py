@@ -0,0 +1,34 @@
+"""
+Add the answer attempts logged since the last run to the per-question
+statistics (see rollups.py).
+
+    python manage.py rollup_attempts
+
+Run it periodically (e.g. every few minutes from cron); each run only counts
+the attempts that are new since the previous one, once ROLLUP_SETTLE_SECONDS
+have passed since it first saw them (so no batch below them can still commit).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...rollups import ROLLUP_BATCH_SIZE, update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Update the per-question statistics with the answer attempts logged since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE,
+                            help=f'Attempts counted per transaction (default: {ROLLUP_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = 0
+        while True:
+            counted = update_rollups(options['batch_size'])
+            if not counted:
+                break
+            total += counted
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Counted {total} attempts in {elapsed:.2f}s"))
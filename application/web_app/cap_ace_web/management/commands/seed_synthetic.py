@@ -0,0 +1,436 @@
+"""
+Seed the database with synthetic users, questions, progress histories and the
+review schedules of the flash cards in them.
+
+Rows are generated lazily and written in fixed size chunks, with primary keys
+assigned up front so children (distractors, expenses, terms, progress) never
+need their parents held in memory. On PostgreSQL rows are streamed with COPY,
+elsewhere with multi-row INSERTs. User XP totals are fixed afterwards with a
+single aggregate UPDATE over the generated progress, and the XP ledger and
+the leaderboards are rebuilt to match.
+"""
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import List, Dict, Any, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from ...models import (MultipleChoice, MultipleChoiceDistractor, QuestionProgress, FillInTheBlank, BudgetSimulation,
+                       Expense, FlashCard, FlashCardReview, MatchAndDrag, TermsAndDefinitions, CATEGORIES)
+from ...signals import invalidate_content
+from ...activity import rebuild_activity
+from ...leaderboard import rebuild_leaderboards
+from ...registry import sync_registry
+from ...xp import XP_BY_DIFFICULTY, XP_FIELDS, backfill_ledger
+
+User = get_user_model()
+
+CATEGORY_CODES = [code for code, _ in CATEGORIES]
+DIFFICULTY_CODES = ['B', 'I', 'A']
+DIFFICULTY_WEIGHTS = [5, 3, 2]
+
+# Question types that can be completed in a game, with their model and relative share of a history
+PLAYABLE_TYPES = {
+    'MC': (MultipleChoice, 4),
+    'FIB': (FillInTheBlank, 2),
+    'FC': (FlashCard, 3),
+    'BS': (BudgetSimulation, 1),
+}
+QUESTION_MODELS = {
+    'MC': MultipleChoice,
+    'FIB': FillInTheBlank,
+    'FC': FlashCard,
+    'BS': BudgetSimulation,
+    'MAD': MatchAndDrag,
+}
+
+
+
+def category_for(offset: int) -> str:
+    """Category of the question at ``offset`` within its generated id range."""
+    return CATEGORY_CODES[offset % len(CATEGORY_CODES)]
+
+
+def next_id(model) -> int:
+    """First free primary key for ``model``."""
+    return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+
+class ChunkWriter:
+    """Write model instances in chunks with COPY (PostgreSQL) or multi-row INSERTs."""
+
+    def __init__(self, chunk_size: int, use_copy: bool):
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy
+        self.rows_written = 0
+
+    def write(self, model, objects: Iterable[Any]) -> int:
+        """
+        Consume ``objects`` chunk by chunk. Returns the number of rows written.
+
+        Either way the values are written as generated: fields filled in on save
+        (auto_now_add) keep theirs instead of being stamped with the seeding time.
+        """
+        written = 0
+        iterator = iter(objects)
+        while True:
+            chunk = list(itertools.islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                if self.use_copy:
+                    self._copy(model, chunk)
+                else:
+                    self._insert(model, chunk)
+            written += len(chunk)
+        self.rows_written += written
+        return written
+
+    @staticmethod
+    def _fields(model, chunk: List[Any]) -> List[Any]:
+        """Columns to write: auto primary keys are left to the database unless they were assigned up front."""
+        return [
+            f for f in model._meta.concrete_fields
+            if not (f.primary_key and getattr(chunk[0], f.attname) is None)
+        ]
+
+    def _insert(self, model, chunk: List[Any]) -> None:
+        """
+        Write a chunk with multi-row INSERTs of its values as they are, like
+        loaddata does (raw): unlike bulk_create, no field's pre_save runs.
+        """
+        fields = self._fields(model, chunk)
+        size = max(connection.ops.bulk_batch_size(fields, chunk), 1)
+        for start in range(0, len(chunk), size):
+            model.objects._insert(chunk[start:start + size], fields=fields, raw=True)
+
+    def _copy(self, model, chunk: List[Any]) -> None:
+        """Stream a chunk into ``model``'s table with COPY ... FROM STDIN."""
+        fields = self._fields(model, chunk)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in chunk:
+            row = []
+            for field in fields:
+                value = field.get_db_prep_save(getattr(obj, field.attname), connection)
+                row.append(r'\N' if value is None else value)
+            writer.writerow(row)
+        buffer.seek(0)
+
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic users, questions of every type and QuestionProgress histories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=1000,
+            help='Number of questions to create, split evenly across the five question types'
+        )
+        parser.add_argument(
+            '--history',
+            type=int,
+            default=20,
+            help='Typical number of completed questions per user (histories are long-tailed)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Rows written per chunk')
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default='synthetic_user_',
+            help='Username prefix, usernames are <prefix><n>'
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            help='Password for every synthetic user (default: unusable password)'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use multi-row INSERTs even on PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        if options['questions'] < 0 or options['users'] < 0:
+            raise CommandError('--questions and --users must not be negative')
+
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.now = timezone.now()
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        self.writer = ChunkWriter(options['chunk_size'], use_copy)
+
+        start = time.perf_counter()
+        per_type = options['questions'] // len(QUESTION_MODELS)
+        ranges = self.seed_questions(per_type)
+        first_user_id, last_user_id = self.seed_users(
+            options['users'], options['prefix'], options['password']
+        )
+        self.seed_progress(first_user_id, last_user_id, ranges, options['history'])
+        self.seed_reviews(first_user_id, last_user_id)
+        if use_copy:
+            self.reset_sequences()
+        updated = fix_user_xp(first_user_id, last_user_id)
+
+        # Rows were written without signals
+        sync_registry()
+        # The ledger rows behind the fixed XP totals
+        backfill_ledger()
+        rebuild_leaderboards()
+        rebuild_activity()
+        invalidate_content()
+
+        elapsed = time.perf_counter() - start
+        rate = self.writer.rows_written / elapsed * 60 if elapsed else 0
+        self.stdout.write("-" * 50)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {self.writer.rows_written} rows in {elapsed:.1f}s ({rate:,.0f} rows/minute), "
+            f"fixed XP for {updated} users"
+        ))
+
+    def seed_questions(self, per_type: int) -> Dict[str, range]:
+        """Create ``per_type`` questions of every type. Returns the id range used per type."""
+        ranges = {}
+        for question_type, model in QUESTION_MODELS.items():
+            first = next_id(model)
+            ranges[question_type] = range(first, first + per_type)
+            self.stdout.write(f"Seeding {per_type} {model._meta.verbose_name} rows...")
+
+        self.writer.write(MultipleChoice, (
+            MultipleChoice(
+                id=pk,
+                category=category_for(offset),
+                question=f"Synthetic multiple choice question {pk}?",
+                answer=f"Correct answer {pk}",
+                feedback=f"Explanation for question {pk}",
+                difficulty=self._difficulty(),
+            ) for offset, pk in enumerate(ranges['MC'])
+        ))
+        self.writer.write(MultipleChoiceDistractor, (
+            MultipleChoiceDistractor(question_id=pk, distractor=f"Distractor {j} for question {pk}")
+            for pk in ranges['MC'] for j in range(3)
+        ))
+
+        self.writer.write(FillInTheBlank, (
+            FillInTheBlank(
+                id=pk,
+                category=category_for(offset),
+                question=f"Synthetic statement {pk} about ____ planning",
+                answer=f"Synthetic statement {pk} about budget planning",
+                feedback=f"Explanation for question {pk}",
+                missing_word="budget",
+                difficulty=self._difficulty(),
+            ) for offset, pk in enumerate(ranges['FIB'])
+        ))
+
+        self.writer.write(FlashCard, (
+            FlashCard(
+                id=pk,
+                category=category_for(offset),
+                question=f"Synthetic flash card {pk} is true?",
+                answer=self.rng.random() < 0.5,
+                feedback=f"Explanation for card {pk}",
+                difficulty=self._difficulty(),
+            ) for offset, pk in enumerate(ranges['FC'])
+        ))
+
+        self.writer.write(BudgetSimulation, (
+            BudgetSimulation(
+                id=pk,
+                category=category_for(offset),
+                question=f"Synthetic budget simulation {pk}",
+                monthly_income=Decimal(self.rng.randrange(2000, 8000, 100)),
+                difficulty=self._difficulty(),
+            ) for offset, pk in enumerate(ranges['BS'])
+        ))
+        # Essential expenses add up to at most 60% of the lowest possible income
+        self.writer.write(Expense, (
+            Expense(
+                BudgetSimulation_id=pk,
+                name=f"Expense {j}",
+                amount=Decimal(self.rng.randrange(100, 400, 10) if j < 3 else self.rng.randrange(50, 1500, 10)),
+                feedback=f"Why expense {j} {'is' if j < 3 else 'is not'} essential",
+                essential=j < 3,
+            ) for pk in ranges['BS'] for j in range(6)
+        ))
+
+        self.writer.write(MatchAndDrag, (
+            MatchAndDrag(
+                id=pk,
+                category=category_for(offset),
+                feedback=f"Explanation for match {pk}",
+                difficulty=self._difficulty(),
+            ) for offset, pk in enumerate(ranges['MAD'])
+        ))
+        self.writer.write(TermsAndDefinitions, (
+            TermsAndDefinitions(
+                question_id=pk,
+                term=f"Term {j}",
+                definition=f"Definition of term {j} for match {pk}",
+                feedback=f"Feedback for term {j}",
+            ) for pk in ranges['MAD'] for j in range(4)
+        ))
+        return ranges
+
+    def seed_users(self, count: int, prefix: str, password: str = None):
+        """Create ``count`` users. Returns the first and last user id."""
+        self.stdout.write(f"Seeding {count} users...")
+        first = next_id(User)
+        # Hashing is slow, so every user shares one hash
+        password_hash = make_password(password) if password else make_password(None)
+
+        def users() -> Iterator[Any]:
+            for pk in range(first, first + count):
+                yield User(
+                    id=pk,
+                    username=f"{prefix}{pk}",
+                    password=password_hash,
+                    date_joined=self.joined_at(pk),
+                )
+
+        self.writer.write(User, users())
+        return first, first + count - 1
+
+    def seed_progress(self, first_user_id: int, last_user_id: int, ranges: Dict[str, range], history: int) -> None:
+        """Create a completed question history for every seeded user."""
+        self.stdout.write("Seeding question progress...")
+        types = [t for t in PLAYABLE_TYPES if len(ranges[t])]
+        weights = [PLAYABLE_TYPES[t][1] for t in types]
+        if not types:
+            return
+
+        ids = itertools.count(next_id(QuestionProgress))
+
+        def progress() -> Iterator[Any]:
+            for user_id in range(first_user_id, last_user_id + 1):
+                joined = self.joined_at(user_id)
+                active_seconds = (self.now - joined).total_seconds()
+                # Pareto gives a long tail: most users do a little, a few do a lot
+                length = int(self.rng.paretovariate(1.5) * history / 3)
+                per_type = dict.fromkeys(types, 0)
+                for question_type in self.rng.choices(types, weights, k=length):
+                    per_type[question_type] += 1
+
+                for question_type, k in per_type.items():
+                    pool = ranges[question_type]
+                    for offset in self.rng.sample(range(len(pool)), min(k, len(pool))):
+                        # Activity skews towards the recent end of the user's lifetime
+                        completed_at = joined + timedelta(
+                            seconds=active_seconds * self.rng.betavariate(2, 1.2)
+                        )
+                        yield QuestionProgress(
+                            id=next(ids),
+                            user_id=user_id,
+                            question_id=pool[offset],
+                            question_type=question_type,
+                            category=category_for(offset),
+                            completed_at=completed_at,
+                        )
+
+        self.writer.write(QuestionProgress, progress())
+
+    def seed_reviews(self, first_user_id: int, last_user_id: int, block: int = 1000) -> None:
+        """
+        Give every seeded flash card completion a review schedule, reading the
+        progress back ``block`` users at a time.
+        """
+        self.stdout.write("Seeding flash card reviews...")
+        # SM-2 intervals after one, two, three and four right answers
+        intervals = [1, 6, 15, 38]
+
+        def reviews() -> Iterator[Any]:
+            for low in range(first_user_id, last_user_id + 1, block):
+                completed = QuestionProgress.objects.filter(
+                    user_id__gte=low, user_id__lt=min(low + block, last_user_id + 1), question_type='FC'
+                ).values_list('user_id', 'question_id', 'category', 'completed_at')
+                for user_id, card_id, category, completed_at in completed:
+                    repetitions = self.rng.randint(1, len(intervals))
+                    yield FlashCardReview(
+                        user_id=user_id,
+                        card_id=card_id,
+                        category=category,
+                        interval_days=intervals[repetitions - 1],
+                        repetitions=repetitions,
+                        due_at=completed_at + timedelta(days=intervals[repetitions - 1]),
+                    )
+
+        self.writer.write(FlashCardReview, reviews())
+
+    def reset_sequences(self) -> None:
+        """Move PostgreSQL sequences past the explicitly assigned primary keys."""
+        models = list(QUESTION_MODELS.values()) + [
+            MultipleChoiceDistractor, Expense, TermsAndDefinitions, User, QuestionProgress
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def joined_at(self, user_id: int):
+        """
+        Sign-up time of a user, derived from its id so it can be recomputed
+        for the progress history without keeping every user in memory.
+        """
+        fraction = (user_id * 2654435761 + self.seed) % 2 ** 32 / 2 ** 32
+        return self.now - timedelta(days=365 * fraction)
+
+    def _difficulty(self) -> str:
+        return self.rng.choices(DIFFICULTY_CODES, DIFFICULTY_WEIGHTS)[0]
+
+
+def fix_user_xp(first_user_id: int, last_user_id: int) -> int:
+    """
+    Recompute the per-category XP columns of users in an id range from their
+    QuestionProgress, as a single UPDATE ... FROM over an aggregate.
+
+    Returns:
+        Number of users updated
+    """
+    qn = connection.ops.quote_name
+    progress_table = qn(QuestionProgress._meta.db_table)
+    user_table = qn(User._meta.db_table)
+    xp_case = "CASE q.difficulty " + " ".join(
+        f"WHEN '{code}' THEN {xp}" for code, xp in XP_BY_DIFFICULTY.items()
+    ) + " ELSE 0 END"
+
+    awarded = " UNION ALL ".join(
+        f"SELECT p.user_id, p.category, {xp_case} AS xp "
+        f"FROM {progress_table} p JOIN {qn(model._meta.db_table)} q ON q.id = p.question_id "
+        f"WHERE p.question_type = '{question_type}' AND p.user_id BETWEEN %s AND %s"
+        for question_type, model in QUESTION_MODELS.items()
+    )
+    params = [first_user_id, last_user_id] * len(QUESTION_MODELS)
+
+    totals = ", ".join(
+        f"SUM(CASE WHEN category = '{code}' THEN xp ELSE 0 END) AS {field}"
+        for code, field in XP_FIELDS.items()
+    )
+    assignments = ", ".join(f"{qn(field)} = totals.{field}" for field in XP_FIELDS.values())
+
+    sql = (
+        f"UPDATE {user_table} SET {assignments} "
+        f"FROM (SELECT user_id, {totals} FROM ({awarded}) awarded GROUP BY user_id) totals "
+        f"WHERE {user_table}.id = totals.user_id"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -0,0 +1,25 @@
+"""
+Bring the question registry in line with the question tables (see registry.py).
+
+    python manage.py sync_question_registry
+
+Saving and deleting questions keeps the registry up to date on its own; run
+this after loading questions or progress in bulk, or to clean up progress on
+questions that no longer exist.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...registry import sync_registry
+
+
+class Command(BaseCommand):
+    help = 'Register every question, link progress to it and delete orphaned progress'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = sync_registry()
+        self.stdout.write(self.style.SUCCESS(
+            f"Registry: {counts['created']} created, {counts['updated']} updated, {counts['deleted']} deleted; "
+            f"progress: {counts['linked']} linked, {counts['orphans']} orphaned rows deleted"
+        ))
@@ -0,0 +1,66 @@
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from . import attempts
+from .db_instrumentation import SlowQueryLogger, ConnectionTimings
+
+
+class SlowQueryMiddleware:
+    """
+    Log slow queries issued while handling a request.
+
+    Does nothing when SLOW_QUERY_THRESHOLD_MS is None.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return self.get_response(request)
+
+        slow_query_logger = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(slow_query_logger))
+            return self.get_response(request)
+
+
+class ServerTimingMiddleware:
+    """
+    Add a Server-Timing header splitting database time into connection
+    handshakes, health checks and queries, so cold and warm invocations can be
+    told apart in the browser's network panel.
+
+    Does nothing when SERVER_TIMING is False. The header is only sent to
+    staff, or to everyone when DEBUG is on.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+
+        timings = ConnectionTimings()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(timings.track(connections[alias]))
+            response = self.get_response(request)
+        if settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+
+class AttemptFlushMiddleware:
+    """
+    Write the answer attempt buffer after a request (see attempts.py) once it
+    is full or old enough, or after every request with ATTEMPT_FLUSH_EACH_REQUEST
+    so a serverless instance frozen or recycled afterwards loses none.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        attempts.flush_after_request()
+        return response
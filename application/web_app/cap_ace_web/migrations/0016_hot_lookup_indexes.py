@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0015_fillintheblank'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='multiplechoice',
+            name='category',
+            field=models.CharField(choices=[('BUD', 'Budgeting'), ('INV', 'Investing'), ('SAV', 'Savings'), ('BAL', 'Balance Sheet'), ('CRD', 'Credit'), ('TAX', 'Taxes')], max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='budgetsimulation',
+            index=models.Index(fields=['category', 'difficulty'], name='bs_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('essential', True)), fields=['BudgetSimulation', 'amount'], name='expense_essential_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fillintheblank',
+            index=models.Index(fields=['category', 'difficulty'], name='fib_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['category', 'difficulty'], name='fc_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multiplechoice',
+            index=models.Index(fields=['category', 'difficulty'], name='mc_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionprogress',
+            index=models.Index(fields=['user', 'category', 'question_type', 'question_id'], name='qp_user_cat_type_qid_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0016_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_type', models.CharField(choices=[('MC', 'Multiple Choice'), ('FIB', 'Fill in Blank'), ('MAD', 'Match and Drag'), ('FC', 'Flash Card'), ('BS', 'Budget Simulation')], max_length=3)),
+                ('object_id', models.IntegerField()),
+                ('category', models.CharField(choices=[('BUD', 'Budgeting'), ('INV', 'Investing'), ('SAV', 'Savings'), ('BAL', 'Balance Sheet'), ('CRD', 'Credit'), ('TAX', 'Taxes')], max_length=3, null=True)),
+                ('difficulty', models.CharField(choices=[('B', 'Beginner'), ('I', 'Intermediate'), ('A', 'Advanced')], default='B', max_length=1)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'is_active', 'question_type', 'difficulty'], name='question_cat_active_idx')],
+                'unique_together': {('question_type', 'object_id')},
+            },
+        ),
+        migrations.AddField(
+            model_name='questionprogress',
+            name='registry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='cap_ace_web.question'),
+        ),
+        migrations.AddIndex(
+            model_name='questionprogress',
+            index=models.Index(fields=['user', 'registry'], name='qp_user_registry_idx'),
+        ),
+    ]
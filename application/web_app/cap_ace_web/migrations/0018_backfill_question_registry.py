@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+# As of this migration: question type -> model name
+REGISTRY_MODELS = {
+    'MC': 'MultipleChoice',
+    'FIB': 'FillInTheBlank',
+    'FC': 'FlashCard',
+    'BS': 'BudgetSimulation',
+    'MAD': 'MatchAndDrag',
+}
+
+
+def backfill(apps, schema_editor):
+    """Register every existing question, link progress to it and delete progress on deleted questions."""
+    Question = apps.get_model('cap_ace_web', 'Question')
+    QuestionProgress = apps.get_model('cap_ace_web', 'QuestionProgress')
+
+    for question_type, model_name in REGISTRY_MODELS.items():
+        model = apps.get_model('cap_ace_web', model_name)
+        current = {pk: (category, difficulty) for pk, category, difficulty
+                   in model.objects.values_list('id', 'category', 'difficulty').iterator()}
+        registered = set(Question.objects.filter(question_type=question_type).values_list('object_id', flat=True))
+        Question.objects.bulk_create([
+            Question(question_type=question_type, object_id=pk, category=category, difficulty=difficulty)
+            for pk, (category, difficulty) in current.items() if pk not in registered
+        ], batch_size=1000)
+
+    registry = Question.objects.filter(question_type=OuterRef('question_type'), object_id=OuterRef('question_id'))
+    unlinked = QuestionProgress.objects.filter(registry__isnull=True)
+    unlinked.filter(Exists(registry)).update(registry_id=registry.values('id')[:1])
+    # What is still unlinked names a question that no longer exists
+    unlinked.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0017_question_registry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
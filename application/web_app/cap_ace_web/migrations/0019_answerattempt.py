@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0018_backfill_question_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer', models.TextField(blank=True, default='')),
+                ('is_correct', models.BooleanField()),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('answered_at', models.DateTimeField()),
+                ('question', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='cap_ace_web.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'answered_at'], name='attempt_question_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0019_answerattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistractorStats',
+            fields=[
+                ('distractor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cap_ace_web.multiplechoicedistractor')),
+                ('picks', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cap_ace_web.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('correct_rate', models.FloatField(default=0)),
+                ('total_latency_ms', models.BigIntegerField(default=0)),
+                ('timed_attempts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['correct_rate', 'attempts'], name='stats_correct_rate_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0020_question_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashCardReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('BUD', 'Budgeting'), ('INV', 'Investing'), ('SAV', 'Savings'), ('BAL', 'Balance Sheet'), ('CRD', 'Credit'), ('TAX', 'Taxes')], max_length=3, null=True)),
+                ('ease', models.PositiveSmallIntegerField(default=2500)),
+                ('interval_days', models.PositiveIntegerField(default=0)),
+                ('repetitions', models.PositiveSmallIntegerField(default=0)),
+                ('due_at', models.DateTimeField()),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='cap_ace_web.flashcard')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'category', 'due_at'], name='review_user_cat_due_idx')],
+                'unique_together': {('user', 'card')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0021_flashcardreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPAward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('BUD', 'Budgeting'), ('INV', 'Investing'), ('SAV', 'Savings'), ('BAL', 'Balance Sheet'), ('CRD', 'Credit'), ('TAX', 'Taxes')], max_length=3)),
+                ('xp', models.IntegerField()),
+                ('question_type', models.CharField(blank=True, choices=[('MC', 'Multiple Choice'), ('FIB', 'Fill in Blank'), ('MAD', 'Match and Drag'), ('FC', 'Flash Card'), ('BS', 'Budget Simulation')], max_length=3, null=True)),
+                ('question_id', models.IntegerField(blank=True, null=True)),
+                ('awarded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_awards', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'question_type', 'question_id'], name='xpaward_user_question_idx')],
+            },
+        ),
+    ]
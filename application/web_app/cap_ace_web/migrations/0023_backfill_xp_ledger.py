@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+# As of this migration: payout for completing a question, by difficulty
+XP_BY_DIFFICULTY = {'B': 50, 'I': 100, 'A': 150}
+
+
+def backfill(apps, schema_editor):
+    """Write the ledger rows of the questions completed before the ledger existed."""
+    QuestionProgress = apps.get_model('cap_ace_web', 'QuestionProgress')
+    Award = apps.get_model('cap_ace_web', 'XPAward')
+    missing = (
+        QuestionProgress.objects
+        .filter(registry__isnull=False, category__isnull=False)
+        .exclude(Exists(Award.objects.filter(
+            user=OuterRef('user'), question_type=OuterRef('question_type'), question_id=OuterRef('question_id')
+        )))
+        .order_by('id')
+        .values_list('user_id', 'category', 'question_type', 'question_id', 'completed_at', 'registry__difficulty')
+    )
+    batch = []
+    for user_id, category, question_type, question_id, completed_at, difficulty in missing.iterator(chunk_size=5000):
+        batch.append(Award(
+            user_id=user_id, category=category, xp=XP_BY_DIFFICULTY.get(difficulty, 0),
+            question_type=question_type, question_id=question_id, awarded_at=completed_at,
+        ))
+        if len(batch) >= 5000:
+            Award.objects.bulk_create(batch)
+            batch = []
+    Award.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0022_xp_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cap_ace_web', '0023_backfill_xp_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=20)),
+                ('xp', models.IntegerField()),
+                ('players', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cap_ace_user',
+            name='total_xp',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-total_xp', 'id'], name='user_total_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-budget_xp', 'id'], name='user_budget_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-investing_xp', 'id'], name='user_investing_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-savings_xp', 'id'], name='user_savings_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-balance_sheet_xp', 'id'], name='user_balance_sheet_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-credit_xp', 'id'], name='user_credit_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cap_ace_user',
+            index=models.Index(fields=['-taxes_xp', 'id'], name='user_taxes_xp_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardscore',
+            unique_together={('board', 'xp')},
+        ),
+    ]
@@ -0,0 +1,40 @@
+import operator
+from functools import reduce
+
+from django.db import migrations
+from django.db.models import Count, F
+
+# As of this migration: XP column of every category, and of every board
+XP_COLUMNS = ['budget_xp', 'investing_xp', 'savings_xp', 'balance_sheet_xp', 'credit_xp', 'taxes_xp']
+BOARDS = ['total_xp', *XP_COLUMNS]
+
+
+def build(apps, schema_editor):
+    """Fill total_xp and count the existing players into the leaderboards."""
+    User = apps.get_model('cap_ace_web', 'Cap_Ace_User')
+    Score = apps.get_model('cap_ace_web', 'LeaderboardScore')
+    total = reduce(operator.add, (F(field) for field in XP_COLUMNS))
+    User.objects.exclude(total_xp=total).update(total_xp=total)
+    Score.objects.all().delete()
+    Score.objects.bulk_create([
+        Score(board=field, xp=xp, players=players)
+        for field in BOARDS
+        for xp, players in (
+            User.objects
+            .filter(**{f'{field}__gt': 0})
+            .values_list(field)
+            .annotate(players=Count('id'))
+            .order_by()
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0024_leaderboards'),
+    ]
+
+    operations = [
+        migrations.RunPython(build, migrations.RunPython.noop),
+    ]
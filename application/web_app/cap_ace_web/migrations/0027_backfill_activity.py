@@ -0,0 +1,67 @@
+import heapq
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def merged_days(progress, awards):
+    """(user id, day, completed, xp) from two (user id, day, value) streams sorted by user and day."""
+    completions = ((user_id, day, count, 0) for user_id, day, count in progress)
+    earnings = ((user_id, day, 0, xp) for user_id, day, xp in awards)
+    current = None
+    for user_id, day, completed, xp in heapq.merge(completions, earnings, key=lambda row: (row[0], row[1])):
+        if current and current[:2] == (user_id, day):
+            current = (user_id, day, current[2] + completed, current[3] + xp)
+            continue
+        if current:
+            yield current
+        current = (user_id, day, completed, xp)
+    if current:
+        yield current
+
+
+def backfill(apps, schema_editor):
+    """Roll the existing progress and ledger rows up into daily activity."""
+    QuestionProgress = apps.get_model('cap_ace_web', 'QuestionProgress')
+    Award = apps.get_model('cap_ace_web', 'XPAward')
+    Activity = apps.get_model('cap_ace_web', 'DailyActivity')
+    progress = (
+        QuestionProgress.objects
+        .filter(completed_at__isnull=False)
+        .annotate(day=TruncDate('completed_at'))
+        .values_list('user_id', 'day')
+        .annotate(count=Count('id'))
+        .order_by('user_id', 'day')
+    )
+    awards = (
+        Award.objects
+        .annotate(day=TruncDate('awarded_at'))
+        .values_list('user_id', 'day')
+        .annotate(total=Sum('xp'))
+        .order_by('user_id', 'day')
+    )
+
+    batch = []
+    previous = None
+    for user_id, day, completed, xp in merged_days(progress.iterator(chunk_size=5000), awards.iterator(chunk_size=5000)):
+        consecutive = previous and previous.user_id == user_id and previous.day == day - timedelta(days=1)
+        previous = Activity(user_id=user_id, day=day, completed=completed, xp=xp,
+                            streak=previous.streak + 1 if consecutive else 1)
+        batch.append(previous)
+        if len(batch) >= 5000:
+            Activity.objects.bulk_create(batch)
+            batch = []
+    Activity.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0026_daily_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
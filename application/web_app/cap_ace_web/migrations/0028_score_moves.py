@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0027_backfill_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=20)),
+                ('xp', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_moves', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
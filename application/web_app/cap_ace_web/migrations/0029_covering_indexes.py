@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cap_ace_web', '0028_score_moves'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='budgetsimulation',
+            name='bs_category_difficulty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='fillintheblank',
+            name='fib_category_difficulty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='flashcardreview',
+            name='review_user_cat_due_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='multiplechoice',
+            name='mc_category_difficulty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='question',
+            name='question_cat_active_idx',
+        ),
+        migrations.AddIndex(
+            model_name='budgetsimulation',
+            index=models.Index(fields=['category', 'difficulty'], include=('id',), name='bs_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fillintheblank',
+            index=models.Index(fields=['category', 'difficulty'], include=('id',), name='fib_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardreview',
+            index=models.Index(fields=['user', 'category', 'due_at'], include=('card_id',), name='review_user_cat_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multiplechoice',
+            index=models.Index(fields=['category', 'difficulty'], include=('id',), name='mc_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['category', 'is_active', 'question_type', 'difficulty'], include=('object_id', 'id'), name='question_cat_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['question_type', 'object_id'], name='question_inactive_idx'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from decimal import Decimal
 
 DIFFICULTIES = [
@@ -24,6 +25,15 @@ CATEGORIES = [
         ('CRD', 'Credit'),
         ('TAX', 'Taxes')
 ]    
+# Category code -> XP column on Cap_Ace_User
+XP_FIELDS = {
+    'BUD': 'budget_xp',
+    'INV': 'investing_xp',
+    'SAV': 'savings_xp',
+    'BAL': 'balance_sheet_xp',
+    'CRD': 'credit_xp',
+    'TAX': 'taxes_xp',
+}
 class Cap_Ace_User(AbstractUser):
     
     
@@ -41,6 +51,20 @@ class Cap_Ace_User(AbstractUser):
     balance_sheet_xp = models.IntegerField(default=0)
     credit_xp = models.IntegerField(default=0)
     taxes_xp = models.IntegerField(default=0)
+    # Sum of the category columns, ranked by the overall leaderboard (leaderboard.py)
+    total_xp = models.IntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        # Top of each leaderboard, read in index order
+        indexes = [
+            models.Index(fields=['-total_xp', 'id'], name='user_total_xp_idx'),
+            models.Index(fields=['-budget_xp', 'id'], name='user_budget_xp_idx'),
+            models.Index(fields=['-investing_xp', 'id'], name='user_investing_xp_idx'),
+            models.Index(fields=['-savings_xp', 'id'], name='user_savings_xp_idx'),
+            models.Index(fields=['-balance_sheet_xp', 'id'], name='user_balance_sheet_xp_idx'),
+            models.Index(fields=['-credit_xp', 'id'], name='user_credit_xp_idx'),
+            models.Index(fields=['-taxes_xp', 'id'], name='user_taxes_xp_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -53,6 +77,13 @@ class FillInTheBlank(models.Model):
     feedback = models.TextField(default="")
     category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
     missing_word = models.CharField(max_length = 100)
+
+    class Meta:
+        indexes = [
+            # INCLUDE (PostgreSQL only) lets the random pick read its ids from the index alone
+            models.Index(fields=['category', 'difficulty'], include=['id'], name='fib_category_difficulty_idx'),
+        ]
+
     def __str__(self):
         return f"Fill in the Blank: {self.question}..."
 
@@ -61,12 +92,18 @@ class FillInTheBlank(models.Model):
 
 class MultipleChoice(models.Model):
 
-    category = models.CharField(max_length=100, choices=CATEGORIES)
+    category = models.CharField(max_length=3, choices=CATEGORIES)
     question = models.TextField()
     answer = models.TextField()
     feedback = models.TextField()
     difficulty = models.CharField(max_length=1, choices=DIFFICULTIES, default='B')
 
+    class Meta:
+        indexes = [
+            # INCLUDE (PostgreSQL only) lets the random pick read its ids from the index alone
+            models.Index(fields=['category', 'difficulty'], include=['id'], name='mc_category_difficulty_idx'),
+        ]
+
     def __str__(self):
         return f"Multiple Choice: {self.question}..."
     
@@ -79,9 +116,51 @@ class MultipleChoiceDistractor(models.Model):
     def __str__(self):
         return f"Distractor for {self.question.id}: {self.distractor}"
     
+class Question(models.Model):
+    """
+    Registry row for every question of every type, kept in step with the
+    question tables by signals (see registry.py). Cross-type counts and
+    selection read this one table instead of one table per type.
+    """
+    question_type = models.CharField(max_length=3, choices=QUESTION_TYPES)
+    # Primary key of the question in its own table
+    object_id = models.IntegerField()
+    category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
+    difficulty = models.CharField(max_length=1, choices=DIFFICULTIES, default='B')
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ['question_type', 'object_id']
+        indexes = [
+            # Counts and quiz candidates read the ids from the index alone (INCLUDE is PostgreSQL only)
+            models.Index(fields=['category', 'is_active', 'question_type', 'difficulty'], include=['object_id', 'id'],
+                         name='question_cat_active_idx'),
+            # The few deactivated questions, probed by inactive() for every candidate of the games
+            models.Index(fields=['question_type', 'object_id'], condition=models.Q(is_active=False),
+                         name='question_inactive_idx'),
+        ]
+
+    @staticmethod
+    def id_for(question_type, object_id):
+        """Subquery for the registry id of a question, usable as a field value in bulk inserts."""
+        return models.Subquery(
+            Question.objects.filter(question_type=question_type, object_id=object_id).values('id')[:1]
+        )
+
+    def __str__(self):
+        return f"{self.get_question_type_display()} {self.object_id}"
+
+
 class QuestionProgress(models.Model):
 
     user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE)
+    # Registry row of the question; deleting the question deletes its progress with it.
+    # Transitional: progress is still keyed on (question_id, question_type), which the
+    # games' lookups and unique_together use. Every insert resolves the link (save() and
+    # the bulk writes use Question.id_for()), but it stays NULL for a question that isn't
+    # registered yet (bulk loads), until sync_registry() links it. Once nothing writes
+    # unregistered progress it can become NOT NULL and replace the pair.
+    registry = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True, related_name='progress')
     question_id = models.IntegerField()
     question_type = models.CharField(max_length=3, choices=QUESTION_TYPES)
     category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
@@ -89,16 +168,181 @@ class QuestionProgress(models.Model):
 
     class Meta:
         unique_together = ['user', 'question_id', 'question_type']
+        indexes = [
+            # Serves the completed-question lookups of the games (user, category, type),
+            # the category pages (user, category) and the dashboard (user). question_id is
+            # part of the key so the games' exclusion subquery never touches the table.
+            models.Index(fields=['user', 'category', 'question_type', 'question_id'], name='qp_user_cat_type_qid_idx'),
+            # Completed-question exclusion of the cross-type selection over the registry
+            models.Index(fields=['user', 'registry'], name='qp_user_registry_idx'),
+        ]
         
+    def save(self, *args, **kwargs):
+        resolve = self.registry_id is None
+        if resolve:
+            # Resolved within the INSERT (or UPDATE) itself; NULL if the question isn't registered
+            self.registry_id = Question.id_for(self.question_type, self.question_id)
+        super().save(*args, **kwargs)
+        if resolve:
+            # Drop the subquery: the id written is loaded on first access, which most callers never make
+            del self.__dict__['registry_id']
+
     def __str__(self):
         return f"{self.user.username} - {self.get_category_display()} - {self.get_question_type_display()} {self.question_id}"
     
+class AnswerAttempt(models.Model):
+    """
+    One answer to a game question, right or wrong. Append-only, written in
+    batches through attempts.py.
+    """
+    user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE)
+    # Null when the question was deleted before the attempt was written
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, related_name='attempts')
+    # Chosen option or typed answer (a JSON list of expense ids for budget simulations)
+    answer = models.TextField(blank=True, default="")
+    is_correct = models.BooleanField()
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    answered_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'answered_at'], name='attempt_question_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.question} - {'correct' if self.is_correct else 'wrong'}"
+
+
+class QuestionStats(models.Model):
+    """Answer totals of a question, rolled up from AnswerAttempt by rollups.py."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    # correct / attempts, stored so the worst questions can be listed from an index
+    correct_rate = models.FloatField(default=0)
+    # Sum and number of the attempts that came with a latency
+    total_latency_ms = models.BigIntegerField(default=0)
+    timed_attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['correct_rate', 'attempts'], name='stats_correct_rate_idx'),
+        ]
+
+    @property
+    def average_latency_ms(self):
+        return self.total_latency_ms / self.timed_attempts if self.timed_attempts else None
+
+    def __str__(self):
+        return f"{self.question}: {self.correct}/{self.attempts} correct"
+
+
+class DistractorStats(models.Model):
+    """How often a multiple choice distractor was picked, rolled up from AnswerAttempt by rollups.py."""
+    distractor = models.OneToOneField(
+        MultipleChoiceDistractor, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    picks = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.distractor.distractor}: {self.picks} picks"
+
+
+class RollupWatermark(models.Model):
+    """
+    Id of the last AnswerAttempt a rollup has counted, and the highest id seen
+    when it last looked (see rollups.py).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    seen_id = models.BigIntegerField(default=0)
+    seen_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.last_id}"
+
+
+class XPAward(models.Model):
+    """
+    One XP payout, written by xp.award_xp(). The per-category XP columns of
+    Cap_Ace_User are kept as running totals of this ledger.
+    """
+    user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE, related_name='xp_awards')
+    category = models.CharField(max_length=3, choices=CATEGORIES)
+    xp = models.IntegerField()
+    # The completed question the XP was paid for
+    question_type = models.CharField(max_length=3, choices=QUESTION_TYPES, null=True, blank=True)
+    question_id = models.IntegerField(null=True, blank=True)
+    awarded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'question_type', 'question_id'], name='xpaward_user_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.xp} {self.get_category_display()} XP"
+
+
+class DailyActivity(models.Model):
+    """Questions completed and XP earned by a player on one day (activity.py)."""
+    user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    completed = models.PositiveIntegerField(default=0)
+    xp = models.IntegerField(default=0)
+    # Consecutive active days ending on this one
+    streak = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['user', 'day']
+
+    def __str__(self):
+        return f"{self.user_id} on {self.day}: {self.completed} completed, {self.xp} XP"
+
+
+class LeaderboardScore(models.Model):
+    """
+    How many players of a leaderboard have exactly this much XP, moved along
+    from the queued ScoreMoves. A player's rank is one more than the players
+    in the buckets above theirs (leaderboard.py).
+    """
+    # XP column the board ranks by ('total_xp' or a category column)
+    board = models.CharField(max_length=20)
+    xp = models.IntegerField()
+    players = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['board', 'xp']
+
+    def __str__(self):
+        return f"{self.board}: {self.players} players at {self.xp} XP"
+
+
+class ScoreMove(models.Model):
+    """
+    XP added to a board column by xp.award_xp() that the LeaderboardScore
+    buckets don't count yet (leaderboard.apply_score_moves()).
+    """
+    user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE, related_name='score_moves')
+    board = models.CharField(max_length=20)
+    xp = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.xp:+d} XP on {self.board}"
+
+
 class BudgetSimulation(models.Model):
     question = models.TextField()
     monthly_income = models.DecimalField(max_digits=10, decimal_places=2)
     difficulty = models.CharField(max_length=1, choices=DIFFICULTIES, default='B')
     category = models.CharField(max_length=3, choices=CATEGORIES, null=True, default='BUD')
 
+    class Meta:
+        indexes = [
+            # INCLUDE (PostgreSQL only) lets the random pick read its ids from the index alone
+            models.Index(fields=['category', 'difficulty'], include=['id'], name='bs_category_difficulty_idx'),
+        ]
+
     def clean(self):
         """
         Validate that the sum of essential expenses is less than the monthly income.
@@ -137,6 +381,16 @@ class Expense(models.Model):
     feedback = models.TextField(help_text="Provide feedback on why this expense is or isn't essential")
     essential = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Partial index for the essential expense totals (validation, admin, results)
+            models.Index(
+                fields=['BudgetSimulation', 'amount'],
+                condition=models.Q(essential=True),
+                name='expense_essential_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name}: ${self.amount}" + (" (Essential)" if self.essential else "")
     
@@ -147,9 +401,40 @@ class FlashCard(models.Model):
     category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
     difficulty = models.CharField(max_length=1, choices=DIFFICULTIES, default='B')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'difficulty'], name='fc_category_difficulty_idx'),
+        ]
+
     def __str__(self):
         return f"Flash Card: {self.question} - {self.answer}"
 
+class FlashCardReview(models.Model):
+    """
+    SM-2 review state of one flash card for one player (see scheduler.py).
+    Kept small: the ease is stored in thousandths as a small integer.
+    """
+    user = models.ForeignKey(Cap_Ace_User, on_delete=models.CASCADE)
+    card = models.ForeignKey(FlashCard, on_delete=models.CASCADE, related_name='reviews')
+    # The card's category, so a category's due queue is read from one index
+    category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
+    # Ease factor x 1000 (2500 = 2.5)
+    ease = models.PositiveSmallIntegerField(default=2500)
+    interval_days = models.PositiveIntegerField(default=0)
+    repetitions = models.PositiveSmallIntegerField(default=0)
+    due_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'card']
+        indexes = [
+            # Next due card of a category: one seek to the smallest due_at, card_id included
+            # (PostgreSQL only) so the seek doesn't visit the table
+            models.Index(fields=['user', 'category', 'due_at'], include=['card_id'], name='review_user_cat_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - card {self.card_id} due {self.due_at:%Y-%m-%d %H:%M}"
+
 class MatchAndDrag(models.Model):
     feedback = models.TextField()
     category = models.CharField(max_length=3, choices=CATEGORIES, null=True)
@@ -0,0 +1,169 @@
+"""
+Render-ready question payloads.
+
+A payload holds everything the game templates and answer checks need for one
+question (text, answer, choices, feedback, display labels, expenses for budget
+simulations and terms for match and drag). It is built once with at most two
+queries, stored in the two-tier cache as compact JSON keyed by (type, id,
+content version) and reused until the question or its children change (see
+signals.py). When a content snapshot is loaded, payloads are read from it
+instead (see content_store.py).
+
+Payloads are built from the primary database: right after an edit the replica
+may still hold the old content, which would otherwise stay cached for
+PAYLOAD_TIMEOUT. Ids without a question aren't cached, so a question created
+under one later is found straight away.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from . import cache, content_store, routers
+from .models import (MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, BudgetSimulation, Expense,
+                     MatchAndDrag, TermsAndDefinitions, CATEGORIES, DIFFICULTIES)
+
+CATEGORY_LABELS = dict(CATEGORIES)
+DIFFICULTY_LABELS = dict(DIFFICULTIES)
+
+# Payloads change only when the question is edited, so they can live long
+PAYLOAD_TIMEOUT = 24 * 60 * 60
+
+
+class QuestionPayload(dict):
+    """
+    A question payload with attribute access, so templates written for the
+    model instances (question.question, card.get_difficulty_display, ...) render
+    it unchanged.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def get_category_display(self) -> str:
+        return CATEGORY_LABELS.get(self['category'], self['category'])
+
+    def get_difficulty_display(self) -> str:
+        return DIFFICULTY_LABELS.get(self['difficulty'], self['difficulty'])
+
+
+def namespace(question_type: str) -> str:
+    """Cache namespace holding the payloads of one question type."""
+    return f'payload_{question_type}'
+
+
+# Fields copied from each question model into its payload
+PAYLOAD_FIELDS = {
+    'MC': (MultipleChoice, ('id', 'question', 'answer', 'feedback', 'difficulty', 'category')),
+    'FIB': (FillInTheBlank, ('id', 'question', 'answer', 'missing_word', 'feedback', 'difficulty', 'category')),
+    'FC': (FlashCard, ('id', 'question', 'answer', 'feedback', 'difficulty', 'category')),
+    'BS': (BudgetSimulation, ('id', 'question', 'monthly_income', 'difficulty', 'category')),
+    'MAD': (MatchAndDrag, ('id', 'feedback', 'difficulty', 'category')),
+}
+
+
+def build_payloads(question_type: str, ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Load questions of one type from the database as plain dictionaries.
+
+    Uses one query for the questions and one for their children (distractors,
+    expenses or terms) however many questions are loaded.
+
+    Args:
+        question_type: MC, FIB, FC, BS or MAD
+        ids: Only load these questions (default: all of them)
+
+    Returns:
+        Payloads by question id, ordered by id
+    """
+    if question_type not in PAYLOAD_FIELDS:
+        raise ValueError(f"Unknown question type {question_type}")
+    model, fields = PAYLOAD_FIELDS[question_type]
+    queryset = model.objects.order_by('id')
+    if ids is not None:
+        queryset = queryset.filter(id__in=list(ids))
+    payloads = {question['id']: question for question in queryset.values(*fields)}
+    if not payloads:
+        return payloads
+
+    if question_type == 'MC':
+        for question in payloads.values():
+            question['distractors'] = []
+        distractors = MultipleChoiceDistractor.objects.filter(question_id__in=list(payloads)).order_by('id')
+        for question_id, distractor in distractors.values_list('question_id', 'distractor'):
+            payloads[question_id]['distractors'].append(distractor)
+    elif question_type == 'BS':
+        for simulation in payloads.values():
+            simulation['expenses'] = []
+        expenses = Expense.objects.filter(BudgetSimulation_id__in=list(payloads)).order_by('id')
+        for expense in expenses.values('BudgetSimulation_id', 'id', 'name', 'amount', 'feedback', 'essential'):
+            payloads[expense.pop('BudgetSimulation_id')]['expenses'].append(expense)
+    elif question_type == 'MAD':
+        for match in payloads.values():
+            match['terms'] = []
+        terms = TermsAndDefinitions.objects.filter(question_id__in=list(payloads)).order_by('id')
+        for term in terms.values('question_id', 'id', 'term', 'definition', 'feedback'):
+            payloads[term.pop('question_id')]['terms'].append(term)
+    return payloads
+
+
+def build_payload(question_type: str, pk: int) -> Optional[Dict[str, Any]]:
+    """Load one question from the database as a plain dictionary (None if it doesn't exist)."""
+    return build_payloads(question_type, [pk]).get(pk)
+
+
+def _encode(value):
+    # Money is kept as its exact string ("1250.00"), which renders like the Decimal did
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize(payload: Optional[Dict[str, Any]]) -> str:
+    """Compact JSON for a payload"""
+    return json.dumps(payload, default=_encode, separators=(',', ':'))
+
+
+def deserialize(data) -> Optional[QuestionPayload]:
+    """Payload from the JSON serialize() produced (str or bytes)"""
+    payload = json.loads(data)
+    if payload is None:
+        return None
+    for children in ('expenses', 'terms'):
+        if children in payload:
+            payload[children] = [QuestionPayload(child) for child in payload[children]]
+    return QuestionPayload(payload)
+
+
+# What an id without a question serializes to, never cached
+_NO_PAYLOAD = serialize(None)
+
+
+def _build_from_primary(question_type: str, pk: int) -> str:
+    with routers.use_primary():
+        return serialize(build_payload(question_type, pk))
+
+
+def get_payload(question_type: str, pk) -> Optional[QuestionPayload]:
+    """
+    The payload of one question, from the content snapshot or the cache when possible.
+
+    Returns None if the question doesn't exist (or ``pk`` isn't an id).
+    """
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    store = content_store.get_store()
+    if store is not None:
+        payload = store.get(question_type, pk)
+        if payload is not None:
+            return payload
+    data = cache.get_or_compute(
+        namespace(question_type), (pk,), lambda: _build_from_primary(question_type, pk),
+        lambda data: PAYLOAD_TIMEOUT if data != _NO_PAYLOAD else 0,
+    )
+    return deserialize(data)
+
@@ -0,0 +1,85 @@
+"""
+Query budgets for every URL in urls.py.
+
+Maps a URL name to the maximum number of database queries each HTTP method
+may issue for a single request. test_query_budgets.py exercises every route
+against a small and a large fixture and fails when a view goes over its budget
+or when its query count changes with the amount of data (an N+1).
+
+Budgets include the session and user lookups done for logged in requests.
+Answers add their attempt (attempts.py) to the in-process buffer, which costs
+no query until the buffer is due, except a first completion's attempt: one
+INSERT in its award's transaction.
+When a view gets cheaper, lower its budget here so the gain can't regress.
+"""
+
+QUERY_BUDGETS = {
+    # Dashboards and learning pages
+    'index': {'GET': 2},
+    'home': {'GET': 2},
+    'learn': {'GET': 5},
+    'learn_budget': {'GET': 3},
+    'learn_savings': {'GET': 3},
+    'learn_investing': {'GET': 3},
+    'learn_taxes': {'GET': 3},
+    'learn_credit': {'GET': 3},
+    'learn_balance': {'GET': 3},
+
+    # Accounts
+    'user_list': {'GET': 3},
+    'user_create': {'GET': 0},
+    'user_detail': {'GET': 3},
+    'user_edit': {'GET': 3},
+    'user_delete': {'GET': 3},
+    'register': {'GET': 0},
+
+    # Multiple choice management
+    'multiple_choice_list': {'GET': 3},
+    'multiple_choice_detail': {'GET': 4},
+    'multiple_choice_create': {'GET': 2},
+    'multiple_choice_edit': {'GET': 4},
+    'multiple_choice_delete': {'GET': 3},
+
+    # Games
+    # Measured with a cold payload cache; a POST usually finds the payload its GET cached.
+    # MC and FIB POSTs also pick the next question's id (one query), reserved in a signed cookie;
+    # the following GET skips the selection and loads the question's payload.
+    # A first completion writes its progress (linked to the registry within the INSERT), updates
+    # the totals, writes its XP award to the ledger (xp.py) and its attempt, queues the player's
+    # leaderboard moves (leaderboard.py), then adds to the player's daily activity (activity.py):
+    # an UPDATE, plus an INSERT on the day's first.
+    # Flash cards read the review queue (scheduler.py); a first review of a card is an UPDATE and an INSERT.
+    'play_multiple_choice': {'GET': 5, 'POST': 15},
+    'play_flash_card': {'GET': 6, 'POST': 15},
+    'play_fill_blank': {'GET': 4, 'POST': 14},
+    'play_budget_simulation': {'GET': 5, 'POST': 14},
+    'play_budget_simulation_difficulty': {'GET': 5},
+    'play_match_drag': {'GET': 2},
+    'play_question_packs': {'GET': 3},
+    'grade_pack_answer': {'POST': 4},
+    'play_mixed_review': {'GET': 2},
+    'quiz_session': {'GET': 10},
+    # Locks the player before reading their progress, so a double submission can't award twice.
+    # Flash cards move on in their review schedule together, whatever their number.
+    'quiz_answers': {'POST': 14},
+
+    # Staff diagnostics (reads the slow query log file, not the database)
+    'slow_query_report': {'GET': 2},
+    'question_stats_report': {'GET': 9},
+
+    # Leaderboards, read only: the cached top list, and for the player's rank their queued XP
+    # and one aggregate over the score buckets
+    'leaderboard': {'GET': 5},
+    'leaderboard_category': {'GET': 5},
+
+    # Status pages
+    'under_development': {'GET': 0},
+    'maintenance': {'GET': 0},
+    'status_200': {'GET': 0},
+    'status_404': {'GET': 0},
+    'status_500': {'GET': 0},
+
+    # Admin changelists
+    'admin:cap_ace_web_budgetsimulation_changelist': {'GET': 5},
+    'admin:cap_ace_web_multiplechoice_changelist': {'GET': 5},
+}
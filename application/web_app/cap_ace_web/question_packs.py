@@ -0,0 +1,82 @@
+"""
+Static question packs for the quick play game.
+
+build_question_packs writes every active MC, FIB and FC question into one JSON
+file per (category, type, difficulty) under STATIC_ROOT/packs, so the CDN
+serves them like any other static file. Answers, missing words and feedback are left
+out; the client posts each answer to GradePackAnswerView, which is the only
+request that reaches Python during a game.
+
+Pack file names carry a hash of their content, so they can be cached forever
+and a rebuild with changed content gets new URLs. The small, unhashed
+manifest.json maps each (category, type, difficulty) to its current pack:
+
+    {"version": "...", "packs": {"BUD": {"MC": {"B": "packs/BUD-MC-B.3f2a9c1d04e7.json"}}}}
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List
+
+from .models import DIFFICULTIES
+from .payloads import build_payloads
+from .registry import inactive_ids
+
+# Question types the quick play game can present
+PACK_TYPES = ('MC', 'FIB', 'FC')
+
+PACK_DIRECTORY = 'packs'
+MANIFEST_NAME = 'manifest.json'
+
+DIFFICULTY_LABELS = dict(DIFFICULTIES)
+
+
+def public_question(question_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a payload a player may see before answering."""
+    question = {'id': payload['id'], 'question': payload['question']}
+    if question_type == 'MC':
+        # Sorted so the answer's position doesn't give it away
+        question['choices'] = sorted(payload['distractors'] + [payload['answer']])
+    return question
+
+
+def build_packs(output_dir: str) -> Dict[str, Any]:
+    """
+    Write the question packs and their manifest into ``output_dir``.
+
+    Returns:
+        The manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for question_type in PACK_TYPES:
+        skipped = inactive_ids(question_type)
+        for payload in build_payloads(question_type).values():
+            if payload['id'] in skipped:
+                continue
+            key = (payload['category'], question_type, payload['difficulty'])
+            groups.setdefault(key, []).append(public_question(question_type, payload))
+
+    packs: Dict[str, Dict[str, Dict[str, str]]] = {}
+    version = hashlib.sha256()
+    for (category, question_type, difficulty), questions in sorted(groups.items(), key=lambda item: str(item[0])):
+        if category is None:
+            continue
+        content = json.dumps({
+            'category': category,
+            'type': question_type,
+            'difficulty': difficulty,
+            'difficulty_display': DIFFICULTY_LABELS.get(difficulty, difficulty),
+            'questions': questions,
+        }, separators=(',', ':')).encode()
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        name = f'{category}-{question_type}-{difficulty}.{digest}.json'
+        with open(os.path.join(output_dir, name), 'wb') as f:
+            f.write(content)
+        packs.setdefault(category, {}).setdefault(question_type, {})[difficulty] = f'{PACK_DIRECTORY}/{name}'
+        version.update(name.encode())
+
+    manifest = {'version': version.hexdigest()[:12], 'packs': packs}
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    return manifest
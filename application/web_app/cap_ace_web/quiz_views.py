@@ -0,0 +1,301 @@
+"""
+Quiz session API.
+
+A quiz session is fetched and answered in two requests however many questions
+it has:
+
+    GET  /api/quiz/<category>/?count=10
+         -> {"token": "...", "questions": [{"type": "MC", "id": 4, "question": ..., "choices": [...]}, ...]}
+
+    POST /api/quiz/answers/   token=...  answers={"MC:4": "...", "FIB:7": "...", "FC:2": "true", "BS:3": [11, 12]}
+         -> {"results": [{"type": "MC", "id": 4, "is_correct": true, "correct_answer": ..., "feedback": ...}, ...],
+             "xp_earned": 150}
+
+Questions are sent without their answers. The token is signed and names the
+player and the questions of the session, so only those questions can be
+answered with it and only by that player.
+"""
+import json
+import random
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core import signing
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse, Http404
+from django.views import View
+from django.views.generic import TemplateView
+
+from .attempts import record_attempts
+from .scheduler import review_cards
+from .xp import XP_BY_DIFFICULTY, award_xp_bulk
+from .models import (MultipleChoice, FillInTheBlank, FlashCard, BudgetSimulation, Question, QuestionProgress,
+                     Cap_Ace_User, CATEGORIES)
+
+QUIZ_SALT = 'cap_ace_web.quiz_session'
+
+# Question types a quiz session can contain, with their model and related objects to prefetch
+QUIZ_TYPES = {
+    'MC': (MultipleChoice, ['distractors']),
+    'FIB': (FillInTheBlank, []),
+    'FC': (FlashCard, []),
+    'BS': (BudgetSimulation, ['expenses']),
+}
+
+
+def sign_quiz(user, category: str, questions: List[Tuple[str, int]]) -> str:
+    """Signed token naming the player, category and (type, id) of each question."""
+    return signing.dumps(
+        {'user': user.pk, 'category': category, 'questions': [list(question) for question in questions]},
+        salt=QUIZ_SALT, compress=True,
+    )
+
+
+def load_quiz(token: str, user) -> Dict[str, Any]:
+    """
+    Verify a quiz token.
+
+    Raises:
+        signing.BadSignature: The token was tampered with, expired or belongs to another player
+    """
+    quiz = signing.loads(token, salt=QUIZ_SALT, max_age=settings.QUIZ_SESSION_MAX_AGE)
+    if quiz['user'] != user.pk:
+        raise signing.BadSignature("Quiz session belongs to another player")
+    return quiz
+
+
+def question_candidates(user, category: str, exclude_completed: bool = True) -> List[Tuple[str, int]]:
+    """
+    (type, id) of every quiz question in a category, in one query on the
+    question registry.
+
+    With ``exclude_completed`` the questions the player has completed are left
+    out by a subquery on their progress, still within the one query.
+    """
+    questions = Question.objects.filter(category=category, is_active=True, question_type__in=list(QUIZ_TYPES))
+    if exclude_completed:
+        questions = questions.exclude(Exists(QuestionProgress.objects.filter(user=user, registry=OuterRef('pk'))))
+    return list(questions.values_list('question_type', 'object_id'))
+
+
+def load_questions(questions: List[Tuple[str, int]]) -> Dict[Tuple[str, int], Any]:
+    """
+    Model instances of the given questions by (type, id).
+
+    One query per type, plus one per prefetched relation (distractors,
+    expenses), however many questions there are.
+    """
+    ids_by_type: Dict[str, List[int]] = {}
+    for question_type, pk in questions:
+        ids_by_type.setdefault(question_type, []).append(pk)
+    loaded = {}
+    for question_type, ids in ids_by_type.items():
+        model, related = QUIZ_TYPES[question_type]
+        for question in model.objects.filter(id__in=ids).prefetch_related(*related):
+            loaded[(question_type, question.id)] = question
+    return loaded
+
+
+def public_question(question_type: str, question) -> Dict[str, Any]:
+    """What the player sees of a question before answering."""
+    data = {
+        'type': question_type,
+        'id': question.id,
+        'question': question.question,
+        'difficulty': question.difficulty,
+        'difficulty_display': question.get_difficulty_display(),
+    }
+    if question_type == 'MC':
+        choices = [distractor.distractor for distractor in question.distractors.all()] + [question.answer]
+        random.shuffle(choices)
+        data['choices'] = choices
+    elif question_type == 'BS':
+        data['monthly_income'] = float(question.monthly_income)
+        data['expenses'] = [
+            {'id': expense.id, 'name': expense.name, 'amount': float(expense.amount)}
+            for expense in question.expenses.all()
+        ]
+    return data
+
+
+def grade(question_type: str, question, answer) -> Dict[str, Any]:
+    """Check one answer the same way the game views do."""
+    if question_type == 'MC':
+        correct_answer = question.answer
+        is_correct = (answer == correct_answer)
+        feedback = question.feedback
+    elif question_type == 'FIB':
+        correct_answer = question.missing_word
+        is_correct = (answer == correct_answer)
+        feedback = question.feedback
+    elif question_type == 'FC':
+        correct_answer = question.answer
+        is_correct = (str(answer).lower() == 'true') == question.answer
+        feedback = question.feedback
+    else:
+        # A budget is correct when it keeps every essential expense and stays within the income
+        expenses = {expense.id: expense for expense in question.expenses.all()}
+        try:
+            selected = {int(expense_id) for expense_id in answer or []}
+        except (TypeError, ValueError):
+            selected = set()
+        selected &= set(expenses)
+        total = sum(float(expenses[expense_id].amount) for expense_id in selected)
+        missing_essential = [expense for expense in expenses.values() if expense.essential and expense.id not in selected]
+        is_correct = not missing_essential and total <= float(question.monthly_income)
+        correct_answer = [expense.id for expense in expenses.values() if expense.essential]
+        feedback = ' '.join(f"{expense.name}: {expense.feedback}" for expense in missing_essential)
+    return {
+        'type': question_type,
+        'id': question.id,
+        'is_correct': is_correct,
+        'correct_answer': correct_answer,
+        'feedback': feedback,
+    }
+
+
+def random_questions(user, category: str, count: int) -> List[Tuple[str, int]]:
+    """
+    ``count`` random (type, id) of mixed types, uncompleted ones first like in the games.
+
+    One query, and a second only once fewer than ``count`` questions are left uncompleted.
+    """
+    uncompleted = question_candidates(user, category)
+    chosen = random.sample(uncompleted, min(count, len(uncompleted)))
+    if len(chosen) < count:
+        # Top up with completed questions once the uncompleted ones run out
+        remaining = set(question_candidates(user, category, exclude_completed=False)) - set(uncompleted)
+        chosen += random.sample(sorted(remaining), min(count - len(chosen), len(remaining)))
+    return chosen
+
+
+class QuizSessionView(LoginRequiredMixin, View):
+    """Start a quiz session: ``count`` questions of mixed types from one category."""
+
+    def get(self, request, category):
+        category_mapping = {
+            'budget': 'BUD',
+            'investing': 'INV',
+            'savings': 'SAV',
+            'balance': 'BAL',
+            'credit': 'CRD',
+            'taxes': 'TAX',
+        }
+        if category not in category_mapping:
+            raise Http404("Unknown category")
+        db_category = category_mapping[category]
+        try:
+            count = min(max(int(request.GET.get('count', 10)), 1), settings.QUIZ_SESSION_MAX_QUESTIONS)
+        except ValueError:
+            return JsonResponse({'error': 'count must be a number'}, status=400)
+
+        chosen = random_questions(request.user, db_category, count)
+
+        loaded = load_questions(chosen)
+        questions = [public_question(question_type, loaded[(question_type, pk)]) for question_type, pk in chosen]
+        return JsonResponse({
+            'token': sign_quiz(request.user, db_category, chosen),
+            'category': db_category,
+            'questions': questions,
+        })
+
+
+class MixedReviewView(LoginRequiredMixin, TemplateView):
+    """
+    Mixed review game: MC, FIB, flash card and budget questions of a category
+    in one round. The page runs on the quiz session API, one request for the
+    questions and one for the answers.
+    """
+    template_name = 'mixed_review/game.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        category_mapping = {
+            'budget': 'BUD',
+            'investing': 'INV',
+            'savings': 'SAV',
+            'balance': 'BAL',
+            'credit': 'CRD',
+            'taxes': 'TAX',
+        }
+        if kwargs['category'] not in category_mapping:
+            raise Http404("Unknown category")
+        context['category_code'] = category_mapping[kwargs['category']]
+        context['category_display'] = dict(CATEGORIES)[context['category_code']]
+        return context
+
+
+class QuizAnswersView(LoginRequiredMixin, View):
+    """Grade every answer of a quiz session at once, record progress and award XP."""
+
+    def post(self, request):
+        try:
+            quiz = load_quiz(request.POST.get('token', ''), request.user)
+            answers = json.loads(request.POST.get('answers', '{}'))
+        except signing.BadSignature:
+            return JsonResponse({'error': 'Invalid or expired quiz session'}, status=403)
+        except ValueError:
+            return JsonResponse({'error': 'answers must be a JSON object'}, status=400)
+        if not isinstance(answers, dict):
+            return JsonResponse({'error': 'answers must be a JSON object'}, status=400)
+
+        # Only questions of this session can be answered with its token
+        session_questions = [tuple(question) for question in quiz['questions']]
+        answered = [question for question in session_questions if f'{question[0]}:{question[1]}' in answers]
+        loaded = load_questions(answered)
+        results = [
+            grade(question_type, loaded[(question_type, pk)], answers[f'{question_type}:{pk}'])
+            for question_type, pk in answered
+            if (question_type, pk) in loaded
+        ]
+
+        # The session's attempts are written with its awards, or go to the attempt buffer
+        attempts = [
+            (result['type'], result['id'], answers[f"{result['type']}:{result['id']}"], result['is_correct'], None)
+            for result in results
+        ]
+        # Cards answered in a quiz move on in the review schedule as in the flash card game
+        review_cards(request.user, [
+            (loaded[(question_type, pk)], is_correct, latency_ms)
+            for question_type, pk, _, is_correct, latency_ms in attempts
+            if question_type == 'FC'
+        ])
+
+        correct = [(result['type'], result['id']) for result in results if result['is_correct']]
+        xp_earned = 0
+        if correct:
+            category = quiz['category']
+            with transaction.atomic():
+                # Lock the player (as award_xp() does) before reading what's done, so a
+                # submission sent twice waits for the first and then finds nothing new
+                Cap_Ace_User.objects.select_for_update().filter(pk=request.user.pk).values('pk').get()
+                done = set(QuestionProgress.objects.filter(
+                    user=request.user,
+                    category=category,
+                    question_type__in={question_type for question_type, _ in correct},
+                    question_id__in={pk for _, pk in correct}
+                ).values_list('question_type', 'question_id'))
+                new = [question for question in correct if question not in done]
+                QuestionProgress.objects.bulk_create([
+                    QuestionProgress(
+                        user=request.user,
+                        registry_id=Question.id_for(question_type, pk),
+                        question_id=pk,
+                        question_type=question_type,
+                        category=category
+                    )
+                    for question_type, pk in new
+                ])
+
+                # Only add XP for questions completed for the first time
+                awards = [
+                    (category, XP_BY_DIFFICULTY.get(loaded[question].difficulty, 0), *question) for question in new
+                ]
+                award_xp_bulk(request.user, awards, attempts)
+                xp_earned = sum(xp for _, xp, _, _ in awards)
+        else:
+            record_attempts(request.user, attempts)
+
+        return JsonResponse({'results': results, 'xp_earned': xp_earned})
@@ -0,0 +1,106 @@
+"""
+Question registry.
+
+Every question of every type has one Question row carrying its type, category,
+difficulty and active flag, and QuestionProgress points at that row. Saving or
+deleting a question keeps its row in step through signals (see signals.py).
+Bulk loaders that bypass signals call sync_registry() when they finish.
+"""
+from typing import Dict, Set
+
+from django.apps import apps as global_apps
+from django.db.models import Exists, OuterRef
+
+# Question type -> model name in this app
+REGISTRY_MODELS = {
+    'MC': 'MultipleChoice',
+    'FIB': 'FillInTheBlank',
+    'FC': 'FlashCard',
+    'BS': 'BudgetSimulation',
+    'MAD': 'MatchAndDrag',
+}
+
+# Types a player can complete (record QuestionProgress for); Match and Drag has no game that does
+COMPLETABLE_TYPES = ['MC', 'FIB', 'FC', 'BS']
+
+
+def register_question(question_type: str, question) -> None:
+    """Create or update the registry row of one question."""
+    Question = global_apps.get_model('cap_ace_web', 'Question')
+    fields = {'category': question.category, 'difficulty': question.difficulty}
+    updated = Question.objects.filter(question_type=question_type, object_id=question.pk).update(**fields)
+    if not updated:
+        Question.objects.create(question_type=question_type, object_id=question.pk, **fields)
+
+
+def unregister_question(question_type: str, pk: int) -> None:
+    """Delete the registry row of a deleted question, and the progress on it."""
+    Question = global_apps.get_model('cap_ace_web', 'Question')
+    Question.objects.filter(question_type=question_type, object_id=pk).delete()
+
+
+def inactive(question_type: str, ref: str = 'pk') -> Exists:
+    """
+    Condition, for .exclude(), matching questions of a type deactivated in the
+    registry, with ``ref`` the field holding their id. Questions not registered
+    yet stay playable.
+    """
+    Question = global_apps.get_model('cap_ace_web', 'Question')
+    return Exists(Question.objects.filter(question_type=question_type, object_id=OuterRef(ref), is_active=False))
+
+
+def inactive_ids(question_type: str) -> Set[int]:
+    """Ids of the questions of a type deactivated in the registry, for bulk builders."""
+    Question = global_apps.get_model('cap_ace_web', 'Question')
+    return set(Question.objects.filter(question_type=question_type, is_active=False).values_list('object_id', flat=True))
+
+
+def sync_registry() -> Dict[str, int]:
+    """
+    Bring the registry in line with the question tables in bulk: add missing
+    rows, update changed ones, drop rows of deleted questions, link progress
+    to its registry row and delete progress on questions that no longer exist.
+
+    Returns:
+        Number of registry rows created, updated and deleted, progress rows
+        linked and orphaned progress rows deleted
+    """
+    Question = global_apps.get_model('cap_ace_web', 'Question')
+    QuestionProgress = global_apps.get_model('cap_ace_web', 'QuestionProgress')
+    counts = dict.fromkeys(['created', 'updated', 'deleted', 'linked', 'orphans'], 0)
+
+    for question_type, model_name in REGISTRY_MODELS.items():
+        model = global_apps.get_model('cap_ace_web', model_name)
+        current = {pk: (category, difficulty) for pk, category, difficulty
+                   in model.objects.values_list('id', 'category', 'difficulty').iterator()}
+        registered = {row.object_id: row for row in Question.objects.filter(question_type=question_type).iterator()}
+
+        Question.objects.bulk_create([
+            Question(question_type=question_type, object_id=pk, category=category, difficulty=difficulty)
+            for pk, (category, difficulty) in current.items() if pk not in registered
+        ], batch_size=1000)
+        counts['created'] += len(current.keys() - registered.keys())
+
+        changed = []
+        for pk, row in registered.items():
+            if pk in current and (row.category, row.difficulty) != current[pk]:
+                row.category, row.difficulty = current[pk]
+                changed.append(row)
+        Question.objects.bulk_update(changed, ['category', 'difficulty'], batch_size=1000)
+        counts['updated'] += len(changed)
+
+        removed = [registered[pk].id for pk in registered.keys() - current.keys()]
+        for start in range(0, len(removed), 1000):
+            Question.objects.filter(id__in=removed[start:start + 1000]).delete()
+        counts['deleted'] += len(removed)
+
+    # Progress written without a registry link (bulk loads, rows from before the registry)
+    unlinked = QuestionProgress.objects.filter(registry__isnull=True)
+    counts['linked'] = unlinked.filter(Exists(Question.objects.filter(
+        question_type=OuterRef('question_type'), object_id=OuterRef('question_id')
+    ))).update(registry_id=Question.objects.filter(
+        question_type=OuterRef('question_type'), object_id=OuterRef('question_id')
+    ).values('id')[:1])
+    # What is still unlinked names a question that no longer exists
+    counts['orphans'], _ = unlinked.delete()
+    return counts
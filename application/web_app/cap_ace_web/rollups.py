@@ -0,0 +1,138 @@
+"""
+Per-question answer statistics.
+
+QuestionStats (attempts, correct rate, latency) and DistractorStats (how often
+each multiple choice distractor was picked) are totals kept up to date
+incrementally: update_rollups() counts only the attempts logged since its
+watermark, the id of the last AnswerAttempt it counted, and adds them to the
+stored totals. Run it periodically with `python manage.py rollup_attempts`.
+
+Ids are handed out in order but batches commit out of order, so the highest id
+visible now can have a lower one still uncommitted below it; a watermark moved
+past it would skip that batch for good. The job therefore notes the highest id
+it sees and when (seen_id, seen_at), and only counts up to a noted id once
+ROLLUP_SETTLE_SECONDS have passed: every batch holding a lower id had its id
+then, and has committed since. Answered_at is no use for this, as an answer
+can wait in the attempt buffer or the spill file long before it is written.
+Counting trails the attempt log by one to two settle periods.
+"""
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import AnswerAttempt, DistractorStats, MultipleChoiceDistractor, QuestionStats, RollupWatermark
+
+WATERMARK = 'question_stats'
+
+# Attempts counted per transaction
+ROLLUP_BATCH_SIZE = 10000
+
+
+def update_rollups(batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """
+    Add the next ``batch_size`` settled attempts after the watermark to the
+    totals and move the watermark past them, in one transaction.
+
+    Returns:
+        Number of attempts counted (0 once every settled attempt is counted)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked, so two jobs running at once can't count the same attempts twice
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        if watermark.last_id >= watermark.seen_id:
+            # Counted up to the last id noted, note the highest one now
+            watermark.seen_id = AnswerAttempt.objects.aggregate(last=Max('id'))['last'] or 0
+            watermark.seen_at = now
+            watermark.save(update_fields=['seen_id', 'seen_at'])
+        if (now - watermark.seen_at).total_seconds() < settings.ROLLUP_SETTLE_SECONDS:
+            return 0
+
+        window = AnswerAttempt.objects.filter(id__gt=watermark.last_id, id__lte=watermark.seen_id)
+        batch = window.order_by('id')[:batch_size].aggregate(last=Max('id'), count=Count('id'))
+        if not batch['count']:
+            return 0
+        window = window.filter(id__lte=batch['last'])
+
+        _add_question_stats(window)
+        _add_distractor_picks(window)
+
+        watermark.last_id = batch['last']
+        watermark.save(update_fields=['last_id'])
+    return batch['count']
+
+
+def _add_question_stats(window) -> None:
+    totals = (
+        window
+        .filter(question__isnull=False)
+        .values('question')
+        .annotate(
+            attempts=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            latency=Sum('latency_ms'),
+            timed=Count('latency_ms'),
+        )
+        .order_by()
+    )
+    totals = {row['question']: row for row in totals}
+    existing = QuestionStats.objects.in_bulk(list(totals))
+
+    new, changed = [], []
+    for question_id, row in totals.items():
+        stats = existing.get(question_id)
+        if stats is None:
+            stats = QuestionStats(question_id=question_id)
+            new.append(stats)
+        else:
+            changed.append(stats)
+        stats.attempts += row['attempts']
+        stats.correct += row['correct']
+        stats.correct_rate = stats.correct / stats.attempts
+        stats.total_latency_ms += row['latency'] or 0
+        stats.timed_attempts += row['timed']
+
+    QuestionStats.objects.bulk_create(new, batch_size=1000)
+    QuestionStats.objects.bulk_update(
+        changed, ['attempts', 'correct', 'correct_rate', 'total_latency_ms', 'timed_attempts'], batch_size=1000
+    )
+
+
+def _add_distractor_picks(window) -> None:
+    # Wrong multiple choice answers by question and answer text
+    picks: Dict[Tuple[int, str], int] = {
+        (question_id, answer): count
+        for question_id, answer, count in (
+            window
+            .filter(question__question_type='MC', is_correct=False)
+            .values_list('question__object_id', 'answer')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+    }
+    if not picks:
+        return
+
+    # Matched to the distractor with the same text
+    distractor_picks = {}
+    distractors = MultipleChoiceDistractor.objects.filter(question_id__in={question_id for question_id, _ in picks})
+    for distractor_id, question_id, text in distractors.values_list('id', 'question_id', 'distractor'):
+        count = picks.get((question_id, text))
+        if count:
+            distractor_picks[distractor_id] = distractor_picks.get(distractor_id, 0) + count
+
+    existing = DistractorStats.objects.in_bulk(list(distractor_picks))
+    new, changed = [], []
+    for distractor_id, count in distractor_picks.items():
+        stats = existing.get(distractor_id)
+        if stats is None:
+            new.append(DistractorStats(distractor_id=distractor_id, picks=count))
+        else:
+            stats.picks += count
+            changed.append(stats)
+    DistractorStats.objects.bulk_create(new, batch_size=1000)
+    DistractorStats.objects.bulk_update(changed, ['picks'], batch_size=1000)
@@ -0,0 +1,112 @@
+"""
+Read replica routing.
+
+Question content (questions, distractors, expenses, flash cards, ...) is read
+from the ``replica`` database; everything else, and every write, goes to the
+primary. User progress and XP are always read from the primary so players see
+their own answers immediately.
+
+The games exclude completed questions with a subquery that runs inline on
+the replica, so it can lag behind the primary. After a request writes to this
+app's tables, ReplicaRoutingMiddleware pins the session to the primary for
+REPLICA_STICKY_SECONDS, so neither those subqueries nor content the user just
+changed (e.g. a staff member editing a question) are read back stale.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import router, DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+
+# Models whose reads can be served by the replica
+REPLICA_MODELS = {
+    'multiplechoice',
+    'multiplechoicedistractor',
+    'fillintheblank',
+    'budgetsimulation',
+    'expense',
+    'flashcard',
+    'matchanddrag',
+    'termsanddefinitions',
+}
+
+# Session key holding the time until which reads stay on the primary
+STICKY_SESSION_KEY = '_db_primary_until'
+
+_use_primary = ContextVar('use_primary', default=False)
+_writes = ContextVar('db_writes', default=None)
+
+
+@contextmanager
+def use_primary():
+    """Read everything from the primary inside the block."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def replica_enabled() -> bool:
+    """True when ReplicaRouter is one of the configured DATABASE_ROUTERS."""
+    return any(isinstance(r, ReplicaRouter) for r in router.routers)
+
+
+class ReplicaRouter:
+    """Send content reads to the replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label == 'cap_ace_web'
+            and model._meta.model_name in REPLICA_MODELS
+            and not _use_primary.get()
+            # Reads after a write in the same request (e.g. picking the next
+            # question after recording an answer) must see that write
+            and not _writes.get()
+        ):
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and model._meta.app_label == 'cap_ace_web':
+            writes.add(model._meta.model_name)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Keep a session on the primary for a while after it writes.
+
+    Does nothing unless ReplicaRouter is configured.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_enabled():
+            return self.get_response(request)
+
+        sticky = request.session.get(STICKY_SESSION_KEY, 0) > time.time()
+        primary_token = _use_primary.set(sticky)
+        writes_token = _writes.set(set())
+        try:
+            response = self.get_response(request)
+            wrote = bool(_writes.get())
+        finally:
+            _use_primary.reset(primary_token)
+            _writes.reset(writes_token)
+
+        if wrote:
+            request.session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+        return response
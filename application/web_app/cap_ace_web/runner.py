@@ -0,0 +1,33 @@
+"""
+Test runner of the project (settings.TEST_RUNNER).
+
+Answer attempts are kept in an in-process buffer across requests
+(attempts.py), so tests can leave some behind. Every test starts with the
+buffer empty, or what an earlier test left could be written during a later
+test's request once it is old enough, adding queries to that request. It is
+emptied again before the test databases go away, rather than written by the
+exit handler into tables that no longer exist.
+"""
+import unittest
+
+from django.test.runner import DiscoverRunner
+
+from . import attempts
+
+
+class EmptyAttemptBufferResult:
+    """Result mixin emptying the attempt buffer before every test."""
+
+    def startTest(self, test):
+        attempts.reset()
+        super().startTest(test)
+
+
+class TestRunner(DiscoverRunner):
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type('TestResult', (EmptyAttemptBufferResult, base), {})
+
+    def teardown_databases(self, old_config, **kwargs):
+        attempts.reset()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,183 @@
+"""
+Spaced repetition of flash cards, after the SM-2 algorithm.
+
+Every card a player has answered has a FlashCardReview row with its ease
+factor, current interval and when it is next due. A right answer pushes the
+card out (1 day, then 6, then the previous interval times the ease) and
+raises or keeps the ease depending on how quickly it came; a wrong answer
+starts the card over and brings it back within minutes.
+
+The row is changed with one UPDATE whose new values are SQL expressions over
+the old ones, so answering costs a single statement and no read. Picking the
+next card reads the player's due queue of the category from the
+(user, category, due_at) index: a due card if there is one, otherwise a card
+the player has never seen, otherwise the card coming up soonest. Cards
+deactivated in the question registry are left out.
+"""
+import random
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Iterable, Optional, Tuple
+
+from django.db.models import Case, DurationField, Exists, ExpressionWrapper, F, Max, Min, OuterRef, Value, When
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from . import cache
+from .models import FlashCard, FlashCardReview
+from .registry import inactive
+
+# Ease factors in thousandths, as stored
+DEFAULT_EASE = 2500
+MIN_EASE = 1300
+# Not part of SM-2, keeps the small integer column from overflowing
+MAX_EASE = 5000
+
+MAX_INTERVAL_DAYS = 365
+# A missed card comes back this soon
+RELEARN_DELAY = timedelta(minutes=10)
+# Right answers quicker than this count as perfect recall (quality 5), others as 4
+FAST_ANSWER_MS = 5000
+
+
+def answer_quality(is_correct: bool, latency_ms: Optional[int] = None) -> int:
+    """SM-2 response quality (0-5) of an answer."""
+    if not is_correct:
+        return 1
+    return 5 if latency_ms is not None and latency_ms < FAST_ANSWER_MS else 4
+
+
+def ease_change(quality: int) -> int:
+    """SM-2 change of the ease factor for a response quality, in thousandths."""
+    misses = 5 - quality
+    return 100 - misses * (80 + misses * 20)
+
+
+def review_card(user, card, is_correct: bool, latency_ms: Optional[int] = None) -> None:
+    """
+    Move the card's schedule on after an answer.
+
+    Args:
+        card: FlashCard or its payload (only id and category are used)
+    """
+    now = timezone.now()
+    reviews = FlashCardReview.objects.filter(user=user, card_id=card.id)
+    if not _advance(reviews, answer_quality(is_correct, latency_ms), now):
+        # First answer to this card. A concurrent first answer wins the race and this one is dropped.
+        FlashCardReview.objects.bulk_create([_first_review(user, card, is_correct, latency_ms, now)],
+                                            ignore_conflicts=True)
+
+
+def review_cards(user, answers: Iterable[Tuple[Any, bool, Optional[int]]]) -> None:
+    """
+    review_card() for several cards at once, as a quiz session grades them: one
+    read of which cards have a schedule, an UPDATE per response quality and one
+    INSERT for the rest, however many cards there are.
+
+    Args:
+        answers: (card, is_correct, latency_ms) of each card answered
+    """
+    answers = list(answers)
+    if not answers:
+        return
+    now = timezone.now()
+    scheduled = set(FlashCardReview.objects.filter(
+        user=user, card_id__in=[card.id for card, _, _ in answers]
+    ).values_list('card_id', flat=True))
+
+    by_quality = defaultdict(list)
+    first = []
+    for card, is_correct, latency_ms in answers:
+        if card.id in scheduled:
+            by_quality[answer_quality(is_correct, latency_ms)].append(card.id)
+        else:
+            first.append(_first_review(user, card, is_correct, latency_ms, now))
+    for quality, card_ids in by_quality.items():
+        _advance(FlashCardReview.objects.filter(user=user, card_id__in=card_ids), quality, now)
+    if first:
+        FlashCardReview.objects.bulk_create(first, ignore_conflicts=True)
+
+
+def _advance(reviews, quality: int, now) -> int:
+    """Move the reviews on after an answer of the given quality; returns how many there were."""
+    if quality >= 3:
+        # Right-hand sides read the old values, so the interval uses the ease before this answer
+        interval = Case(
+            When(repetitions=0, then=Value(1)),
+            When(repetitions=1, then=Value(6)),
+            default=Least((F('interval_days') * F('ease') + 500) / 1000, Value(MAX_INTERVAL_DAYS)),
+        )
+        return reviews.update(
+            ease=Least(Greatest(F('ease') + ease_change(quality), Value(MIN_EASE)), Value(MAX_EASE)),
+            interval_days=interval,
+            repetitions=F('repetitions') + 1,
+            due_at=Value(now) + ExpressionWrapper(interval * Value(timedelta(days=1)), output_field=DurationField()),
+        )
+    # SM-2 starts a missed card over without changing its ease
+    return reviews.update(repetitions=0, interval_days=0, due_at=now + RELEARN_DELAY)
+
+
+def _first_review(user, card, is_correct: bool, latency_ms: Optional[int], now) -> FlashCardReview:
+    if not is_correct:
+        return FlashCardReview(user=user, card_id=card.id, category=card.category, due_at=now + RELEARN_DELAY)
+    return FlashCardReview(
+        user=user,
+        card_id=card.id,
+        category=card.category,
+        ease=max(DEFAULT_EASE + ease_change(answer_quality(True, latency_ms)), MIN_EASE),
+        interval_days=1,
+        repetitions=1,
+        due_at=now + timedelta(days=1),
+    )
+
+
+@cache.cached('payload_FC')
+def card_id_range(category: str) -> Tuple[Optional[int], Optional[int]]:
+    """Smallest and largest flash card id of a category."""
+    bounds = FlashCard.objects.filter(category=category).aggregate(low=Min('id'), high=Max('id'))
+    return bounds['low'], bounds['high']
+
+
+def next_card_id(user, category: str, exclude_id=None) -> Optional[int]:
+    """
+    The flash card the player should see next in a category: the most overdue
+    card, else a random card they have never answered, else the card due
+    soonest. ``exclude_id`` (the card just answered) is only picked when the
+    category has no other card.
+    """
+    reviews = FlashCardReview.objects.filter(user=user, category=category).exclude(inactive('FC', 'card_id'))
+    if exclude_id:
+        reviews = reviews.exclude(card_id=exclude_id)
+    upcoming = reviews.order_by('due_at').values_list('card_id', 'due_at').first()
+    if upcoming is not None and upcoming[1] <= timezone.now():
+        return upcoming[0]
+
+    new_card = _new_card_id(user, category, exclude_id)
+    if new_card is not None:
+        return new_card
+    if upcoming is not None:
+        return upcoming[0]
+    return int(exclude_id) if exclude_id else None
+
+
+def _new_card_id(user, category: str, exclude_id=None) -> Optional[int]:
+    """
+    A random card of the category the player has no review of: the first one
+    from a random id up, wrapping around to the start. Both reads walk the
+    primary key from the pivot, however many cards and reviews there are.
+    """
+    low, high = card_id_range(category)
+    if low is None:
+        return None
+    unseen = (
+        FlashCard.objects
+        .filter(category=category)
+        .exclude(Exists(FlashCardReview.objects.filter(user=user, card=OuterRef('pk'))))
+        .exclude(inactive('FC'))
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    if exclude_id:
+        unseen = unseen.exclude(id=exclude_id)
+    pivot = random.randint(low, high)
+    return unseen.filter(id__gte=pivot).first() or unseen.filter(id__lt=pivot).first()
@@ -0,0 +1,78 @@
+"""
+Cache invalidation.
+
+Every cache namespace holding values derived from question content is listed
+in CONTENT_NAMESPACES with the models it is built from. Saving or deleting
+one of those models (admin, staff views, the generate_* and import commands)
+bumps the namespace version. Bulk loaders that bypass signals call
+invalidate_content() when they finish.
+
+The same signals keep the question registry (registry.py) in step, and take
+deleted players off the leaderboards (leaderboard.py).
+"""
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, pre_delete
+
+from . import cache, leaderboard, registry
+from .models import (MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, BudgetSimulation, Expense,
+                     MatchAndDrag, TermsAndDefinitions, Question, Cap_Ace_User)
+
+# Cache namespace -> models its values are computed from
+CONTENT_NAMESPACES = {
+    'question_counts': [MultipleChoice, FillInTheBlank, FlashCard, BudgetSimulation, MatchAndDrag, Question],
+    # Pre-serialized game payloads (payloads.py)
+    'payload_MC': [MultipleChoice, MultipleChoiceDistractor],
+    'payload_FIB': [FillInTheBlank],
+    'payload_FC': [FlashCard],
+    'payload_BS': [BudgetSimulation, Expense],
+    'payload_MAD': [MatchAndDrag, TermsAndDefinitions],
+    # Marks a compiled content snapshot out of date (content_store.py); the snapshot
+    # leaves out deactivated questions, so registry edits mark it too
+    'content_snapshot': [MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, BudgetSimulation,
+                         Expense, MatchAndDrag, TermsAndDefinitions, Question],
+}
+
+
+def invalidate_content() -> None:
+    """Invalidate every namespace derived from question content."""
+    for namespace in CONTENT_NAMESPACES:
+        cache.invalidate(namespace)
+
+
+def _invalidator(namespace):
+    def handler(sender, **kwargs):
+        cache.invalidate(namespace)
+    return handler
+
+
+def _registrar(question_type):
+    def saved(sender, instance, **kwargs):
+        registry.register_question(question_type, instance)
+
+    def deleted(sender, instance, **kwargs):
+        registry.unregister_question(question_type, instance.pk)
+    return saved, deleted
+
+
+def _leave_leaderboards(sender, instance, **kwargs):
+    # Before the delete cascades to the player's queued moves
+    leaderboard.leave_leaderboards(instance)
+
+
+def connect_signals() -> None:
+    """Called from CapAceWebConfig.ready()."""
+    for namespace, models in CONTENT_NAMESPACES.items():
+        handler = _invalidator(namespace)
+        for model in models:
+            dispatch_uid = f'cache-invalidate-{namespace}-{model._meta.label_lower}'
+            post_save.connect(handler, sender=model, dispatch_uid=dispatch_uid, weak=False)
+            post_delete.connect(handler, sender=model, dispatch_uid=dispatch_uid, weak=False)
+
+    for question_type, model_name in registry.REGISTRY_MODELS.items():
+        model = apps.get_model('cap_ace_web', model_name)
+        saved, deleted = _registrar(question_type)
+        dispatch_uid = f'question-registry-{question_type}'
+        post_save.connect(saved, sender=model, dispatch_uid=dispatch_uid, weak=False)
+        post_delete.connect(deleted, sender=model, dispatch_uid=dispatch_uid, weak=False)
+
+    pre_delete.connect(_leave_leaderboards, sender=Cap_Ace_User, dispatch_uid='leaderboard-leave', weak=False)
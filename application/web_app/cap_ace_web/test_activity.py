@@ -0,0 +1,122 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from . import cache
+from .activity import HEATMAP_WEEKS, activity_summary, rebuild_activity, record_activity
+from .models import DailyActivity, MultipleChoice, QuestionProgress, XPAward
+from .xp import award_xp
+
+User = get_user_model()
+
+
+class DailyActivityTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+
+    def rows(self):
+        return list(DailyActivity.objects.filter(user=self.user).order_by('day').values_list(
+            'day', 'completed', 'xp', 'streak'
+        ))
+
+    def test_awards_add_to_the_day(self):
+        """Test that awards add their completions and XP to the player's row of the day"""
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        award_xp(self.user, 'TAX', 50, 'FC', 2)
+        award_xp(self.user, 'TAX', 50)
+        self.assertEqual(self.rows(), [(timezone.localdate(), 2, 200, 1)])
+
+    def test_streak_carries_on_from_yesterday(self):
+        """Test that a day's first activity continues yesterday's streak and a gap starts a new one"""
+        day = date(2024, 3, 1)
+        record_activity(self.user, 1, 50, day)
+        record_activity(self.user, 1, 50, day + timedelta(days=1))
+        record_activity(self.user, 2, 100, day + timedelta(days=1))
+        record_activity(self.user, 1, 50, day + timedelta(days=3))
+        self.assertEqual([row[3] for row in self.rows()], [1, 2, 1])
+        self.assertEqual(self.rows()[1][1:3], (3, 150))
+
+    def test_rebuild_matches_recorded_activity(self):
+        """Test that the bulk rebuild rolls progress and ledger rows up into the rows awards write"""
+        question = MultipleChoice.objects.create(question="Q?", answer="A", feedback="", category='BUD',
+                                                 difficulty='B')
+        other = User.objects.create_user(username='other', password='testpass123')
+        start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        for user, offsets in ((self.user, (0, 1, 1, 3)), (other, (1,))):
+            for number, offset in enumerate(offsets):
+                completed_at = start + timedelta(days=offset)
+                QuestionProgress.objects.filter(pk=QuestionProgress.objects.create(
+                    user=user, question_id=question.id + number, question_type='MC', category='BUD'
+                ).pk).update(completed_at=completed_at)
+                XPAward.objects.create(user=user, category='BUD', xp=50, question_type='MC',
+                                       question_id=question.id + number, awarded_at=completed_at)
+        # XP without a question counts towards the day's XP only
+        XPAward.objects.create(user=self.user, category='BUD', xp=25, awarded_at=start + timedelta(days=2))
+
+        # One player per batch, so each player's rows are rebuilt in their own transaction
+        self.assertEqual(rebuild_activity(batch_size=1), 5)
+        self.assertEqual(self.rows(), [
+            (date(2024, 3, 1), 1, 50, 1),
+            (date(2024, 3, 2), 2, 100, 2),
+            (date(2024, 3, 3), 0, 25, 3),
+            (date(2024, 3, 4), 1, 50, 4),
+        ])
+        self.assertEqual(list(DailyActivity.objects.filter(user=other).values_list('day', 'streak')),
+                         [(date(2024, 3, 2), 1)])
+
+    def test_backfill_command(self):
+        """Test that the command replaces the rollups with ones rebuilt from the ledger"""
+        award_xp(self.user, 'BUD', 100)
+        DailyActivity.objects.update(xp=1)
+        out = StringIO()
+        call_command('backfill_activity', stdout=out)
+        self.assertIn('Rebuilt 1 daily activity rows', out.getvalue())
+        self.assertEqual(self.rows(), [(timezone.localdate(), 0, 100, 1)])
+
+    def test_summary_is_one_query(self):
+        """Test that the streak, heatmap and XP chart come from one query of the player's recent days"""
+        today = date(2024, 3, 20)
+        for offset, completed in ((200, 5), (2, 12), (1, 4), (0, 1)):
+            record_activity(self.user, completed, 50 * completed, today - timedelta(days=offset))
+        self.user.total_xp = 1000
+
+        with self.assertNumQueries(1):
+            summary = activity_summary(self.user, today)
+        self.assertEqual((summary['streak'], summary['active_days']), (3, 3))
+
+        cells = [cell for week in summary['heatmap'] for cell in week]
+        self.assertEqual(len(summary['heatmap']), HEATMAP_WEEKS)
+        self.assertEqual(cells[0]['day'].weekday(), 0)
+        by_day = {cell['day']: cell for cell in cells}
+        self.assertEqual([by_day[today - timedelta(days=offset)]['level'] for offset in range(4)], [1, 2, 4, 0])
+        self.assertTrue(by_day[today + timedelta(days=1)]['future'])
+
+        totals = summary['xp_chart']['totals']
+        self.assertEqual(summary['xp_chart']['labels'][-1], today.isoformat())
+        self.assertEqual((totals[0], totals[-3], totals[-2], totals[-1]), (150, 750, 950, 1000))
+
+    def test_streak_ends_after_a_missed_day(self):
+        """Test that a streak still counts until the end of the day after the last activity"""
+        day = date(2024, 3, 1)
+        record_activity(self.user, 1, 50, day)
+        self.assertEqual(activity_summary(self.user, day + timedelta(days=1))['streak'], 1)
+        self.assertEqual(activity_summary(self.user, day + timedelta(days=2))['streak'], 0)
+
+
+class DashboardActivityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.login(username='player', password='testpass123')
+
+    def test_dashboard_shows_activity(self):
+        """Test that the dashboard renders the streak, heatmap and XP chart data"""
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        response = self.client.get(reverse('learn'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['activity']['streak'], 1)
+        self.assertContains(response, 'Current Streak: 1 day')
+        self.assertContains(response, 'id="xp-chart-data"')
@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from . import attempts, cache
+from .models import MultipleChoice, MultipleChoiceDistractor, FlashCard, AnswerAttempt, Question
+
+User = get_user_model()
+
+
+class AnswerAttemptTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        attempts.reset()
+        self.addCleanup(attempts.reset)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.spill_path = os.path.join(self.directory, 'attempts.jsonl')
+        self.settings_override = override_settings(ATTEMPT_SPILL_PATH=self.spill_path)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        self.question = MultipleChoice.objects.create(
+            question="What is a budget?", answer="A spending plan", feedback="", category='BUD'
+        )
+        MultipleChoiceDistractor.objects.create(question=self.question, distractor="A loan")
+        self.card = FlashCard.objects.create(question="Budgets help?", answer=True, feedback="", category='BUD')
+
+    def test_every_answer_is_logged(self):
+        """Test that wrong and repeated answers are logged with the chosen option and latency"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A loan', 'latency_ms': '4200'})
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A spending plan'})
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A spending plan', 'latency_ms': '-5'})
+        attempts.flush()
+
+        logged = sorted(AnswerAttempt.objects.values_list('answer', 'is_correct', 'latency_ms'), key=str)
+        self.assertEqual(logged, [('A loan', False, 4200), ('A spending plan', True, None), ('A spending plan', True, None)])
+        registry = Question.objects.get(question_type='MC', object_id=self.question.id)
+        self.assertEqual(set(AnswerAttempt.objects.values_list('question', flat=True)), {registry.id})
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=3, ATTEMPT_BUFFER_SECONDS=float('inf'))
+    def test_attempts_are_written_in_batches(self):
+        """Test that attempts wait in the buffer until it is full, then go out in one INSERT"""
+        attempts.record_attempt(self.user, 'MC', self.question.id, 'A loan', False)
+        attempts.record_attempt(self.user, 'FC', self.card.id, 'true', True)
+        self.assertFalse(AnswerAttempt.objects.exists())
+        # A single INSERT, without a transaction around it
+        with self.assertNumQueries(1):
+            attempts.record_attempt(self.user, 'MC', self.question.id, 'A spending plan', True, 900)
+        self.assertEqual(AnswerAttempt.objects.count(), 3)
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=100, ATTEMPT_BUFFER_SECONDS=0)
+    def test_old_attempts_are_written(self):
+        """Test that the buffer is written once its oldest attempt has waited long enough"""
+        attempts.record_attempt(self.user, 'FC', self.card.id, 'false', False)
+        self.assertEqual(AnswerAttempt.objects.count(), 1)
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=1)
+    def test_batch_is_spilled_while_a_flush_is_running(self):
+        """Test that a batch goes to the spill file instead of waiting, and is written with the next one"""
+        with attempts._flush_lock:
+            attempts.record_attempt(self.user, 'MC', self.question.id, 'A loan', False, 1200)
+        self.assertFalse(AnswerAttempt.objects.exists())
+        with open(self.spill_path) as spill:
+            spilled = [json.loads(line) for line in spill]
+        self.assertEqual([attempt['answer'] for attempt in spilled], ['A loan'])
+
+        attempts.record_attempt(self.user, 'FC', self.card.id, 'true', True)
+        self.assertEqual(
+            sorted(AnswerAttempt.objects.values_list('answer', 'latency_ms')), [('A loan', 1200), ('true', None)]
+        )
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=100, ATTEMPT_BUFFER_SECONDS=float('inf'))
+    def test_awarded_answer_is_written_with_its_award(self):
+        """Test that a first completion's attempt is written in the award's transaction and a wrong answer waits"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A loan'})
+        self.assertFalse(AnswerAttempt.objects.exists())
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A spending plan'})
+        self.assertEqual(list(AnswerAttempt.objects.values_list('answer', flat=True)), ['A spending plan'])
+        self.assertEqual(attempts.flush(), 1)
+
+    @override_settings(ATTEMPT_FLUSH_EACH_REQUEST=True, ATTEMPT_BUFFER_SIZE=100,
+                       ATTEMPT_BUFFER_SECONDS=float('inf'))
+    def test_request_writes_its_attempts(self):
+        """Test that with flushing every request, attempts are written before the response goes out"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        self.client.post(url, {'question_id': self.question.id, 'answer': 'A loan'})
+        self.assertEqual(AnswerAttempt.objects.count(), 1)
+        self.assertEqual(attempts.flush(), 0)
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=100, ATTEMPT_BUFFER_SECONDS=float('inf'))
+    def test_buffer_kept_across_requests_until_due(self):
+        """Test that the buffer is kept across requests and any request writes it once it is old enough"""
+        attempts.record_attempt(self.user, 'MC', self.question.id, 'A loan', False)
+        self.client.get(reverse('learn'))
+        self.assertFalse(AnswerAttempt.objects.exists())
+        with override_settings(ATTEMPT_BUFFER_SECONDS=0):
+            self.client.get(reverse('learn'))
+        self.assertEqual(AnswerAttempt.objects.count(), 1)
+
+    @override_settings(ATTEMPT_FLUSH_EACH_REQUEST=True, ATTEMPT_BUFFER_SIZE=1)
+    def test_request_writes_spilled_attempts(self):
+        """Test that attempts spilled earlier are written at the end of the next request"""
+        with attempts._flush_lock:
+            attempts.record_attempt(self.user, 'MC', self.question.id, 'A loan', False)
+        self.assertTrue(os.path.exists(self.spill_path))
+        self.client.get(reverse('learn'))
+        self.assertEqual(list(AnswerAttempt.objects.values_list('answer', flat=True)), ['A loan'])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    @override_settings(ATTEMPT_BUFFER_SIZE=100, ATTEMPT_BUFFER_SECONDS=float('inf'))
+    def test_rejected_rows_are_dropped_alone(self):
+        """Test that a batch the database rejects is written row by row, dropping only the bad rows"""
+        attempts.record_attempt(self.user, 'MC', self.question.id, 'A loan', False)
+        # A negative latency breaks the column's check constraint
+        attempts.record_attempt(self.user, 'MC', self.question.id, 'A spending plan', True, -1)
+        attempts.record_attempt(self.user, 'FC', self.card.id, 'true', True)
+        with self.assertLogs('cap_ace_web.attempts', 'ERROR'):
+            self.assertEqual(attempts.flush(), 2)
+        self.assertEqual(sorted(AnswerAttempt.objects.values_list('answer', flat=True)), ['A loan', 'true'])
+
+    def test_quiz_answers_are_logged(self):
+        """Test that a quiz session logs every answer it grades"""
+        quiz = self.client.get(reverse('quiz_session', kwargs={'category': 'budget'})).json()
+        answers = {f"{question['type']}:{question['id']}": 'true' for question in quiz['questions']}
+        self.client.post(reverse('quiz_answers'), {'token': quiz['token'], 'answers': json.dumps(answers)})
+        self.assertEqual(
+            sorted(AnswerAttempt.objects.values_list('is_correct', flat=True)), [False, True]
+        )
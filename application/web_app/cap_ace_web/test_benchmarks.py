@@ -0,0 +1,172 @@
+import asyncio
+from io import StringIO
+from urllib.parse import urlsplit
+from django.test import TestCase, LiveServerTestCase
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.core.servers.basehttp import WSGIServer
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from .models import (MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, BudgetSimulation, Expense,
+                     MatchAndDrag, TermsAndDefinitions, QuestionProgress, FlashCardReview)
+from .management.commands.benchmark_views import percentile, summarize, compare_reports, seed_dataset, run_benchmark
+from .management.commands.load_test import extract_game, ensure_users, run_load_test
+from .management.commands.check_query_plans import check_plans, refresh_statistics
+
+
+class BenchmarkHelpersTest(TestCase):
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0)
+
+    def test_summarize(self):
+        """Test reducing samples to route statistics"""
+        summary = summarize([1.0, 2.0, 3.0, 4.0], [5, 5, 6, 7])
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['p50_ms'], 2.0)
+        self.assertEqual(summary['p99_ms'], 4.0)
+        self.assertEqual(summary['queries_max'], 7)
+
+    def test_compare_reports(self):
+        """Test that latency and query count regressions are flagged"""
+        baseline = {'routes': {
+            'learn': {'p95_ms': 10.0, 'queries_max': 5},
+            'play_multiple_choice:GET': {'p95_ms': 10.0, 'queries_max': 5},
+        }}
+        report = {'routes': {
+            'learn': {'p95_ms': 11.0, 'queries_max': 5},
+            'play_multiple_choice:GET': {'p95_ms': 20.0, 'queries_max': 6},
+            'new_route': {'p95_ms': 100.0, 'queries_max': 50},
+        }}
+        regressions = compare_reports(report, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(r.startswith('play_multiple_choice:GET') for r in regressions))
+
+
+class BenchmarkRunTest(TestCase):
+    def test_seed_and_run(self):
+        """Test seeding a tiny dataset and driving every route once"""
+        seed_dataset(num_questions=60, num_users=3, seed=1)
+        self.assertEqual(MultipleChoice.objects.count(), 12)
+        self.assertEqual(FlashCard.objects.count(), 12)
+        self.assertEqual(Expense.objects.count(), BudgetSimulation.objects.count() * 6)
+        self.assertTrue(QuestionProgress.objects.exists())
+
+        user = get_user_model().objects.order_by('id').first()
+        report = run_benchmark(user, iterations=1)
+        self.assertIn('learn', report['routes'])
+        self.assertIn('play_budget_simulation:POST', report['routes'])
+        for route, stats in report['routes'].items():
+            self.assertEqual(stats['errors'], 0, route)
+            self.assertGreater(stats['queries_max'], 0, route)
+
+
+class SeedSyntheticTest(TestCase):
+    def test_seed_is_deterministic_and_fixes_xp(self):
+        """Test that seeding creates every type with children and consistent XP totals"""
+        call_command('seed_synthetic', questions=50, users=20, history=30, seed=7, chunk_size=7, stdout=StringIO())
+
+        self.assertEqual(MultipleChoice.objects.count(), 10)
+        self.assertEqual(MultipleChoiceDistractor.objects.count(), 30)
+        self.assertEqual(TermsAndDefinitions.objects.count(), 40)
+        self.assertEqual(get_user_model().objects.count(), 20)
+
+        # Essential expenses never exceed the monthly income
+        for simulation in BudgetSimulation.objects.all():
+            essential = sum(e.amount for e in simulation.expenses.filter(essential=True))
+            self.assertLessEqual(essential, simulation.monthly_income)
+
+        # XP columns match the difficulty of every completed question
+        xp_mapping = {'B': 50, 'I': 100, 'A': 150}
+        models = {'MC': MultipleChoice, 'FIB': FillInTheBlank, 'FC': FlashCard, 'BS': BudgetSimulation}
+        user = max(get_user_model().objects.all(), key=lambda u: QuestionProgress.objects.filter(user=u).count())
+        expected = 0
+        for progress in QuestionProgress.objects.filter(user=user, category='BUD'):
+            expected += xp_mapping[models[progress.question_type].objects.get(id=progress.question_id).difficulty]
+        self.assertEqual(user.budget_xp, expected)
+
+        # completed_at is spread over time, not stamped with the seeding time
+        timestamps = set(QuestionProgress.objects.values_list('completed_at', flat=True))
+        self.assertGreater(len(timestamps), 1)
+        # Every completed flash card has its review schedule
+        self.assertEqual(
+            set(FlashCardReview.objects.values_list('user_id', 'card_id')),
+            set(QuestionProgress.objects.filter(question_type='FC').values_list('user_id', 'question_id')),
+        )
+        snapshot = self.normalized_progress(models)
+
+        # The same seed on an emptied database gives the same data, relative to the new ids
+        QuestionProgress.objects.all().delete()
+        get_user_model().objects.all().delete()
+        for model in (MultipleChoice, FillInTheBlank, FlashCard, BudgetSimulation, MatchAndDrag):
+            model.objects.all().delete()
+        call_command('seed_synthetic', questions=50, users=20, history=30, seed=7, stdout=StringIO())
+        self.assertEqual(self.normalized_progress(models), snapshot)
+
+    def normalized_progress(self, models):
+        """Progress rows with ids made relative to the first seeded id of each table"""
+        first_user = get_user_model().objects.order_by('id').values_list('id', flat=True).first()
+        first_ids = {t: m.objects.order_by('id').values_list('id', flat=True).first() for t, m in models.items()}
+        return [
+            (user_id - first_user, question_id - first_ids[question_type], question_type, category)
+            for user_id, question_id, question_type, category in QuestionProgress.objects.order_by('id').values_list(
+                'user_id', 'question_id', 'question_type', 'category'
+            )
+        ]
+
+
+class QueryPlanTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        """Test that every hot lookup is planned with its index"""
+        seed_dataset(num_questions=300, num_users=5, seed=0)
+        refresh_statistics()
+        user = QuestionProgress.objects.order_by('-id').first().user
+        results = check_plans(user, 'BUD', repeat=1)
+        self.assertTrue(results)
+        for result in results:
+            self.assertEqual(result['missing'], [], f"{result['name']}:\n{result['plan']}")
+
+
+class SerialLiveServerThread(LiveServerThread):
+    """
+    Live server handling one request at a time. With in-memory SQLite every
+    server thread uses the test's one connection, which threads answering at
+    once would interleave transactions on.
+    """
+
+    def _create_server(self, connections_override=None):
+        return WSGIServer((self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False)
+
+
+class LoadTestTest(LiveServerTestCase):
+    server_thread_class = SerialLiveServerThread
+
+    def test_extract_game(self):
+        """Test reading question ids and choices from rendered game pages"""
+        html = ('<input type="hidden" name="question_id" value="12">'
+                '<input class="form-check-input" type="radio" name="answer" id="choice1" value="Save more" required>'
+                '<input class="form-check-input" type="radio" name="answer" id="choice2" value="Spend" required>')
+        self.assertEqual(extract_game('play_multiple_choice', html), {'question_id': '12', 'choices': ['Save more', 'Spend']})
+        self.assertEqual(extract_game('play_flash_card', 'const cardId = "7";'), {'card_id': '7'})
+        self.assertIsNone(extract_game('play_fill_blank', '<p>No questions</p>'))
+
+    def test_users_play_against_live_server(self):
+        """Test that virtual users log in and play every game without errors"""
+        seed_dataset(num_questions=60, num_users=0, seed=0)
+        ensure_users(2, 'loadtest_user_', 'loadtest-password')
+        url = urlsplit(self.live_server_url)
+        # The users play at the same time; the server takes their requests in turn
+        report = asyncio.run(run_load_test({
+            'host': url.hostname, 'port': url.port, 'timeout': 30, 'users': 2, 'sessions': 2, 'rounds': 8,
+            'duration': 0, 'think_time': 0, 'ramp_up': 0, 'prefix': 'loadtest_user_',
+            'password': 'loadtest-password', 'seed': 0,
+        }))
+        self.assertEqual(report['routes']['login:POST']['requests'], 2)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertGreater(report['total']['requests'], 4)
+        self.assertTrue(any(route.endswith(':POST') and route != 'login:POST' for route in report['routes']))
+
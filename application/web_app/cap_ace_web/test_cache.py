@@ -0,0 +1,129 @@
+import threading
+import time
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from . import cache
+from .models import MultipleChoice
+from .views import question_totals_by_category
+
+User = get_user_model()
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        """Test that the LRU stays bounded and keeps recently used entries"""
+        lru = cache.LRUCache(max_entries=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIs(lru.get('b', None), None)
+        self.assertEqual(len(lru), 2)
+
+    def test_entries_expire(self):
+        """Test that expired entries are not returned"""
+        lru = cache.LRUCache(max_entries=2)
+        lru.set('a', 1, -1)
+        self.assertIsNone(lru.get('a', None))
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_and_misses_are_counted(self):
+        """Test that values are computed once and then served from the local tier"""
+        calls = []
+        for _ in range(3):
+            value = cache.get_or_compute('test', ('a',), lambda: calls.append(1) or 42)
+        self.assertEqual(value, 42)
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats.as_dict()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['local_hits'], 2)
+
+    def test_shared_tier_is_used_when_local_is_cold(self):
+        """Test that another process's value (shared tier only) is reused"""
+        cache.get_or_compute('test', ('a',), lambda: 'shared')
+        cache.local_cache.clear()
+        self.assertEqual(cache.get_or_compute('test', ('a',), lambda: 'recomputed'), 'shared')
+        self.assertEqual(cache.stats.as_dict()['shared_hits'], 1)
+
+    def test_invalidate_bumps_namespace_version(self):
+        """Test that invalidating a namespace drops all of its keys but not others"""
+        cache.get_or_compute('test', ('a',), lambda: 1)
+        cache.get_or_compute('other', ('a',), lambda: 1)
+        cache.invalidate('test')
+        self.assertEqual(cache.get_or_compute('test', ('a',), lambda: 2), 2)
+        self.assertEqual(cache.get_or_compute('other', ('a',), lambda: 2), 1)
+
+    def test_single_flight(self):
+        """Test that concurrent misses on a cold key compute it once"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute('test', ('cold',), compute)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats.as_dict()['lock_waits'], 9)
+
+    def test_waits_for_other_process(self):
+        """Test that a key being computed by another process is waited for, not recomputed"""
+        key = cache.make_key('test', ('busy',))
+        cache.shared_cache().add(f'{key}:lock', 'other-process', 5)
+        threading.Timer(0.05, lambda: cache.shared_cache().set(key, 'theirs', 60)).start()
+        self.assertEqual(cache.get_or_compute('test', ('busy',), lambda: 'ours'), 'theirs')
+
+    def test_stops_waiting_when_other_process_stores_nothing(self):
+        """Test that a released lock without a value is not waited out"""
+        key = cache.make_key('test', ('failed',))
+        cache.shared_cache().add(f'{key}:lock', 'other-process', 5)
+        threading.Timer(0.05, lambda: cache.shared_cache().delete(f'{key}:lock')).start()
+        start = time.monotonic()
+        self.assertEqual(cache.get_or_compute('test', ('failed',), lambda: 'ours'), 'ours')
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_value_dependent_timeout(self):
+        """Test that a value whose timeout is 0 is computed again on every lookup"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return None
+
+        for _ in range(2):
+            cache.get_or_compute('test', ('none',), compute, lambda value: 60 if value is not None else 0)
+        self.assertEqual(len(calls), 2)
+
+    def test_saving_questions_invalidates_counts(self):
+        """Test that the dashboard totals follow question changes"""
+        self.assertEqual(question_totals_by_category(), {})
+        MultipleChoice.objects.create(category='BUD', question='Q?', answer='A', feedback='F')
+        self.assertEqual(question_totals_by_category(), {'BUD': 1})
+        with self.assertNumQueries(0):
+            question_totals_by_category()
+
+    def test_learn_page_uses_cached_totals(self):
+        """Test that the learning dashboard skips the totals query when warm"""
+        user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(user)
+        MultipleChoice.objects.create(category='BUD', question='Q?', answer='A', feedback='F')
+        self.client.get(reverse('learn'))
+        computes = cache.stats.as_dict()['computes']
+        self.client.get(reverse('learn'))
+        self.assertEqual(cache.stats.as_dict()['computes'], computes)
@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest import skipUnless
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from .models import MultipleChoice, FlashCard, AnswerAttempt, Question
+from .payloads import get_payload
+
+# NumPy is only installed with requirements_local.txt, for the calibrate_difficulty command
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from .calibration import first_responses, fit
+
+User = get_user_model()
+
+
+@skipUnless(np, "NumPy is not installed")
+class CalibrationTest(TestCase):
+    def test_first_attempts_only(self):
+        """Test that only each player's first attempt at a question counts"""
+        responses = first_responses(
+            np.array([7, 7, 9, 7]), np.array([30, 30, 30, 40]), np.array([False, True, True, True])
+        )
+        self.assertEqual(list(responses.player_ids), [7, 9])
+        self.assertEqual(list(responses.item_ids), [30, 40])
+        pairs = sorted(zip(responses.players, responses.items, responses.correct))
+        self.assertEqual(pairs, [(0, 0, 0.0), (0, 1, 1.0), (1, 0, 1.0)])
+
+    def test_fit_orders_questions_by_difficulty(self):
+        """Test that the fitted difficulties follow the simulated ones, with and without discrimination"""
+        rng = np.random.default_rng(0)
+        ability = rng.normal(size=400)
+        difficulty = np.array([-1.5, 0.0, 1.5])
+        players = np.repeat(np.arange(400), 3)
+        items = np.tile(np.arange(3), 400)
+        correct = rng.random(players.size) < 1 / (1 + np.exp(-(ability[players] - difficulty[items])))
+        responses = first_responses(players, items, correct)
+        for discrimination in (False, True):
+            fitted = fit(responses, discrimination).difficulty
+            self.assertEqual(list(np.argsort(fitted)), [0, 1, 2])
+            self.assertLess(fitted[0], -0.5)
+            self.assertGreater(fitted[2], 0.5)
+
+
+    def test_discrimination_fit_converges(self):
+        """Test that the 2PL fit converges on the question parameters, without overflow, on a fixed scale"""
+        rng = np.random.default_rng(1)
+        ability = rng.normal(size=2000)
+        difficulty = rng.normal(size=100)
+        discrimination = np.exp(rng.normal(scale=0.3, size=100))
+        players = rng.integers(0, 2000, 60000)
+        items = rng.integers(0, 100, 60000)
+        logit = discrimination[items] * (ability[players] - difficulty[items])
+        responses = first_responses(players, items, rng.random(players.size) < 1 / (1 + np.exp(-logit)))
+        with np.errstate(over='raise'):
+            fitted = fit(responses, discrimination=True)
+        self.assertLess(fitted.iterations, 100)
+        self.assertGreater(np.corrcoef(fitted.difficulty, difficulty[responses.item_ids])[0, 1], 0.95)
+        self.assertGreater(np.corrcoef(fitted.discrimination, discrimination[responses.item_ids])[0, 1], 0.7)
+        self.assertAlmostEqual(np.log(fitted.discrimination).mean(), 0.0)
+        self.assertLess(np.abs(fitted.ability).max(), 5.0)
+
+
+@skipUnless(np, "NumPy is not installed")
+class CalibrateDifficultyCommandTest(TestCase):
+    def setUp(self):
+        self.easy = MultipleChoice.objects.create(question="Easy", answer="A", feedback="", category='BUD', difficulty='I')
+        self.fair = MultipleChoice.objects.create(question="Fair", answer="A", feedback="", category='BUD', difficulty='I')
+        self.hard = FlashCard.objects.create(question="Hard", answer=True, feedback="", category='BUD', difficulty='B')
+        questions = {
+            question: Question.objects.get(question_type=question_type, object_id=question.id)
+            for question_type, question in (('MC', self.easy), ('MC', self.fair), ('FC', self.hard))
+        }
+        now = timezone.now()
+        attempts = []
+        for i in range(40):
+            user = User.objects.create_user(username=f'player{i}')
+            for question, is_correct in ((self.easy, True), (self.fair, i % 2 == 0), (self.hard, False)):
+                attempts.append(AnswerAttempt(
+                    user=user, question=questions[question], is_correct=is_correct, answered_at=now
+                ))
+            # A retry after seeing the answer doesn't make the hard question easier
+            attempts.append(AnswerAttempt(user=user, question=questions[self.hard], is_correct=True, answered_at=now))
+        AnswerAttempt.objects.bulk_create(attempts)
+
+    def test_report_and_apply(self):
+        """Test that the command reports relabels and writes them only with --apply"""
+        out = StringIO()
+        call_command('calibrate_difficulty', stdout=out)
+        report = out.getvalue()
+        self.assertIn('2 questions to relabel', report)
+        self.assertIn('Intermediate -> Beginner: 1', report)
+        self.assertIn('Beginner -> Advanced: 1', report)
+        self.easy.refresh_from_db()
+        self.assertEqual(self.easy.difficulty, 'I')
+
+        self.assertEqual(get_payload('MC', self.easy.id).difficulty, 'I')
+        call_command('calibrate_difficulty', '--apply', stdout=StringIO())
+        for question, question_type, label in ((self.easy, 'MC', 'B'), (self.fair, 'MC', 'I'), (self.hard, 'FC', 'A')):
+            question.refresh_from_db()
+            self.assertEqual(question.difficulty, label)
+            self.assertEqual(Question.objects.get(question_type=question_type, object_id=question.id).difficulty, label)
+        # Cached payloads pick up the new label
+        self.assertEqual(get_payload('MC', self.easy.id).difficulty, 'B')
+
+    def test_min_responses(self):
+        """Test that questions answered by too few players keep their label"""
+        out = StringIO()
+        call_command('calibrate_difficulty', '--min-responses', '41', stdout=out)
+        self.assertIn('already has the right label', out.getvalue())
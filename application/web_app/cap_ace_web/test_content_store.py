@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from . import cache, content_store
+from .models import (MultipleChoice, MultipleChoiceDistractor, FlashCard, BudgetSimulation, Expense, MatchAndDrag,
+                     TermsAndDefinitions, Question, QuestionProgress)
+from .payloads import get_payload
+
+User = get_user_model()
+
+
+class ContentStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        content_store.reset()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'content.snapshot')
+        # The snapshot is only served with a cache shared between processes
+        self.settings_override = override_settings(
+            CONTENT_SNAPSHOT_PATH=self.path, CONTENT_SNAPSHOT_CHECK_SECONDS=0,
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(self.directory, 'cache'),
+            }},
+        )
+        self.settings_override.enable()
+        cache.clear()
+
+        self.questions = [
+            MultipleChoice.objects.create(
+                question=f"Question {i}?", answer="Right", feedback="", difficulty='B', category='BUD'
+            )
+            for i in range(3)
+        ]
+        for question in self.questions:
+            MultipleChoiceDistractor.objects.create(question=question, distractor="Wrong")
+        self.card = FlashCard.objects.create(question="True?", answer=True, feedback="", category='SAV')
+        simulation = BudgetSimulation.objects.create(
+            question="Plan", monthly_income=1000, difficulty='A', category='BUD'
+        )
+        Expense.objects.create(BudgetSimulation=simulation, name="Rent", amount=500, essential=True, feedback="")
+        match = MatchAndDrag.objects.create(category='CRD', feedback="")
+        TermsAndDefinitions.objects.create(question=match, term="APR", definition="Yearly rate", feedback="")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        cache.clear()
+        content_store.reset()
+        shutil.rmtree(self.directory)
+
+    def compile(self):
+        call_command('compile_content', stdout=StringIO())
+
+    def test_compile_and_lookup(self):
+        """Test that every question type is compiled and served from the snapshot"""
+        self.compile()
+        store = content_store.get_store()
+        self.assertEqual(len(store), 6)
+        self.assertEqual(store.get('MC', self.questions[1].id).question, "Question 1?")
+        self.assertEqual(store.get('BS', BudgetSimulation.objects.get().id).expenses[0].name, "Rent")
+        self.assertEqual(store.get('MAD', MatchAndDrag.objects.get().id).terms[0].term, "APR")
+        self.assertIsNone(store.get('MC', 0))
+
+    def test_inactive_questions_are_left_out(self):
+        """Test that deactivating a question marks the snapshot stale and the recompile leaves it out"""
+        self.compile()
+        entry = Question.objects.get(question_type='MC', object_id=self.questions[0].id)
+        entry.is_active = False
+        entry.save()
+        self.assertIsNone(content_store.get_store())
+
+        self.compile()
+        store = content_store.get_store()
+        self.assertIsNone(store.get('MC', self.questions[0].id))
+        self.assertNotIn(self.questions[0].id, store.ids('MC', 'BUD'))
+        # A question reserved before it was deactivated can still be answered
+        self.assertEqual(get_payload('MC', self.questions[0].id).question, "Question 0?")
+
+    def test_sample_prefers_uncompleted(self):
+        """Test that sampling skips completed questions until all are completed"""
+        self.compile()
+        store = content_store.get_store()
+        completed = {question.id for question in self.questions[:2]}
+        for _ in range(10):
+            self.assertEqual(store.sample('MC', 'BUD', completed=completed).id, self.questions[2].id)
+        all_ids = {question.id for question in self.questions}
+        self.assertIn(store.sample('MC', 'BUD', completed=all_ids).id, all_ids)
+        self.assertIsNone(store.sample('FC', 'BUD'))
+        self.assertIsNone(store.sample('BS', 'BUD', difficulty='B'))
+
+    def test_reloads_new_version(self):
+        """Test that a recompiled snapshot is picked up, and an unchanged one is not reloaded"""
+        self.compile()
+        store = content_store.get_store()
+        self.compile()
+        self.assertIs(content_store.get_store(), store)
+
+        FlashCard.objects.create(question="Also true?", answer=True, feedback="", category='SAV')
+        self.compile()
+        reloaded = content_store.get_store()
+        self.assertIsNot(reloaded, store)
+        self.assertEqual(len(reloaded.ids('FC', 'SAV')), 2)
+
+    def test_edit_bypasses_snapshot(self):
+        """Test that an edited question is read from the database until the snapshot is recompiled"""
+        self.compile()
+        self.assertIsNotNone(content_store.get_store())
+        self.card.question = "Edited?"
+        self.card.save()
+        self.assertIsNone(content_store.get_store())
+        self.assertEqual(get_payload('FC', self.card.id).question, "Edited?")
+
+    def test_process_started_after_edit_bypasses_snapshot(self):
+        """Test that a process loading a snapshot compiled before an edit doesn't serve it"""
+        self.compile()
+        self.card.question = "Edited?"
+        self.card.save()
+        # A fresh process: nothing loaded, the namespace version read from the shared cache
+        content_store.reset()
+        cache.local_cache.clear()
+        self.assertIsNone(content_store.get_store())
+
+        self.compile()
+        self.assertEqual(content_store.get_store().get('FC', self.card.id).question, "Edited?")
+
+    def test_not_served_without_shared_cache(self):
+        """Test that the snapshot isn't served when edits can't reach other processes"""
+        self.compile()
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertIsNone(content_store.get_store())
+        self.assertIsNotNone(content_store.get_store())
+
+    def test_game_reads_questions_from_snapshot(self):
+        """Test that a game page only reads the player's progress from the database"""
+        self.compile()
+        user = User.objects.create_user(username='player', password='testpass123')
+        QuestionProgress.objects.create(user=user, question_id=self.questions[0].id, question_type='MC', category='BUD')
+        self.client.force_login(user)
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertNotEqual(response.context['question'].id, self.questions[0].id)
+        self.assertFalse(any('cap_ace_web_multiplechoice' in query['sql'] for query in queries))
@@ -0,0 +1,42 @@
+import time
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import SimpleTestCase
+from .db_backends.latency.base import DatabaseWrapper
+
+
+class LatencyBackendTest(SimpleTestCase):
+    def make_connection(self, **latency):
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'cap_ace_web.db_backends.latency',
+            'WRAPPED_ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+            'LATENCY': latency,
+        }
+        wrapper = DatabaseWrapper(settings_dict, 'latency_test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_wraps_configured_engine(self):
+        """Test that the wrapper behaves as the wrapped backend"""
+        wrapper = self.make_connection()
+        self.assertIsInstance(wrapper, SQLiteDatabaseWrapper)
+        self.assertEqual(wrapper.vendor, 'sqlite')
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_injects_connection_and_query_latency(self):
+        """Test that connecting and every query pay the configured round trip"""
+        wrapper = self.make_connection(QUERY_MS=20, CONNECT_MS=50, JITTER_MS=5, SEED=1)
+
+        start = time.perf_counter()
+        wrapper.ensure_connection()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.045)
+
+        start = time.perf_counter()
+        with wrapper.cursor() as cursor:
+            for _ in range(3):
+                cursor.execute('SELECT 1')
+        self.assertGreaterEqual(time.perf_counter() - start, 3 * 0.015)
@@ -0,0 +1,158 @@
+import os
+import tempfile
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from .models import MultipleChoice
+from . import db_instrumentation
+from .db_instrumentation import (normalize_sql, fingerprint, redact_params, read_log_records, aggregate_by_fingerprint,
+                                 ConnectionTimings)
+from .db_backends.latency.base import DatabaseWrapper as LatencyDatabaseWrapper
+from .db_connections import prewarm_connections
+
+User = get_user_model()
+
+
+class SqlFingerprintTest(TestCase):
+    def test_literals_are_normalized(self):
+        """Test that queries differing only in values share a fingerprint"""
+        first = "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'bob' AND n > 10"
+        second = "SELECT *  FROM t WHERE id IN (%s) AND name = 'alice' AND n > 2"
+        self.assertEqual(normalize_sql(first), "SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?")
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertNotEqual(fingerprint(first), fingerprint("SELECT * FROM u"))
+
+    def test_params_are_redacted(self):
+        """Test that strings are redacted but numbers are kept"""
+        self.assertEqual(redact_params([1, 'secret', None, True]), [1, '<str:6>', None, True])
+        self.assertIsNone(redact_params(None))
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.log_dir.name, 'slow.log')
+        self.settings_override = override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=self.log_file)
+        self.settings_override.enable()
+        db_instrumentation._explained_fingerprints.clear()
+
+        self.user = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        MultipleChoice.objects.create(category='BUD', question='Q?', answer='A', feedback='F')
+        self.client = Client()
+        self.client.login(username='staff', password='testpass123')
+
+    def tearDown(self):
+        for handler in list(db_instrumentation.logger.handlers):
+            db_instrumentation.logger.removeHandler(handler)
+            handler.close()
+        self.settings_override.disable()
+        self.log_dir.cleanup()
+
+    def test_queries_are_logged_with_view_and_plan(self):
+        """Test that slow queries are logged once per request with the view and a plan per fingerprint"""
+        self.client.get(reverse('multiple_choice_list'))
+        self.client.get(reverse('multiple_choice_list'))
+
+        records = read_log_records(self.log_file)
+        self.assertTrue(records)
+        list_records = [r for r in records if 'cap_ace_web_multiplechoice' in r['sql']]
+        self.assertEqual(len(list_records), 2)
+        self.assertEqual(list_records[0]['view'], 'multiple_choice_list')
+
+        # The plan is only captured the first time a fingerprint is seen
+        self.assertIsNotNone(list_records[0]['explain'])
+        self.assertNotIn('explain', list_records[1])
+
+    def test_staff_report_aggregates_by_fingerprint(self):
+        """Test that the staff page groups log records by fingerprint"""
+        self.client.get(reverse('multiple_choice_list'))
+        self.client.get(reverse('multiple_choice_list'))
+        groups = aggregate_by_fingerprint(read_log_records(self.log_file))
+        list_group = next(g for g in groups if 'cap_ace_web_multiplechoice' in g['sql'])
+        self.assertEqual(list_group['count'], 2)
+        self.assertEqual(list_group['views'], ['multiple_choice_list'])
+
+        response = self.client.get(reverse('slow_query_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, list_group['fingerprint'])
+
+    def test_report_requires_staff(self):
+        """Test that regular users can't see the slow query report"""
+        User.objects.create_user(username='player', password='testpass123')
+        client = Client()
+        client.login(username='player', password='testpass123')
+        response = client.get(reverse('slow_query_report'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ConnectionTimingsTest(SimpleTestCase):
+    def make_connection(self):
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'cap_ace_web.db_backends.latency',
+            'NAME': ':memory:',
+            'LATENCY': {'CONNECT_MS': 20, 'QUERY_MS': 5},
+        }
+        wrapper = LatencyDatabaseWrapper(settings_dict, 'timings_test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_handshake_and_queries_are_timed_separately(self):
+        """Test that connecting and querying are reported as separate Server-Timing metrics"""
+        wrapper = self.make_connection()
+        timings = ConnectionTimings()
+        with timings.track(wrapper):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.execute('SELECT 2')
+
+        self.assertEqual(timings.connects, 1)
+        self.assertGreaterEqual(timings.connect_ms, 15)
+        self.assertEqual(timings.queries, 2)
+        self.assertGreaterEqual(timings.query_ms, 8)
+        self.assertTrue(timings.server_timing().startswith('db-connect;dur='))
+        self.assertIn('desc="2 queries"', timings.server_timing())
+        # The instance methods are restored afterwards
+        self.assertNotIn('connect', vars(wrapper))
+
+    def test_reused_connection_has_no_handshake(self):
+        """Test that a prewarmed connection is reused without a new handshake"""
+        wrapper = self.make_connection()
+        wrapper.ensure_connection()
+        timings = ConnectionTimings()
+        with timings.track(wrapper):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        self.assertEqual(timings.connects, 0)
+        self.assertNotIn('db-connect', timings.server_timing())
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingMiddlewareTest(TestCase):
+    def test_server_timing_header(self):
+        """Test that responses to staff report database time and query count"""
+        user = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse('learn'))
+        self.assertIn('Server-Timing', response)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_server_timing_staff_only(self):
+        """Test that other players only get the header when DEBUG is on"""
+        user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(user)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('learn')))
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('status_200')))
+
+    @override_settings(SERVER_TIMING=False, DEBUG=True)
+    def test_server_timing_disabled(self):
+        """Test that the header can be turned off"""
+        response = self.client.get(reverse('status_200'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_prewarm_connections(self):
+        """Test that prewarming opens the connection"""
+        prewarm_connections(['default'])
+        self.assertIsNotNone(connection.connection)
@@ -0,0 +1,152 @@
+from io import StringIO
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from . import cache
+from .leaderboard import apply_score_moves, player_rank, rebuild_leaderboards, top_players
+from .models import LeaderboardScore, ScoreMove
+from .xp import award_xp
+
+User = get_user_model()
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.players = {
+            name: User.objects.create_user(username=name, password='testpass123')
+            for name in ('ann', 'bob', 'cat', 'dan')
+        }
+
+    def buckets(self, board):
+        return dict(LeaderboardScore.objects.filter(board=board, players__gt=0).values_list('xp', 'players'))
+
+    def test_awards_move_players_between_buckets(self):
+        """Test that applying the queued moves puts each player at their new XP on the category and overall boards"""
+        award_xp(self.players['ann'], 'BUD', 100)
+        award_xp(self.players['bob'], 'BUD', 100)
+        apply_score_moves()
+        award_xp(self.players['ann'], 'BUD', 50)
+        award_xp(self.players['ann'], 'TAX', 50)
+
+        # Awards only queue their moves
+        self.assertEqual(self.buckets('budget_xp'), {100: 2})
+        self.assertEqual(apply_score_moves(), 1)
+        self.assertFalse(ScoreMove.objects.exists())
+        self.assertEqual(self.buckets('budget_xp'), {100: 1, 150: 1})
+        self.assertEqual(self.buckets('taxes_xp'), {50: 1})
+        self.assertEqual(self.buckets('total_xp'), {100: 1, 200: 1})
+        self.assertEqual(User.objects.get(username='ann').total_xp, 200)
+
+        # Incremental upkeep ends where a full rebuild would
+        incremental = {board: self.buckets(board) for board in ('budget_xp', 'taxes_xp', 'total_xp')}
+        rebuild_leaderboards()
+        self.assertEqual({board: self.buckets(board) for board in incremental}, incremental)
+
+    def test_rank_counts_players_ahead(self):
+        """Test that a rank counts the players ahead in two queries, with ties sharing a rank"""
+        award_xp(self.players['ann'], 'BUD', 150)
+        award_xp(self.players['bob'], 'BUD', 100)
+        award_xp(self.players['cat'], 'BUD', 100)
+        apply_score_moves()
+
+        cat = User.objects.get(username='cat')
+        with self.assertNumQueries(2):
+            self.assertEqual(player_rank(cat, 'budget_xp'), (2, 3))
+        self.assertEqual(player_rank(User.objects.get(username='bob'), 'budget_xp'), (2, 3))
+        self.assertEqual(player_rank(User.objects.get(username='dan'), 'budget_xp'), (None, 3))
+
+    def test_top_players(self):
+        """Test that the top list is ordered by XP with shared ranks and leaves out players without XP"""
+        award_xp(self.players['bob'], 'CRD', 100)
+        award_xp(self.players['ann'], 'CRD', 150)
+        award_xp(self.players['cat'], 'CRD', 100)
+
+        top = top_players('credit_xp')
+        self.assertEqual([(row['username'], row['xp'], row['rank']) for row in top],
+                         [('ann', 150, 1), ('bob', 100, 2), ('cat', 100, 2)])
+        self.assertEqual(len(top_players('credit_xp', limit=2)), 2)
+
+    def test_deleted_player_leaves_boards(self):
+        """Test that deleting a player takes them off the leaderboards, with or without moves still queued"""
+        award_xp(self.players['ann'], 'SAV', 100)
+        award_xp(self.players['bob'], 'SAV', 100)
+        apply_score_moves()
+        award_xp(self.players['ann'], 'SAV', 50)
+        self.players['ann'].delete()
+        apply_score_moves()
+        self.assertEqual(self.buckets('savings_xp'), {100: 1})
+        self.assertEqual(self.buckets('total_xp'), {100: 1})
+
+    def test_moves_are_applied_in_batches(self):
+        """Test that each batch moves up to its size of players, each by all of their queued XP"""
+        for name in ('ann', 'bob', 'cat'):
+            award_xp(self.players[name], 'INV', 50)
+            award_xp(self.players[name], 'INV', 100)
+        self.assertEqual(apply_score_moves(limit=2), 2)
+        self.assertEqual(self.buckets('investing_xp'), {150: 2})
+        out = StringIO()
+        call_command('apply_score_moves', stdout=out)
+        self.assertIn('Moved 1 players', out.getvalue())
+        self.assertEqual(self.buckets('investing_xp'), {150: 3})
+
+    def test_rank_with_moves_queued(self):
+        """Test that a player is ranked at their XP now against the buckets as last applied"""
+        award_xp(self.players['ann'], 'CRD', 100)
+        award_xp(self.players['bob'], 'CRD', 150)
+        apply_score_moves()
+        award_xp(self.players['ann'], 'CRD', 100)
+        award_xp(self.players['cat'], 'CRD', 50)
+
+        # ann is still counted at 100 by the buckets, but not ahead of herself
+        self.assertEqual(player_rank(User.objects.get(username='ann'), 'credit_xp'), (1, 2))
+        self.assertEqual(player_rank(User.objects.get(username='bob'), 'credit_xp'), (1, 2))
+        # cat's first award is still queued, so she is added to the players counted
+        self.assertEqual(player_rank(User.objects.get(username='cat'), 'credit_xp'), (3, 3))
+        self.assertEqual(ScoreMove.objects.filter(user__username__in=['ann', 'cat']).count(), 4)
+
+    def test_rebuild_command(self):
+        """Test that the command recomputes total XP and recounts the boards after direct edits"""
+        award_xp(self.players['ann'], 'BUD', 50)
+        User.objects.filter(username__in=['ann', 'bob']).update(budget_xp=100, investing_xp=50)
+        out = StringIO()
+        call_command('rebuild_leaderboards', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        self.assertEqual(User.objects.get(username='ann').total_xp, 150)
+        self.assertEqual(self.buckets('budget_xp'), {100: 2})
+        self.assertEqual(self.buckets('total_xp'), {150: 2})
+        # The recount already includes the queued moves
+        self.assertFalse(ScoreMove.objects.exists())
+
+
+class LeaderboardViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        rival = User.objects.create_user(username='rival', password='testpass123')
+        award_xp(rival, 'BUD', 150)
+        award_xp(self.user, 'BUD', 50)
+        apply_score_moves()
+        self.client.login(username='player', password='testpass123')
+
+    def test_overall_and_category_boards(self):
+        """Test that the boards list the top players and the player's own rank"""
+        response = self.client.get(reverse('leaderboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['username'] for row in response.context['top']], ['rival', 'player'])
+        self.assertEqual((response.context['rank'], response.context['players']), (2, 2))
+
+        response = self.client.get(reverse('leaderboard_category', kwargs={'category': 'taxes'}))
+        self.assertEqual(response.context['top'], [])
+        self.assertIsNone(response.context['rank'])
+
+        response = self.client.get(reverse('leaderboard_category', kwargs={'category': 'unknown'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_only_reads(self):
+        """Test that the page leaves queued moves to apply_score_moves and ranks the player at their XP now"""
+        award_xp(self.user, 'BUD', 150)
+        response = self.client.get(reverse('leaderboard'))
+        self.assertEqual((response.context['rank'], response.context['players']), (1, 2))
+        self.assertTrue(ScoreMove.objects.filter(user=self.user).exists())
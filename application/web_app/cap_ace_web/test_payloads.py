@@ -0,0 +1,117 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from . import cache
+from .models import MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, BudgetSimulation, Expense
+from .payloads import get_payload, build_payload, serialize, deserialize
+
+User = get_user_model()
+
+
+class QuestionPayloadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = MultipleChoice.objects.create(
+            question="What is a budget?", answer="A spending plan", feedback="Budgets plan spending",
+            difficulty='I', category='BUD'
+        )
+        self.distractor = MultipleChoiceDistractor.objects.create(question=self.question, distractor="A loan")
+        self.simulation = BudgetSimulation.objects.create(
+            question="Plan your month", monthly_income=2000, difficulty='B', category='BUD'
+        )
+        self.rent = Expense.objects.create(
+            BudgetSimulation=self.simulation, name="Rent", amount="1250.50", essential=True, feedback="Pay rent"
+        )
+
+    def test_payload_round_trip(self):
+        """Test that payloads serialize compactly and keep the fields the templates use"""
+        data = serialize(build_payload('BS', self.simulation.id))
+        self.assertNotIn(' ', data.replace('Plan your month', '').replace('Pay rent', ''))
+        simulation = deserialize(data)
+        self.assertEqual(simulation.monthly_income, '2000.00')
+        self.assertEqual(simulation.get_difficulty_display(), 'Beginner')
+        self.assertEqual(simulation.expenses[0].amount, '1250.50')
+        self.assertTrue(simulation.expenses[0].essential)
+
+    def test_missing_question(self):
+        """Test that unknown ids and malformed ids have no payload"""
+        self.assertIsNone(get_payload('MC', self.question.id + 100))
+        self.assertIsNone(get_payload('MC', 'abc'))
+
+    def test_missing_question_is_not_cached(self):
+        """Test that a question created under an id looked up before is found straight away"""
+        missing_id = self.question.id + 100
+        self.assertIsNone(get_payload('MC', missing_id))
+        # bulk_create sends no signals, so nothing invalidates the payload namespace
+        MultipleChoice.objects.bulk_create([MultipleChoice(
+            id=missing_id, question="New?", answer="A", feedback="", category='BUD'
+        )])
+        self.assertEqual(get_payload('MC', missing_id).question, "New?")
+
+    def test_warm_payload_skips_database(self):
+        """Test that a cached payload is served without queries"""
+        get_payload('MC', self.question.id)
+        with CaptureQueriesContext(connection) as queries:
+            question = get_payload('MC', self.question.id)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(question.distractors, ["A loan"])
+
+    def test_child_edits_invalidate_payload(self):
+        """Test that editing a distractor or an expense rebuilds the payload"""
+        get_payload('MC', self.question.id)
+        get_payload('BS', self.simulation.id)
+        self.distractor.distractor = "A mortgage"
+        self.distractor.save()
+        self.rent.amount = 900
+        self.rent.save()
+        self.assertEqual(get_payload('MC', self.question.id).distractors, ["A mortgage"])
+        self.assertEqual(get_payload('BS', self.simulation.id).expenses[0].amount, '900.00')
+
+
+class PayloadGameViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.login(username='player', password='testpass123')
+        self.question = MultipleChoice.objects.create(
+            question="What is a budget?", answer="A spending plan", feedback="Budgets plan spending",
+            difficulty='I', category='BUD'
+        )
+        MultipleChoiceDistractor.objects.create(question=self.question, distractor="A loan")
+        FillInTheBlank.objects.create(
+            question="A budget is a spending ____", answer="A budget is a spending plan", missing_word="plan",
+            feedback="", difficulty='B', category='BUD'
+        )
+        FlashCard.objects.create(question="Budgets plan spending", answer=True, feedback="", category='BUD')
+
+    def test_games_render_from_payloads(self):
+        """Test that every game page renders its question from the payload"""
+        response = self.client.get(reverse('play_multiple_choice', kwargs={'category': 'budget'}))
+        self.assertContains(response, "What is a budget?")
+        self.assertContains(response, "A loan")
+        self.assertContains(response, "Intermediate")
+        response = self.client.get(reverse('play_fill_blank', kwargs={'category': 'budget'}))
+        self.assertContains(response, "A budget is a spending ____")
+        response = self.client.get(reverse('play_flash_card', kwargs={'category': 'budget'}))
+        self.assertContains(response, "Budgets plan spending")
+
+    def test_warm_game_page_uses_fewer_queries(self):
+        """Test that a warm payload saves the question and distractor queries"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(url)
+        self.assertEqual(len(cold) - len(warm), 2)
+
+    def test_answer_checked_against_payload(self):
+        """Test that answering from the payload awards XP and unknown questions 404"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        response = self.client.post(url, {'question_id': self.question.id, 'answer': "A spending plan"})
+        self.assertTrue(response.context['is_correct'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.budget_xp, 100)
+        response = self.client.post(url, {'question_id': self.question.id + 100, 'answer': "A spending plan"})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,216 @@
+import json
+from decimal import Decimal
+from django.test import TestCase, Client
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse, URLPattern
+from .models import (MultipleChoice, MultipleChoiceDistractor, QuestionProgress, FillInTheBlank, BudgetSimulation,
+                     Expense, FlashCard, MatchAndDrag, TermsAndDefinitions, Question, QuestionStats, DistractorStats,
+                     DailyActivity, CATEGORIES)
+from .query_budgets import QUERY_BUDGETS
+from .quiz_views import sign_quiz
+from . import attempts, cache, urls
+
+User = get_user_model()
+
+# Big enough that answering in route_requests leaves an uncompleted question of each type
+SMALL = 3
+LARGE = 8
+
+# Question models whose rows a player can complete, keyed by question type
+GAME_MODELS = {
+    'MC': MultipleChoice,
+    'FIB': FillInTheBlank,
+    'FC': FlashCard,
+    'BS': BudgetSimulation,
+}
+
+
+def grow_fixture(size, player):
+    """
+    Grow the database so every category has ``size`` questions of each type and
+    the player has completed just under half of them. Budget simulations get
+    more expenses as the fixture grows, to expose per-expense queries.
+    """
+    for code, _ in CATEGORIES:
+        while MultipleChoice.objects.filter(category=code).count() < size:
+            question = MultipleChoice.objects.create(
+                category=code, question="Question?", answer="Right", feedback="Because", difficulty='B'
+            )
+            for i in range(3):
+                MultipleChoiceDistractor.objects.create(question=question, distractor=f"Wrong {i}")
+        while FillInTheBlank.objects.filter(category=code).count() < size:
+            FillInTheBlank.objects.create(
+                category=code, question="A ____ plan", answer="A budget plan", missing_word="budget", feedback=""
+            )
+        while FlashCard.objects.filter(category=code).count() < size:
+            FlashCard.objects.create(category=code, question="True?", answer=True, feedback="")
+        while BudgetSimulation.objects.filter(category=code).count() < size:
+            simulation = BudgetSimulation.objects.create(
+                category=code, question="Plan a budget", monthly_income=Decimal('100000.00')
+            )
+            for i in range(2 + size):
+                Expense.objects.create(
+                    BudgetSimulation=simulation, name=f"Expense {i}", amount=Decimal('10.00'),
+                    feedback="", essential=i == 0
+                )
+        while MatchAndDrag.objects.filter(category=code).count() < size:
+            match = MatchAndDrag.objects.create(category=code, feedback="")
+            TermsAndDefinitions.objects.create(question=match, term="Term", definition="Definition", feedback="")
+
+        for question_type, model in GAME_MODELS.items():
+            for question_id in model.objects.filter(category=code).order_by('id').values_list('id', flat=True)[:size // 2]:
+                QuestionProgress.objects.get_or_create(
+                    user=player, question_id=question_id, question_type=question_type, category=code
+                )
+
+    # Rolled up answer statistics: every type and category has questions at each correct rate,
+    # so the worst questions page always shows all types
+    ranks = {}
+    for question in Question.objects.filter(stats__isnull=True).order_by('id'):
+        rank = ranks[(question.question_type, question.category)] = ranks.get((question.question_type, question.category), -1) + 1
+        QuestionStats.objects.create(question=question, attempts=100, correct=rank, correct_rate=rank / 100)
+    for distractor in MultipleChoiceDistractor.objects.filter(stats__isnull=True):
+        DistractorStats.objects.create(distractor=distractor, picks=10)
+
+    while User.objects.filter(username__startswith='learner').count() < size:
+        User.objects.create_user(username=f"learner{User.objects.count()}", password='testpass123')
+
+
+def uncompleted(model, question_type, player, category='BUD'):
+    """First question of a type the player hasn't completed yet"""
+    done = QuestionProgress.objects.filter(user=player, question_type=question_type).values_list('question_id')
+    return model.objects.filter(category=category).exclude(id__in=done).order_by('id').first()
+
+
+def route_requests(player, admin):
+    """One request per (URL name, method) in the budget registry"""
+    mc = uncompleted(MultipleChoice, 'MC', player)
+    fib = uncompleted(FillInTheBlank, 'FIB', player)
+    card = uncompleted(FlashCard, 'FC', player)
+    simulation = uncompleted(BudgetSimulation, 'BS', player)
+    expense_ids = list(simulation.expenses.values_list('id', flat=True))
+    ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+    def get(name, user=player, **kwargs):
+        return (name, 'GET', reverse(name, kwargs=kwargs or None), None, user, {})
+
+    return [
+        get('index'),
+        get('home'),
+        get('learn'),
+        get('learn_budget'),
+        get('learn_savings'),
+        get('learn_investing'),
+        get('learn_taxes'),
+        get('learn_credit'),
+        get('learn_balance'),
+        get('user_list', user=admin),
+        get('user_create', user=None),
+        get('user_detail', user=admin, pk=player.pk),
+        get('user_edit', user=admin, pk=player.pk),
+        get('user_delete', user=admin, pk=player.pk),
+        get('register', user=None),
+        get('multiple_choice_list', user=admin),
+        get('multiple_choice_detail', user=admin, pk=mc.pk),
+        get('multiple_choice_create', user=admin),
+        get('multiple_choice_edit', user=admin, pk=mc.pk),
+        get('multiple_choice_delete', user=admin, pk=mc.pk),
+        get('play_multiple_choice', category='budget'),
+        ('play_multiple_choice', 'POST', reverse('play_multiple_choice', kwargs={'category': 'budget'}),
+         {'question_id': mc.id, 'answer': mc.answer}, player, {}),
+        get('play_flash_card', category='budget'),
+        ('play_flash_card', 'POST', reverse('play_flash_card', kwargs={'category': 'budget'}),
+         {'card_id': card.id, 'answer': 'True'}, player, ajax),
+        get('play_fill_blank', category='budget'),
+        ('play_fill_blank', 'POST', reverse('play_fill_blank', kwargs={'category': 'budget'}),
+         {'question_id': fib.id, 'missing_word': fib.missing_word}, player, {}),
+        get('play_budget_simulation', category='budget'),
+        ('play_budget_simulation', 'POST', reverse('play_budget_simulation', kwargs={'category': 'budget'}),
+         {'simulation_id': simulation.id, 'selected_expenses': json.dumps(expense_ids)}, player, ajax),
+        get('play_budget_simulation_difficulty', category='budget', difficulty='B'),
+        get('play_match_drag', category='budget'),
+        get('play_question_packs', category='budget'),
+        ('grade_pack_answer', 'POST', reverse('grade_pack_answer'),
+         {'question_type': 'FIB', 'question_id': fib.id, 'answer': fib.missing_word}, player, ajax),
+        get('play_mixed_review', category='budget'),
+        # More questions than either size has uncompleted, so both top up with completed ones
+        ('quiz_session', 'GET', reverse('quiz_session', kwargs={'category': 'budget'}) + '?count=50', None, player, {}),
+        ('quiz_answers', 'POST', reverse('quiz_answers'), {
+            'token': sign_quiz(player, 'BUD', [('MC', mc.id), ('FIB', fib.id), ('FC', card.id), ('BS', simulation.id)]),
+            'answers': json.dumps({f'MC:{mc.id}': mc.answer, f'FIB:{fib.id}': fib.missing_word,
+                                   f'FC:{card.id}': 'true', f'BS:{simulation.id}': expense_ids}),
+        }, player, {}),
+        get('slow_query_report', user=admin),
+        get('question_stats_report', user=admin),
+        get('leaderboard'),
+        get('leaderboard_category', category='budget'),
+        get('under_development', user=None),
+        get('maintenance', user=None),
+        get('status_200', user=None),
+        get('status_404', user=None),
+        get('status_500', user=None),
+        get('admin:cap_ace_web_budgetsimulation_changelist', user=admin),
+        get('admin:cap_ace_web_multiplechoice_changelist', user=admin),
+    ]
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.player = User.objects.create_user(username='player', password='testpass123')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.addCleanup(attempts.reset)
+
+    def measure(self):
+        """Query count for every (URL name, method)"""
+        counts = {}
+        for name, method, url, data, user, headers in route_requests(self.player, self.admin):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            # Budgets hold for a cold cache and the player's first activity of the day, the worst case
+            cache.clear()
+            DailyActivity.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'GET':
+                    response = client.get(url, **headers)
+                else:
+                    response = client.post(url, data, **headers)
+            if not name.startswith('status_'):
+                self.assertLess(response.status_code, 500, f"{method} {name} failed")
+            counts[(name, method)] = len(queries)
+        return counts
+
+    def test_registry_covers_every_url(self):
+        """Test that every named URL has a budget and every budget is exercised"""
+        names = {p.name for p in urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+        missing = names - set(QUERY_BUDGETS)
+        self.assertFalse(missing, f"URLs without a query budget: {sorted(missing)}")
+
+        exercised = {(name, method) for name, method, *_ in route_requests(*self.grow(SMALL))}
+        budgeted = {(name, method) for name, methods in QUERY_BUDGETS.items() for method in methods}
+        self.assertEqual(budgeted - exercised, set(), "Budgets without a request in route_requests")
+
+    def test_views_stay_within_budget(self):
+        """Test that no view exceeds its query budget or scales its queries with data size"""
+        small = self.measure_at(SMALL)
+        large = self.measure_at(LARGE)
+
+        for (name, method), count in large.items():
+            budget = QUERY_BUDGETS[name][method]
+            with self.subTest(url=name, method=method):
+                self.assertLessEqual(count, budget, f"{method} {name} issued {count} queries, budget is {budget}")
+                self.assertEqual(
+                    small[(name, method)], count,
+                    f"{method} {name} issued {small[(name, method)]} queries at size {SMALL} "
+                    f"but {count} at size {LARGE}"
+                )
+
+    def grow(self, size):
+        grow_fixture(size, self.player)
+        return self.player, self.admin
+
+    def measure_at(self, size):
+        self.grow(size)
+        return self.measure()
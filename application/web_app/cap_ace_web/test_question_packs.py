@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from . import cache
+from .models import MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, FlashCardReview, QuestionProgress
+
+User = get_user_model()
+
+
+class QuestionPackTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.question = MultipleChoice.objects.create(
+            question="What is a budget?", answer="A spending plan", feedback="Budgets plan spending",
+            difficulty='I', category='BUD'
+        )
+        MultipleChoiceDistractor.objects.create(question=self.question, distractor="A loan")
+        self.fib = FillInTheBlank.objects.create(
+            question="A budget is a spending ____", answer="A budget is a spending plan", missing_word="plan",
+            feedback="", difficulty='B', category='BUD'
+        )
+        self.card = FlashCard.objects.create(question="Budgets plan spending", answer=True, feedback="", category='SAV')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build(self):
+        call_command('build_question_packs', output=self.directory, stdout=StringIO())
+        with open(os.path.join(self.directory, 'manifest.json')) as f:
+            return json.load(f)
+
+    def read_pack(self, path):
+        with open(os.path.join(self.directory, os.path.basename(path))) as f:
+            return json.load(f)
+
+    def test_packs_leave_out_answers(self):
+        """Test that packs are split by category, type and difficulty without answers or feedback"""
+        manifest = self.build()
+        self.assertEqual(set(manifest['packs']), {'BUD', 'SAV'})
+        mc = self.read_pack(manifest['packs']['BUD']['MC']['I'])
+        self.assertEqual(mc['questions'], [{
+            'id': self.question.id, 'question': "What is a budget?", 'choices': ["A loan", "A spending plan"],
+        }])
+        fib = self.read_pack(manifest['packs']['BUD']['FIB']['B'])
+        self.assertNotIn('plan"', json.dumps(fib).replace('spending ____', ''))
+        self.assertNotIn('answer', json.dumps(self.read_pack(manifest['packs']['SAV']['FC']['B'])))
+
+    def test_pack_names_change_with_content(self):
+        """Test that unchanged packs keep their hashed name and edited ones get a new one"""
+        first = self.build()
+        self.assertEqual(self.build(), first)
+        self.card.question = "Edited"
+        self.card.save()
+        second = self.build()
+        self.assertNotEqual(first['packs']['SAV'], second['packs']['SAV'])
+        self.assertEqual(first['packs']['BUD'], second['packs']['BUD'])
+
+    def test_game_page_and_grading(self):
+        """Test that the quick play page lists completed questions and grading awards XP once"""
+        user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(user)
+        grade_url = reverse('grade_pack_answer')
+
+        response = self.client.post(grade_url, {'question_type': 'MC', 'question_id': self.question.id,
+                                                'answer': "A loan"})
+        self.assertEqual(response.json()['correct_answer'], "A spending plan")
+        self.assertFalse(response.json()['is_correct'])
+
+        for _ in range(2):
+            response = self.client.post(grade_url, {'question_type': 'FIB', 'question_id': self.fib.id,
+                                                    'answer': "plan"})
+            self.assertTrue(response.json()['is_correct'])
+        user.refresh_from_db()
+        self.assertEqual(user.budget_xp, 50)
+        self.assertEqual(QuestionProgress.objects.filter(user=user).count(), 1)
+
+        # A missed card comes back soon in the flash card game
+        response = self.client.post(grade_url, {'question_type': 'FC', 'question_id': self.card.id,
+                                                'answer': "false"})
+        self.assertFalse(response.json()['is_correct'])
+        self.assertEqual(FlashCardReview.objects.get(user=user, card_id=self.card.id).repetitions, 0)
+
+        response = self.client.get(reverse('play_question_packs', kwargs={'category': 'budget'}))
+        self.assertEqual(response.context['completed']['FIB'], [self.fib.id])
+        self.assertContains(response, "/static/packs/manifest.json")
+
+        self.assertEqual(self.client.post(grade_url, {'question_type': 'BS', 'question_id': 1}).status_code, 400)
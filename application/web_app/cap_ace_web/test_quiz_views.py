@@ -0,0 +1,167 @@
+import json
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import (MultipleChoice, MultipleChoiceDistractor, FillInTheBlank, FlashCard, FlashCardReview,
+                     BudgetSimulation, Expense, QuestionProgress)
+from .quiz_views import sign_quiz, question_candidates, random_questions
+
+User = get_user_model()
+
+
+class QuizSessionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        self.mc = MultipleChoice.objects.create(
+            question="What is a budget?", answer="A spending plan", feedback="", difficulty='I', category='BUD'
+        )
+        MultipleChoiceDistractor.objects.create(question=self.mc, distractor="A loan")
+        self.fib = FillInTheBlank.objects.create(
+            question="A spending ____", answer="A spending plan", missing_word="plan", feedback="", category='BUD'
+        )
+        self.card = FlashCard.objects.create(question="Budgets help?", answer=True, feedback="", category='BUD')
+        self.simulation = BudgetSimulation.objects.create(question="Plan", monthly_income=1000, category='BUD')
+        self.rent = Expense.objects.create(
+            BudgetSimulation=self.simulation, name="Rent", amount=800, essential=True, feedback="Needed"
+        )
+        self.trip = Expense.objects.create(
+            BudgetSimulation=self.simulation, name="Trip", amount=500, essential=False, feedback=""
+        )
+
+    def start(self, count=10):
+        return self.client.get(reverse('quiz_session', kwargs={'category': 'budget'}), {'count': count}).json()
+
+    def answer(self, token, answers):
+        return self.client.post(reverse('quiz_answers'), {'token': token, 'answers': json.dumps(answers)})
+
+    def test_session_has_mixed_questions_without_answers(self):
+        """Test that a session holds every type once and leaves out answers"""
+        quiz = self.start()
+        self.assertEqual({question['type'] for question in quiz['questions']}, {'MC', 'FIB', 'FC', 'BS'})
+        mc = next(question for question in quiz['questions'] if question['type'] == 'MC')
+        self.assertEqual(sorted(mc['choices']), ["A loan", "A spending plan"])
+        body = json.dumps(quiz['questions'])
+        self.assertNotIn('missing_word', body)
+        self.assertNotIn('essential', body)
+        self.assertEqual(len(self.start(count=2)['questions']), 2)
+
+    def test_query_count_is_fixed(self):
+        """Test that a session's queries don't grow with the number of questions"""
+        # Both sessions take every question of the category, so neither depends on which types
+        # the random pick happens to include (each type has its own load and prefetch queries)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual({question['type'] for question in self.start(count=4)['questions']},
+                             {'MC', 'FIB', 'FC', 'BS'})
+        for i in range(5):
+            question = MultipleChoice.objects.create(question=f"Q{i}", answer="A", feedback="", category='BUD')
+            MultipleChoiceDistractor.objects.create(question=question, distractor="B")
+            simulation = BudgetSimulation.objects.create(question=f"S{i}", monthly_income=10, category='BUD')
+            Expense.objects.create(BudgetSimulation=simulation, name="E", amount=1, feedback="")
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.start(count=14)['questions']), 14)
+        self.assertEqual(len(many), len(few))
+
+    def test_answers_are_graded_once(self):
+        """Test that all answers are graded in one request and XP is only awarded once"""
+        token = self.start()['token']
+        answers = {
+            f'MC:{self.mc.id}': "A spending plan",
+            f'FIB:{self.fib.id}': "wrong",
+            f'FC:{self.card.id}': "true",
+            f'BS:{self.simulation.id}': [self.rent.id],
+        }
+        data = self.answer(token, answers).json()
+        results = {(result['type'], result['id']): result['is_correct'] for result in data['results']}
+        self.assertEqual(results, {
+            ('MC', self.mc.id): True, ('FIB', self.fib.id): False,
+            ('FC', self.card.id): True, ('BS', self.simulation.id): True,
+        })
+        self.assertEqual(data['xp_earned'], 100 + 50 + 50)
+        self.assertEqual(self.answer(token, answers).json()['xp_earned'], 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.budget_xp, 200)
+        self.assertEqual(QuestionProgress.objects.filter(user=self.user).count(), 3)
+        # The card moved on in its review schedule with each submission
+        self.assertEqual(FlashCardReview.objects.get(user=self.user, card_id=self.card.id).repetitions, 2)
+
+    def test_over_budget_simulation_fails(self):
+        """Test that a budget over the income is graded as incorrect"""
+        token = sign_quiz(self.user, 'BUD', [('BS', self.simulation.id)])
+        data = self.answer(token, {f'BS:{self.simulation.id}': [self.rent.id, self.trip.id]}).json()
+        self.assertFalse(data['results'][0]['is_correct'])
+
+    def test_token_is_checked(self):
+        """Test that tampered, foreign and expired tokens are rejected and other questions are ignored"""
+        token = sign_quiz(self.user, 'BUD', [('MC', self.mc.id)])
+        self.assertEqual(self.answer(token + 'x', {}).status_code, 403)
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.assertEqual(self.answer(sign_quiz(other, 'BUD', [('MC', self.mc.id)]), {}).status_code, 403)
+
+        data = self.answer(token, {f'FC:{self.card.id}': "true"}).json()
+        self.assertEqual(data['results'], [])
+
+        with override_settings(QUIZ_SESSION_MAX_AGE=-1):
+            self.assertEqual(self.answer(token, {}).status_code, 403)
+
+
+class MixedReviewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        self.mc = MultipleChoice.objects.create(question="MC", answer="A", feedback="", category='BUD')
+        self.fib = FillInTheBlank.objects.create(question="FIB", answer="A", missing_word="A", feedback="", category='BUD')
+        self.card = FlashCard.objects.create(question="FC", answer=True, feedback="", category='BUD')
+        self.simulation = BudgetSimulation.objects.create(question="BS", monthly_income=10, category='BUD')
+        FlashCard.objects.create(question="Other category", answer=True, feedback="", category='TAX')
+
+    def test_candidates_in_one_query(self):
+        """Test that every type's questions of a category come from a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            candidates = question_candidates(self.user, 'BUD')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            set(candidates),
+            {('MC', self.mc.id), ('FIB', self.fib.id), ('FC', self.card.id), ('BS', self.simulation.id)}
+        )
+
+    def test_completed_questions_are_excluded_per_type(self):
+        """Test that a completed question only hides the question of its own type"""
+        # Same id, different type: only the flash card is completed
+        QuestionProgress.objects.create(user=self.user, question_id=self.card.id, question_type='FC', category='BUD')
+        candidates = set(question_candidates(self.user, 'BUD'))
+        self.assertNotIn(('FC', self.card.id), candidates)
+        self.assertIn(('MC', self.mc.id), candidates)
+        self.assertEqual(len(set(question_candidates(self.user, 'BUD', exclude_completed=False))), 4)
+
+    def test_random_questions_top_up_with_completed(self):
+        """Test that completed questions fill the round once uncompleted ones run out"""
+        for question_type, question in (('MC', self.mc), ('FIB', self.fib), ('FC', self.card)):
+            QuestionProgress.objects.create(
+                user=self.user, question_id=question.id, question_type=question_type, category='BUD'
+            )
+        chosen = random_questions(self.user, 'BUD', 3)
+        self.assertEqual(len(chosen), 3)
+        self.assertEqual(len(set(chosen)), 3)
+        self.assertIn(('BS', self.simulation.id), chosen)
+        self.assertEqual(len(random_questions(self.user, 'BUD', 10)), 4)
+
+    def test_page_renders(self):
+        """Test that the mixed review page loads its questions from the quiz session API"""
+        response = self.client.get(reverse('play_mixed_review', kwargs={'category': 'budget'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Budgeting Mixed Review')
+        self.assertContains(response, reverse('quiz_session', kwargs={'category': 'budget'}))
+        self.assertEqual(
+            self.client.get(reverse('play_mixed_review', kwargs={'category': 'unknown'})).status_code, 404
+        )
+
+    def test_category_pages_link_mixed_games(self):
+        """Test that every category page links to its mixed review and quick play games"""
+        for page, category in (('learn_budget', 'budget'), ('learn_balance', 'balance'), ('learn_taxes', 'taxes')):
+            response = self.client.get(reverse(page))
+            self.assertContains(response, reverse('play_mixed_review', kwargs={'category': category}))
+            self.assertContains(response, reverse('play_question_packs', kwargs={'category': category}))
@@ -0,0 +1,78 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from io import StringIO
+from .models import MultipleChoice, FlashCard, MatchAndDrag, Question, QuestionProgress
+from .game_views import MultipleChoiceGameView
+from .registry import sync_registry
+from .scheduler import next_card_id
+from .views import question_totals_by_category
+
+User = get_user_model()
+
+
+class QuestionRegistryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.mc = MultipleChoice.objects.create(question="MC", answer="A", feedback="", category='BUD', difficulty='I')
+        self.card = FlashCard.objects.create(question="FC", answer=True, feedback="", category='TAX')
+
+    def test_questions_are_registered(self):
+        """Test that saving a question creates and updates its registry row"""
+        entry = Question.objects.get(question_type='MC', object_id=self.mc.id)
+        self.assertEqual((entry.category, entry.difficulty, entry.is_active), ('BUD', 'I', True))
+        self.mc.difficulty = 'A'
+        self.mc.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.difficulty, 'A')
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_progress_is_linked_and_deleted_with_question(self):
+        """Test that progress links to the registry on save and goes away with its question"""
+        with self.assertNumQueries(1):
+            progress = QuestionProgress.objects.create(
+                user=self.user, question_id=self.mc.id, question_type='MC', category='BUD'
+            )
+        self.assertEqual(progress.registry_id, Question.objects.get(question_type='MC', object_id=self.mc.id).id)
+        self.mc.delete()
+        self.assertFalse(Question.objects.filter(question_type='MC').exists())
+        self.assertFalse(QuestionProgress.objects.exists())
+
+    def test_sync_backfills_and_removes_orphans(self):
+        """Test that a sync registers unregistered questions, links progress and drops orphans"""
+        Question.objects.all().delete()
+        QuestionProgress.objects.bulk_create([
+            QuestionProgress(user=self.user, question_id=self.card.id, question_type='FC', category='TAX'),
+            # Question deleted before the registry existed
+            QuestionProgress(user=self.user, question_id=self.card.id + 100, question_type='FC', category='TAX'),
+        ])
+        counts = sync_registry()
+        self.assertEqual((counts['created'], counts['linked'], counts['orphans']), (2, 1, 1))
+        self.assertEqual(
+            QuestionProgress.objects.get().registry, Question.objects.get(question_type='FC', object_id=self.card.id)
+        )
+
+        # Nothing left to do the second time
+        out = StringIO()
+        call_command('sync_question_registry', stdout=out)
+        self.assertIn('0 created, 0 updated, 0 deleted', out.getvalue())
+
+    def test_totals_count_every_type(self):
+        """Test that category totals come from the registry and leave out inactive questions and ones that can't
+        be completed"""
+        MatchAndDrag.objects.create(feedback="", category='BUD')
+        self.assertEqual(question_totals_by_category(), {'BUD': 1, 'TAX': 1})
+        # Deactivated in the admin
+        entry = Question.objects.get(question_type='FC')
+        entry.is_active = False
+        entry.save()
+        self.assertEqual(question_totals_by_category(), {'BUD': 1})
+
+    def test_inactive_questions_are_not_played(self):
+        """Test that the games never pick a question deactivated in the registry"""
+        other = MultipleChoice.objects.create(question="MC 2", answer="A", feedback="", category='BUD')
+        Question.objects.filter(question_type='MC', object_id=self.mc.id).update(is_active=False)
+        Question.objects.filter(question_type='FC', object_id=self.card.id).update(is_active=False)
+        for _ in range(10):
+            self.assertEqual(MultipleChoiceGameView().get_random_question('budget', self.user).id, other.id)
+        self.assertIsNone(next_card_id(self.user, 'TAX'))
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from . import attempts
+from .attempts import record_attempt
+from .models import (MultipleChoice, MultipleChoiceDistractor, FlashCard, AnswerAttempt, QuestionStats, DistractorStats,
+                     RollupWatermark)
+from .rollups import update_rollups, WATERMARK
+
+User = get_user_model()
+
+
+@override_settings(ATTEMPT_BUFFER_SIZE=1, ROLLUP_SETTLE_SECONDS=0)
+class RollupTest(TestCase):
+    def setUp(self):
+        attempts.reset()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.question = MultipleChoice.objects.create(question="What is a budget?", answer="Plan", feedback="", category='BUD')
+        self.loan = MultipleChoiceDistractor.objects.create(question=self.question, distractor="Loan")
+        self.gift = MultipleChoiceDistractor.objects.create(question=self.question, distractor="Gift")
+        self.card = FlashCard.objects.create(question="Budgets help?", answer=True, feedback="", category='BUD')
+
+    def stats(self, question_type, question):
+        return QuestionStats.objects.get(question__question_type=question_type, question__object_id=question.id)
+
+    def test_rollups_count_only_new_attempts(self):
+        """Test that each run adds the attempts logged since the watermark to the totals"""
+        record_attempt(self.user, 'MC', self.question.id, 'Loan', False, 3000)
+        record_attempt(self.user, 'MC', self.question.id, 'Plan', True, 1000)
+        record_attempt(self.user, 'FC', self.card.id, 'true', True)
+        self.assertEqual(update_rollups(), 3)
+        self.assertEqual(update_rollups(), 0)
+
+        record_attempt(self.user, 'MC', self.question.id, 'Loan', False)
+        record_attempt(self.user, 'MC', self.question.id, 'Loan', False, 2000)
+        self.assertEqual(update_rollups(), 2)
+
+        stats = self.stats('MC', self.question)
+        self.assertEqual((stats.attempts, stats.correct, stats.correct_rate), (4, 1, 0.25))
+        self.assertEqual(stats.average_latency_ms, 2000)
+        self.assertEqual(self.stats('FC', self.card).correct_rate, 1.0)
+        self.assertEqual(DistractorStats.objects.get(distractor=self.loan).picks, 3)
+        self.assertFalse(DistractorStats.objects.filter(distractor=self.gift).exists())
+        self.assertEqual(RollupWatermark.objects.get(name=WATERMARK).last_id, AnswerAttempt.objects.latest('id').id)
+
+    @override_settings(ROLLUP_SETTLE_SECONDS=60)
+    def test_only_settled_attempts_are_counted(self):
+        """Test that attempts are counted only up to the highest id seen a settle period ago"""
+        record_attempt(self.user, 'MC', self.question.id, 'Loan', False)
+        record_attempt(self.user, 'MC', self.question.id, 'Plan', True)
+        # Seen now, but a batch below them could still be committing
+        self.assertEqual(update_rollups(), 0)
+        record_attempt(self.user, 'FC', self.card.id, 'true', True)
+
+        RollupWatermark.objects.filter(name=WATERMARK).update(seen_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(update_rollups(), 2)
+        # The attempt after the first look waits for its own settle period
+        self.assertEqual(update_rollups(), 0)
+        self.assertFalse(QuestionStats.objects.filter(question__question_type='FC').exists())
+
+    def test_command_works_through_every_batch(self):
+        """Test that the command keeps counting until the rollups are up to date"""
+        for answer in ('Loan', 'Gift', 'Plan'):
+            record_attempt(self.user, 'MC', self.question.id, answer, answer == 'Plan')
+        out = StringIO()
+        call_command('rollup_attempts', '--batch-size', '2', stdout=out)
+        self.assertIn('Counted 3 attempts', out.getvalue())
+        self.assertEqual(self.stats('MC', self.question).attempts, 3)
+
+    def test_worst_questions_report(self):
+        """Test that staff see the lowest correct rates first with distractor pick rates"""
+        for i in range(5):
+            record_attempt(self.user, 'MC', self.question.id, 'Loan' if i else 'Plan', i == 0)
+            record_attempt(self.user, 'FC', self.card.id, 'true', True)
+        # Below the attempt minimum
+        other = FlashCard.objects.create(question="Never answered right", answer=True, feedback="", category='BUD')
+        record_attempt(self.user, 'FC', other.id, 'false', False)
+        update_rollups()
+
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('question_stats_report'))
+        rows = response.context['rows']
+        self.assertEqual([row['text'] for row in rows], ["What is a budget?", "Budgets help?"])
+        self.assertEqual(rows[0]['distractors'], [{'text': 'Loan', 'picks': 4, 'pick_rate': 0.8}])
+        self.assertContains(response, 'picked 4 times (80%)')
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('question_stats_report')).status_code, 403)
@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from . import cache
+from .models import MultipleChoice, QuestionProgress
+from .payloads import get_payload
+from .routers import ReplicaRouter, use_primary, STICKY_SESSION_KEY
+from .game_views import reserved_cookie_name
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_ROUTERS=['cap_ace_web.routers.ReplicaRouter'])
+class ReplicaRouterTest(TestCase):
+    # Two separate SQLite databases, "replication" is done by hand
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        for db in ('default', 'replica'):
+            MultipleChoice.objects.using(db).create(
+                id=1, category='BUD', question='Replicated question', answer='A', feedback='F'
+            )
+        # Not replicated yet
+        MultipleChoice.objects.using('default').create(
+            id=2, category='BUD', question='Primary only question', answer='A', feedback='F'
+        )
+
+    def test_routing(self):
+        """Test that content reads go to the replica and progress and writes to the primary"""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(MultipleChoice), 'replica')
+        self.assertEqual(router.db_for_read(QuestionProgress), 'default')
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_write(MultipleChoice), 'default')
+        with use_primary():
+            self.assertEqual(router.db_for_read(MultipleChoice), 'default')
+
+    def test_game_reads_from_replica(self):
+        """Test that game questions are served from the replica"""
+        self.assertEqual(MultipleChoice.objects.count(), 1)
+        response = self.client.get(reverse('play_multiple_choice', kwargs={'category': 'budget'}))
+        self.assertContains(response, 'Replicated question')
+        self.assertNotIn(STICKY_SESSION_KEY, self.client.session)
+
+    def test_payload_built_from_primary(self):
+        """Test that a payload rebuilt after an edit doesn't cache the lagging replica's copy"""
+        cache.clear()
+        MultipleChoice.objects.using('default').filter(id=1).update(question='Edited question')
+        self.assertEqual(get_payload('MC', 1).question, 'Edited question')
+        self.assertEqual(get_payload('MC', 2).question, 'Primary only question')
+
+    def test_session_sticks_to_primary_after_write(self):
+        """Test that after answering, the player's reads stay on the primary"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        self.client.post(url, {'question_id': 1, 'answer': 'A'})
+        self.assertTrue(QuestionProgress.objects.filter(user=self.user, question_id=1).exists())
+        self.assertIn(STICKY_SESSION_KEY, self.client.session)
+
+        # Only the primary knows question 2, and question 1 is completed there
+        response = self.client.get(url)
+        self.assertContains(response, 'Primary only question')
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_sticky_window_expires(self):
+        """Test that reads return to the replica once the window has passed"""
+        url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+        self.client.post(url, {'question_id': 1, 'answer': 'A'})
+        # Without the next question the answer reserved (picked on the primary)
+        del self.client.cookies[reserved_cookie_name('MC', 'budget')]
+        response = self.client.get(url)
+        self.assertContains(response, 'Replicated question')
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from . import attempts, cache
+from .models import FlashCard, FlashCardReview
+from .scheduler import review_card, review_cards, next_card_id, DEFAULT_EASE, MIN_EASE, FAST_ANSWER_MS
+
+User = get_user_model()
+
+
+class SchedulerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.cards = [
+            FlashCard.objects.create(question=f"Card {number}?", answer=True, feedback="", category='BUD')
+            for number in range(3)
+        ]
+        self.card = self.cards[0]
+
+    def review(self):
+        return FlashCardReview.objects.get(user=self.user, card=self.card)
+
+    def test_answer_is_one_update(self):
+        """Test that answering a card already under review is a single UPDATE"""
+        review_card(self.user, self.card, True)
+        with self.assertNumQueries(1):
+            review_card(self.user, self.card, True)
+        with self.assertNumQueries(1):
+            review_card(self.user, self.card, False)
+
+    def test_intervals_follow_sm2(self):
+        """Test that right answers space the card out by 1 day, 6 days and then the interval times the ease"""
+        intervals = []
+        for _ in range(4):
+            review_card(self.user, self.card, True)
+            intervals.append(self.review().interval_days)
+        self.assertEqual(intervals, [1, 6, 15, 38])
+
+        review = self.review()
+        self.assertEqual(review.ease, DEFAULT_EASE)
+        self.assertAlmostEqual((review.due_at - timezone.now()).total_seconds(), 38 * 86400, delta=60)
+
+    def test_quick_answers_raise_ease(self):
+        """Test that quick right answers raise the ease factor"""
+        review_card(self.user, self.card, True, FAST_ANSWER_MS - 1)
+        review_card(self.user, self.card, True, FAST_ANSWER_MS - 1)
+        self.assertEqual(self.review().ease, DEFAULT_EASE + 200)
+
+    def test_wrong_answer_starts_over(self):
+        """Test that a wrong answer resets the card and brings it back within minutes"""
+        for _ in range(3):
+            review_card(self.user, self.card, True)
+        review_card(self.user, self.card, False)
+
+        review = self.review()
+        self.assertEqual((review.repetitions, review.interval_days), (0, 0))
+        self.assertLess(review.due_at, timezone.now() + timedelta(hours=1))
+        self.assertGreaterEqual(review.ease, MIN_EASE)
+
+        review_card(self.user, self.card, True)
+        self.assertEqual(self.review().interval_days, 1)
+
+    def test_several_cards_at_once(self):
+        """Test that reviewing several cards together schedules each like review_card() in bounded queries"""
+        review_card(self.user, self.cards[0], True)
+        review_card(self.user, self.cards[1], True)
+        # A read, an UPDATE per response quality and one INSERT for the card never seen
+        with self.assertNumQueries(4):
+            review_cards(self.user, [(self.cards[0], True, None), (self.cards[1], False, None),
+                                     (self.cards[2], True, None)])
+        reviews = {review.card_id: review for review in FlashCardReview.objects.filter(user=self.user)}
+        self.assertEqual((reviews[self.cards[0].id].repetitions, reviews[self.cards[0].id].interval_days), (2, 6))
+        self.assertEqual((reviews[self.cards[1].id].repetitions, reviews[self.cards[1].id].interval_days), (0, 0))
+        self.assertEqual((reviews[self.cards[2].id].repetitions, reviews[self.cards[2].id].interval_days), (1, 1))
+
+    def test_due_card_comes_first(self):
+        """Test that an overdue card is picked before cards never seen"""
+        review_card(self.user, self.card, True)
+        FlashCardReview.objects.filter(card=self.card).update(due_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(next_card_id(self.user, 'BUD'), self.card.id)
+
+    def test_new_card_when_nothing_is_due(self):
+        """Test that a card never seen is picked while no review is due"""
+        review_card(self.user, self.cards[0], True)
+        review_card(self.user, self.cards[1], True)
+        for _ in range(5):
+            self.assertEqual(next_card_id(self.user, 'BUD'), self.cards[2].id)
+
+    def test_soonest_card_when_every_card_is_reviewed(self):
+        """Test that the card due soonest is picked once every card has been seen, skipping the one just answered"""
+        for card in self.cards:
+            review_card(self.user, card, True)
+        FlashCardReview.objects.filter(card=self.cards[1]).update(due_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(next_card_id(self.user, 'BUD'), self.cards[1].id)
+        self.assertNotEqual(next_card_id(self.user, 'BUD', exclude_id=self.cards[1].id), self.cards[1].id)
+        self.assertIsNone(next_card_id(self.user, 'INV'))
+
+
+class FlashCardSchedulingViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(attempts.reset)
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.card = FlashCard.objects.create(question="Budgets help?", answer=True, feedback="", category='BUD')
+        self.client.login(username='player', password='testpass123')
+
+    def test_answer_schedules_card(self):
+        """Test that answering a flash card in the game records its review"""
+        url = reverse('play_flash_card', kwargs={'category': 'budget'})
+        self.client.post(url, {'card_id': self.card.id, 'answer': 'True'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(self.client.get(url).context['card'].id, self.card.id)
+
+        review = FlashCardReview.objects.get(user=self.user, card=self.card)
+        self.assertEqual((review.category, review.repetitions, review.interval_days), ('BUD', 1, 1))
@@ -3,6 +3,11 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from http import HTTPStatus
 from django.shortcuts import render
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from . import cache
+from .models import MultipleChoice, FillInTheBlank
+from .game_views import reserved_cookie_name
 # from .test_models import SavingModule, SavingsGoal
 
 User = get_user_model()
@@ -172,3 +177,94 @@ class UserViewTests(TestCase):
 #         expense = Expense(user=request.user, category=category, amount=amount)
 #         expense.save()
 #     return redirect("budgeting_lesson")
+
+
+class ReservedQuestionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        self.questions = [
+            MultipleChoice.objects.create(
+                question=f"Question {i}?", answer="Right", feedback="", difficulty='B', category='BUD'
+            )
+            for i in range(2)
+        ]
+        self.url = reverse('play_multiple_choice', kwargs={'category': 'budget'})
+
+    def test_answer_reserves_next_question(self):
+        """Test that answering picks the next uncompleted question and the next page shows it"""
+        response = self.client.post(self.url, {'question_id': self.questions[0].id, 'answer': "Right"})
+        self.assertContains(response, f'<link rel="prefetch" href="{self.url}">')
+        self.assertIn(reserved_cookie_name('MC', 'budget'), response.cookies)
+
+        # Shown on every reload until the next answer, without selection queries
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+            self.assertEqual(response.context['question'].id, self.questions[1].id)
+            self.assertFalse(any('cap_ace_web_questionprogress' in query['sql'] for query in queries))
+
+    def test_reservation_expires(self):
+        """Test that a reservation older than its max age is ignored and a question is selected again"""
+        self.client.post(self.url, {'question_id': self.questions[0].id, 'answer': "Right"})
+        with self.settings(RESERVED_QUESTION_MAX_AGE=0), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['question'].id, self.questions[1].id)
+        self.assertTrue(any('cap_ace_web_questionprogress' in query['sql'] for query in queries))
+
+    def test_deleted_reservation_falls_back(self):
+        """Test that a reserved question that was deleted is replaced by a random one"""
+        self.client.post(self.url, {'question_id': self.questions[0].id, 'answer': "Right"})
+        self.questions[1].delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['question'].id, self.questions[0].id)
+
+
+class FragmentAnswerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.force_login(self.user)
+        self.questions = [
+            FillInTheBlank.objects.create(
+                question=f"Blank ____ {i}", answer=f"Blank word {i}", missing_word="word", feedback="Explained",
+                difficulty='B', category='BUD'
+            )
+            for i in range(2)
+        ]
+        self.url = reverse('play_fill_blank', kwargs={'category': 'budget'})
+
+    def test_game_page_uses_fragments(self):
+        """Test that the game page wraps its fragment and loads the answer script"""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'id="game-area"')
+        self.assertContains(response, 'data-fragment-answer')
+        self.assertContains(response, 'id="xp-bar"')
+
+    def test_ajax_answer_returns_fragments(self):
+        """Test that an AJAX answer returns the result and the next question without the page around them"""
+        response = self.client.post(
+            self.url, {'question_id': self.questions[0].id, 'missing_word': "word"},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        data = response.json()
+        self.assertTrue(data['is_correct'])
+        self.assertIn("Explained", data['result_html'])
+        self.assertIn('data-next-question', data['result_html'])
+        self.assertIn("Blank ____ 1", data['next_html'])
+        self.assertIn('csrfmiddlewaretoken', data['next_html'])
+        self.assertNotIn('<nav', data['result_html'] + data['next_html'])
+        # The XP bar with this answer's XP, for the page to swap in
+        self.assertEqual((data['xp']['total_xp'], data['xp']['current_level']), (50, 0))
+        self.assertIn('50/140 XP', data['xp_html'])
+
+        # The next question in the response is the one reserved for the next page
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['question'].id, self.questions[1].id)
+
+    def test_full_page_answer_still_works(self):
+        """Test that a regular form post still renders the result page"""
+        response = self.client.post(self.url, {'question_id': self.questions[0].id, 'missing_word': "nope"})
+        self.assertTemplateUsed(response, 'multiple_choice/result.html')
+        self.assertContains(response, "Incorrect")
@@ -0,0 +1,119 @@
+from io import StringIO
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from . import attempts, cache
+from .models import MultipleChoice, FlashCard, QuestionProgress, XPAward
+from .xp import award_xp, award_xp_bulk, backfill_ledger, find_drift, apply_drift
+
+User = get_user_model()
+
+
+class XPLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+
+    def test_award_writes_ledger_and_total(self):
+        """Test that an award adds a ledger row and moves the stored total, not a stale copy of it"""
+        stale = User.objects.get(pk=self.user.pk)
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        award_xp(stale, 'BUD', 50, 'MC', 2)
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).budget_xp, 150)
+        self.assertEqual(self.user.budget_xp, 100)
+        self.assertEqual(XPAward.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_award_query_count(self):
+        """Test that several awards take the same queries as one: the totals, the ledger INSERT, the queued
+        leaderboard moves and the day's activity"""
+        with self.assertNumQueries(5):
+            award_xp_bulk(self.user, [('BUD', 50, 'MC', 1), ('BUD', 100, 'FC', 2), ('TAX', 150, 'MC', 3)])
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.budget_xp, self.user.taxes_xp), (150, 150))
+
+    def test_drift_is_found_and_corrected(self):
+        """Test that columns off from the ledger are reported and corrected by the difference"""
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        award_xp(self.other, 'INV', 50, 'MC', 2)
+        User.objects.filter(pk=self.user.pk).update(budget_xp=40, taxes_xp=10)
+
+        drift = list(find_drift())
+        self.assertEqual(drift, [(self.user.pk, 'player', {'budget_xp': 60, 'taxes_xp': -10})])
+
+        # XP awarded after the drift was measured survives the correction
+        award_xp(self.user, 'BUD', 50, 'MC', 3)
+        self.assertEqual(apply_drift([user_id for user_id, _, _ in drift], batch_size=1), 1)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.budget_xp, self.user.taxes_xp), (150, 0))
+        self.assertEqual(list(find_drift()), [])
+
+    def test_total_is_reconciled(self):
+        """Test that total_xp is compared with the whole ledger and corrected on its own"""
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        award_xp(self.user, 'TAX', 50, 'MC', 2)
+        User.objects.filter(pk=self.user.pk).update(total_xp=0)
+
+        self.assertEqual(list(find_drift(chunk_size=1)), [(self.user.pk, 'player', {'total_xp': 150})])
+        self.assertEqual(apply_drift([self.user.pk]), 1)
+        self.assertEqual(User.objects.get(pk=self.user.pk).total_xp, 150)
+        self.assertEqual(list(find_drift()), [])
+
+    def test_correction_is_measured_again(self):
+        """Test that a correction is measured again under lock, not taken from a report that went stale"""
+        award_xp(self.user, 'BUD', 100, 'MC', 1)
+        # A scan that read the ledger before the award and the column after it reported -100
+        self.assertEqual(apply_drift([self.user.pk]), 0)
+        self.assertEqual(User.objects.get(pk=self.user.pk).budget_xp, 100)
+
+    def test_backfill_from_progress(self):
+        """Test that completed questions without a ledger row get one at their difficulty"""
+        question = MultipleChoice.objects.create(question="Q?", answer="A", feedback="", category='BUD',
+                                                 difficulty='A')
+        card = FlashCard.objects.create(question="C?", answer=True, feedback="", category='SAV', difficulty='B')
+        QuestionProgress.objects.create(user=self.user, question_id=question.id, question_type='MC', category='BUD')
+        QuestionProgress.objects.create(user=self.user, question_id=card.id, question_type='FC', category='SAV')
+        award_xp(self.user, 'BUD', 150, 'MC', question.id)
+
+        self.assertEqual(backfill_ledger(), 1)
+        self.assertEqual(backfill_ledger(), 0)
+        award = XPAward.objects.get(question_type='FC')
+        self.assertEqual((award.category, award.xp), ('SAV', 50))
+
+    def test_reconcile_command(self):
+        """Test that the command reports drift and corrects it only with --apply"""
+        award_xp(self.user, 'CRD', 100, 'MC', 1)
+        User.objects.filter(pk=self.user.pk).update(credit_xp=0)
+
+        out = StringIO()
+        call_command('reconcile_xp', stdout=out)
+        self.assertIn('1 users drifted', out.getvalue())
+        self.assertIn('credit_xp +100', out.getvalue())
+        self.assertEqual(User.objects.get(pk=self.user.pk).credit_xp, 0)
+
+        call_command('reconcile_xp', apply=True, stdout=StringIO())
+        self.assertEqual(User.objects.get(pk=self.user.pk).credit_xp, 100)
+        out = StringIO()
+        call_command('reconcile_xp', stdout=out)
+        self.assertIn("matches the ledger", out.getvalue())
+
+
+class GameAwardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(attempts.reset)
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.client.login(username='player', password='testpass123')
+
+    def test_first_completion_is_in_ledger(self):
+        """Test that a game pays XP once per question and records it in the ledger"""
+        card = FlashCard.objects.create(question="C?", answer=True, feedback="", category='BUD', difficulty='I')
+        url = reverse('play_flash_card', kwargs={'category': 'budget'})
+        for _ in range(2):
+            self.client.post(url, {'card_id': card.id, 'answer': 'True'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).budget_xp, 100)
+        award = XPAward.objects.get(user=self.user)
+        self.assertEqual((award.question_type, award.question_id, award.xp), ('FC', card.id, 100))
+        self.assertEqual(list(find_drift()), [])
@@ -1,12 +1,13 @@
 # example/urls.py
 from django.urls import path, include
 from .views import  (Index, UserListView, UserCreateView, UserDetailView, UserUpdateView, UserDeleteView, HomeView,learningview,
-                    MultipleChoiceListView, MultipleChoiceDetailView, MultipleChoiceCreateView, MultipleChoiceUpdateView, MultipleChoiceDeleteView)
+                    SlowQueryReportView, QuestionStatsReportView, LeaderboardView, MultipleChoiceListView, MultipleChoiceDetailView, MultipleChoiceCreateView, MultipleChoiceUpdateView, MultipleChoiceDeleteView)
 from django.contrib.auth import views as auth_views
 from django.contrib import admin
 from .import views 
 from .game_views import  (MultipleChoiceGameView, BudgetSimulationGameView, FillInTheBlankCreateView, FillInTheBlankDeleteView, FillInTheBlankDetailView, FillInTheBlankListView, 
-                          FillInTheBlankGameView, FlashCardGameView)
+                          FillInTheBlankGameView, FlashCardGameView, QuestionPackGameView, GradePackAnswerView)
+from .quiz_views import QuizSessionView, QuizAnswersView, MixedReviewView
 from .category_views import BudgetView, SavingsView, InvestingView, TaxesView, CreditView, BalanceSheetView
 from django.views.generic import TemplateView
 
@@ -55,11 +56,30 @@ urlpatterns = [
     # path('fill-blank/create/', FillInTheBlankCreateView.as_view(), name='fill_blank_create'),
     # path('fill-blank/<int:pk>/', FillInTheBlankDetailView.as_view(), name='fill_blank_detail'),
 
+    # Quick play from the static question packs, only answers are posted
+    path('learn/<str:category>/quick-play/', QuestionPackGameView.as_view(), name='play_question_packs'),
+    path('learn/quick-play/grade/', GradePackAnswerView.as_view(), name='grade_pack_answer'),
+
+    # Mixed review of every question type in a category, played through the quiz session API
+    path('learn/<str:category>/mixed-review/', MixedReviewView.as_view(), name='play_mixed_review'),
+
+    # Quiz sessions: fetch several questions at once, then answer them at once
+    path('api/quiz/answers/', QuizAnswersView.as_view(), name='quiz_answers'),
+    path('api/quiz/<str:category>/', QuizSessionView.as_view(), name='quiz_session'),
+
     path('learn/<str:category>/budgetsimulation/', BudgetSimulationGameView.as_view(), name='play_budget_simulation'),
     path('learn/<str:category>/budgetsimulation/<str:difficulty>/', BudgetSimulationGameView.as_view(), name='play_budget_simulation_difficulty'),
 
     # Temporary path for prod.
     path('learn/<str:category>/match-drag/', TemplateView.as_view(template_name='status/under_development.html'), name='play_match_drag'),
+    # Leaderboards, overall and per category
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/<str:category>/', LeaderboardView.as_view(), name='leaderboard_category'),
+
+    # Staff diagnostics
+    path('staff/slow-queries/', SlowQueryReportView.as_view(), name='slow_query_report'),
+    path('staff/question-stats/', QuestionStatsReportView.as_view(), name='question_stats_report'),
+
     # Special status pages
     path('under-development/', 
          TemplateView.as_view(template_name='status/under_development.html'), 
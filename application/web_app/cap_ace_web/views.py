@@ -1,5 +1,5 @@
 from django.views.generic import TemplateView
-from .models import MultipleChoice, MultipleChoiceDistractor, QuestionProgress, CATEGORIES
+from .models import MultipleChoice, MultipleChoiceDistractor, Question, QuestionProgress, QuestionStats, DistractorStats, CATEGORIES
 from django.contrib.auth import get_user_model
 from django.urls import reverse_lazy
 from django.shortcuts import render
@@ -9,6 +9,14 @@ from django.views.generic import CreateView, UpdateView, DeleteView, DetailView,
 from django.db.models import Count
 from django.contrib import messages
 from django.shortcuts import redirect
+from django.conf import settings
+from django.apps import apps
+from .db_instrumentation import read_log_records, aggregate_by_fingerprint
+from . import cache
+from .registry import COMPLETABLE_TYPES, REGISTRY_MODELS
+from .leaderboard import BOARDS, player_rank, top_players
+from .activity import activity_summary
+from django.http import Http404
 
 
 # Financial Data Feed Dashbaord View
@@ -22,6 +30,18 @@ class Index(TemplateView):
 
 
 
+@cache.cached('question_counts')
+def question_totals_by_category():
+    """Number of active questions in each category that a player can complete."""
+    return dict(
+        Question.objects
+        .filter(is_active=True, question_type__in=COMPLETABLE_TYPES)
+        .values_list('category')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+
 class learningview(LoginRequiredMixin, TemplateView):
     template_name = 'customizelearning.html'
     
@@ -31,18 +51,16 @@ class learningview(LoginRequiredMixin, TemplateView):
         # Get current user
         user = self.request.user
         
-        # Get all available questions per category
-        total_questions = {
-            category[0]: MultipleChoice.objects.filter(category=category[0]).count()
-            for category in CATEGORIES
-        }
+        # Get all available questions per category (cached, invalidated when questions change)
+        total_questions = question_totals_by_category()
         
         # Get completed questions for the user by category
-        completed_questions = (
+        completed_questions = dict(
             QuestionProgress.objects
             .filter(user=user)
-            .values('category')
+            .values_list('category')
             .annotate(completed=Count('question_id'))
+            .order_by()
         )
         
         # Calculate progress for each category
@@ -62,11 +80,7 @@ class learningview(LoginRequiredMixin, TemplateView):
         
         for category_code, category_name in CATEGORIES:
             # Get number of completed questions for this category
-            completed = next(
-                (item['completed'] for item in completed_questions 
-                 if item['category'] == category_code),
-                0
-            )
+            completed = completed_questions.get(category_code, 0)
             
             total = total_questions.get(category_code, 0)
             
@@ -110,7 +124,9 @@ class learningview(LoginRequiredMixin, TemplateView):
         context.update({
             'categories': categories,
             'total_xp': total_xp,
-            'total_completed': total_completed
+            'total_completed': total_completed,
+            # Streak, heatmap and XP chart from the daily rollups, not from QuestionProgress
+            'activity': activity_summary(user),
         })
         return context
 
@@ -289,6 +305,73 @@ class MultipleChoiceDeleteView(LoginRequiredMixin, StaffRequiredMixin, DeleteVie
         messages.success(self.request, 'Multiple choice question deleted successfully.')
         return super().delete(request, *args, **kwargs)
     
+class SlowQueryReportView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    template_name = 'staff/slow_queries.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        records = read_log_records()
+        context.update({
+            'queries': aggregate_by_fingerprint(records),
+            'total_records': len(records),
+            'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+            'log_file': settings.SLOW_QUERY_LOG_FILE,
+            'cache_stats': cache.stats.as_dict(),
+        })
+        return context
+
+class QuestionStatsReportView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    """Questions with the lowest correct rate, from the rollups (rollups.py)."""
+    template_name = 'staff/question_stats.html'
+    # Fewer attempts than this say more about the players than the question
+    min_attempts = 5
+    limit = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        worst = list(
+            QuestionStats.objects
+            .filter(attempts__gte=self.min_attempts, question__is_active=True)
+            .select_related('question')
+            .order_by('correct_rate', '-attempts')[:self.limit]
+        )
+
+        # Question texts, one query per type on the page
+        ids_by_type = {}
+        for stats in worst:
+            ids_by_type.setdefault(stats.question.question_type, []).append(stats.question.object_id)
+        texts = {}
+        for question_type, ids in ids_by_type.items():
+            model = apps.get_model('cap_ace_web', REGISTRY_MODELS[question_type])
+            for question in model.objects.filter(id__in=ids):
+                texts[(question_type, question.id)] = getattr(question, 'question', str(question))
+
+        # Pick counts of the distractors of the multiple choice questions on the page
+        picks = {}
+        distractor_stats = DistractorStats.objects.filter(
+            distractor__question_id__in=ids_by_type.get('MC', [])
+        ).select_related('distractor').order_by('-picks')
+        for distractor in distractor_stats:
+            picks.setdefault(distractor.distractor.question_id, []).append(distractor)
+
+        rows = []
+        for stats in worst:
+            question = stats.question
+            rows.append({
+                'stats': stats,
+                'text': texts.get((question.question_type, question.object_id), ''),
+                'distractors': [
+                    {'text': distractor.distractor.distractor, 'picks': distractor.picks,
+                     'pick_rate': distractor.picks / stats.attempts}
+                    for distractor in picks.get(question.object_id, []) if question.question_type == 'MC'
+                ],
+            })
+        context.update({
+            'rows': rows,
+            'min_attempts': self.min_attempts,
+        })
+        return context
+
 def register(request):
     if request.method == 'POST':
         username = request.POST['username']
@@ -330,4 +413,38 @@ def method_not_allowed(request, exception=None):
     return render(request, 'errors/405.html', status=405)
 
 def too_many_requests(request, exception=None):
-    return render(request, 'errors/429.html', status=429)
\ No newline at end of file
+    return render(request, 'errors/429.html', status=429)
+
+
+class LeaderboardView(LoginRequiredMixin, TemplateView):
+    """Top players overall or in one category, and where the player stands (leaderboard.py)."""
+    template_name = 'leaderboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        category_mapping = {
+            'budget': 'BUD',
+            'investing': 'INV',
+            'savings': 'SAV',
+            'balance': 'BAL',
+            'credit': 'CRD',
+            'taxes': 'TAX',
+        }
+        slug = self.kwargs.get('category')
+        if slug is not None and slug not in category_mapping:
+            raise Http404("Unknown category")
+        board = category_mapping[slug] if slug else 'ALL'
+        field = BOARDS[board]
+
+        # Read only: queued moves are applied by `python manage.py apply_score_moves`
+        rank, players = player_rank(self.request.user, field)
+        context.update({
+            'category': slug,
+            'board_name': dict(CATEGORIES).get(board, 'Overall'),
+            'boards': [(name, dict(CATEGORIES)[code]) for name, code in category_mapping.items()],
+            'top': top_players(field),
+            'rank': rank,
+            'players': players,
+            'xp': getattr(self.request.user, field),
+        })
+        return context
@@ -0,0 +1,203 @@
+"""
+XP ledger.
+
+Every XP payout is an XPAward row, and the per-category XP columns of
+Cap_Ace_User (budget_xp, ...) are running totals of it. award_xp() writes the
+ledger rows and moves the columns (and total_xp, their sum) in the same
+transaction, with an UPDATE that adds to the stored value rather than writing
+back one read earlier, so two answers of the same player can't overwrite each
+other's XP. The player's row of the day in DailyActivity (activity.py) is
+moved along in the same transaction, and the answer attempts that earned the
+XP (attempts.py) are written with it instead of waiting in the buffer.
+
+Columns that drift anyway (admin edits, imports) are put back in line with
+`python manage.py reconcile_xp`, which compares them, total_xp included, to
+the ledger totals.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum
+
+from .activity import record_activity
+from .attempts import record_attempts, write_attempts
+from .leaderboard import TOTAL_FIELD
+from .models import Cap_Ace_User, QuestionProgress, ScoreMove, XPAward, XP_FIELDS
+
+# Payout for completing a question the first time, by difficulty
+XP_BY_DIFFICULTY = {'B': 50, 'I': 100, 'A': 150}
+
+# Columns kept in line with the ledger: every category's and total_xp, their sum
+LEDGER_FIELDS = [*XP_FIELDS.values(), TOTAL_FIELD]
+
+
+def award_xp(user, category: str, xp: int, question_type: Optional[str] = None, question_id=None,
+             attempts: Iterable[Tuple[str, Any, Any, bool, Optional[int]]] = ()) -> None:
+    """Pay out XP in one category."""
+    award_xp_bulk(user, [(category, xp, question_type, question_id)], attempts)
+
+
+def award_xp_bulk(user, awards: Iterable[Tuple[str, int, Optional[str], Optional[int]]],
+                  attempts: Iterable[Tuple[str, Any, Any, bool, Optional[int]]] = ()) -> None:
+    """
+    Pay out several awards of one player, each (category, xp, question_type,
+    question_id): one UPDATE of the totals, one INSERT into the ledger, one of
+    the leaderboard moves (leaderboard.py) and the day's activity moved along.
+    Awards with a question count as completions for the day. The XP is added to
+    the user instance's columns too, so it can be rendered as is.
+
+    ``attempts`` (as for attempts.record_attempts()) are written with one more
+    INSERT in the same transaction, or buffered when there is nothing to pay.
+    """
+    awards = [award for award in awards if award[1] and award[0] in XP_FIELDS]
+    if not awards:
+        record_attempts(user, attempts)
+        return
+    added: Dict[str, int] = {TOTAL_FIELD: 0}
+    for category, xp, _, _ in awards:
+        field = XP_FIELDS[category]
+        added[field] = added.get(field, 0) + xp
+        added[TOTAL_FIELD] += xp
+
+    # No savepoint: within a surrounding transaction a failure rolls that back too
+    with transaction.atomic(savepoint=False):
+        # The UPDATE locks the player's row until the end of the transaction
+        Cap_Ace_User.objects.filter(pk=user.pk).update(**{field: F(field) + xp for field, xp in added.items()})
+        XPAward.objects.bulk_create([
+            XPAward(user=user, category=category, xp=xp, question_type=question_type,
+                    question_id=int(question_id) if question_id is not None else None)
+            for category, xp, question_type, question_id in awards
+        ])
+        ScoreMove.objects.bulk_create([ScoreMove(user=user, board=field, xp=xp) for field, xp in added.items()])
+        record_activity(user, sum(award[2] is not None for award in awards), added[TOTAL_FIELD])
+        write_attempts(user, attempts)
+    for field, xp in added.items():
+        setattr(user, field, getattr(user, field) + xp)
+
+
+def backfill_ledger(batch_size: int = 5000) -> int:
+    """
+    Write the awards of completed questions that have none in the ledger, at
+    their question's current difficulty and dated when they were completed.
+
+    Returns:
+        Number of awards written
+    """
+    missing = (
+        QuestionProgress.objects
+        .filter(registry__isnull=False, category__isnull=False)
+        .exclude(Exists(XPAward.objects.filter(
+            user=OuterRef('user'), question_type=OuterRef('question_type'), question_id=OuterRef('question_id')
+        )))
+        .order_by('id')
+        .values_list('user_id', 'category', 'question_type', 'question_id', 'completed_at', 'registry__difficulty')
+    )
+    written = 0
+    batch = []
+    for user_id, category, question_type, question_id, completed_at, difficulty in missing.iterator(chunk_size=batch_size):
+        batch.append(XPAward(
+            user_id=user_id, category=category, xp=XP_BY_DIFFICULTY.get(difficulty, 0),
+            question_type=question_type, question_id=question_id, awarded_at=completed_at,
+        ))
+        if len(batch) >= batch_size:
+            XPAward.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    XPAward.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+def ledger_totals(**users) -> Dict[Tuple[int, str], int]:
+    """
+    What the ledger says the XP columns of some users should hold, from one
+    grouped aggregate: {(user id, column): XP}, total_xp (their sum) included.
+
+    Args:
+        users: XPAward filter picking the users, e.g. user_id__in=[...]
+    """
+    totals: Dict[Tuple[int, str], int] = {}
+    rows = XPAward.objects.filter(**users).values_list('user_id', 'category').annotate(total=Sum('xp')).order_by()
+    for user_id, category, total in rows:
+        if category in XP_FIELDS:
+            totals[(user_id, XP_FIELDS[category])] = total
+            totals[(user_id, TOTAL_FIELD)] = totals.get((user_id, TOTAL_FIELD), 0) + total
+    return totals
+
+
+def _column_drift(user_id: int, values: Dict[str, Optional[int]], totals: Dict[Tuple[int, str], int]) -> Dict[str, int]:
+    """{column: ledger total - column} of one user's drifted columns."""
+    drift = {}
+    for field, value in values.items():
+        difference = totals.get((user_id, field), 0) - (value or 0)
+        if difference:
+            drift[field] = difference
+    return drift
+
+
+def find_drift(chunk_size: int = 20000) -> Iterator[Tuple[int, str, Dict[str, int]]]:
+    """
+    Users whose XP columns, total_xp included, differ from their ledger totals.
+
+    Users are read chunk_size at a time in id order, and each chunk is compared
+    with one grouped aggregate of the ledger rows in its id range, so memory
+    stays bounded by the chunk whatever the number of users.
+
+    Yields:
+        (user id, username, {column: ledger total - column}) for every
+        drifted user, with only the drifted columns
+    """
+    last_id = 0
+    while True:
+        users = list(
+            Cap_Ace_User.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'username', *LEDGER_FIELDS)[:chunk_size]
+        )
+        if not users:
+            return
+        totals = ledger_totals(user_id__gte=users[0][0], user_id__lte=users[-1][0])
+        for user_id, username, *values in users:
+            drift = _column_drift(user_id, dict(zip(LEDGER_FIELDS, values)), totals)
+            if drift:
+                yield user_id, username, drift
+        last_id = users[-1][0]
+
+
+def apply_drift(user_ids: Iterable[int], batch_size: int = 5000) -> int:
+    """
+    Put the XP columns of the given users (those find_drift() reported),
+    total_xp included, back in line with the ledger.
+
+    Users are corrected in chunks of batch_size, each in its own transaction:
+    the chunk's user rows are locked (in id order), their ledger totals summed
+    again and the differences added to the stored values. Awards take the
+    same lock, so XP awarded since find_drift() measured the drift is counted
+    on both sides and kept. Users needing the same difference in the same
+    column are corrected together with one ``UPDATE ... WHERE id IN (...)``:
+    XP is paid in a few fixed amounts, so drift falls into few such groups,
+    and the statements stay cheap to build where a per-row CASE (bulk_update)
+    is not.
+
+    Returns:
+        Number of users corrected
+    """
+    user_ids = sorted(set(user_ids))
+    corrected = 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            columns = {
+                user_id: dict(zip(LEDGER_FIELDS, values))
+                for user_id, *values in Cap_Ace_User.objects.select_for_update()
+                .filter(pk__in=chunk).order_by('pk').values_list('id', *LEDGER_FIELDS)
+            }
+            totals = ledger_totals(user_id__in=chunk)
+
+            groups: Dict[Tuple[str, int], List[int]] = {}
+            for user_id, values in columns.items():
+                drift = _column_drift(user_id, values, totals)
+                for field, difference in drift.items():
+                    groups.setdefault((field, difference), []).append(user_id)
+                corrected += bool(drift)
+            for (field, difference), ids in groups.items():
+                Cap_Ace_User.objects.filter(pk__in=ids).update(**{field: F(field) + difference})
+    return corrected
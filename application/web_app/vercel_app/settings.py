@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 from pathlib import Path
 import os
 import sys
+import tempfile
 from decouple import config
 
 
@@ -60,10 +61,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "cap_ace_web.middleware.ServerTimingMiddleware",
+    "cap_ace_web.middleware.SlowQueryMiddleware",
+    "cap_ace_web.middleware.AttemptFlushMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cap_ace_web.routers.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -95,14 +100,22 @@ WSGI_APPLICATION = "vercel_app.wsgi.app"
 # environments like Vercel. You can use a database over HTTP, hosted elsewhere.
 
 
+# Drops answer attempts tests leave buffered before the test databases go away
+TEST_RUNNER = "cap_ace_web.runner.TestRunner"
+
 # Local DB for testing, local DB does not work for Vercel
 # Serverless SQL DBs are recommended 
 # Djongo with mongoDB is not recommended, it requires a Django downgrade which causing issues
 # Current setup uses .env file in /web_app/ for database configuration
 if "test" in sys.argv:
     DATABASES = {
-        "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": "mydatabase"}
+        "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": "mydatabase"},
+        # Second SQLite database standing in for the read replica, only used by
+        # tests that enable ReplicaRouter
+        "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": "mydatabase_replica"},
     }
+    # Covering indexes' INCLUDE columns are for PostgreSQL; SQLite builds the indexes without them
+    SILENCED_SYSTEM_CHECKS = ["models.W040"]
 else:
     DATABASES = {
         "default": {
@@ -114,9 +127,134 @@ else:
             "OPTIONS": {
                 "sslmode": "require"  # Neon requires SSL connections
             },
+            # Serverless connection management
+            # Warm function instances reuse their connection across invocations
+            # instead of paying a TCP+TLS+auth handshake per request, and check
+            # it is still alive before reusing it (the server may have dropped
+            # it while the instance was frozen).
+            "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+            "CONN_HEALTH_CHECKS": True,
+            # Transaction-mode poolers (e.g. Neon's -pooler host) may run each
+            # transaction on a different server connection, so server-side
+            # cursors can't be used. To avoid per-session SET TIME ZONE, give
+            # the role a UTC default: ALTER ROLE <user> SET timezone TO 'UTC'.
+            "DISABLE_SERVER_SIDE_CURSORS": config("DB_TRANSACTION_POOLER", default=True, cast=bool),
         }
     }
 
+# Read replica (off unless DB_REPLICA_HOST is set)
+# Question content is read from the replica, writes and user progress stay on
+# the primary. A session that wrote is kept on the primary for
+# REPLICA_STICKY_SECONDS so it never reads its own changes back stale.
+DB_REPLICA_HOST = config("DB_REPLICA_HOST", default="")
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=float)
+if DB_REPLICA_HOST and "test" not in sys.argv:
+    DATABASES["replica"] = {**DATABASES["default"], "HOST": DB_REPLICA_HOST}
+    DATABASE_ROUTERS = ["cap_ace_web.routers.ReplicaRouter"]
+
+# Open the database connection when a function instance starts (wsgi.py)
+# rather than in its first request. Only useful with DB_CONN_MAX_AGE > 0.
+DB_PREWARM = config("DB_PREWARM", default=True, cast=bool)
+
+# Emulated database latency (off unless set)
+# Wraps the database backend so every query, commit and new connection pays
+# a round trip like the remote serverless Postgres does, e.g.
+#   DB_LATENCY_QUERY_MS=3 DB_LATENCY_CONNECT_MS=40 python manage.py test
+DB_LATENCY_QUERY_MS = config("DB_LATENCY_QUERY_MS", default=0, cast=float)
+DB_LATENCY_CONNECT_MS = config("DB_LATENCY_CONNECT_MS", default=0, cast=float)
+DB_LATENCY_JITTER_MS = config("DB_LATENCY_JITTER_MS", default=0, cast=float)
+if DB_LATENCY_QUERY_MS or DB_LATENCY_CONNECT_MS:
+    for database in DATABASES.values():
+        database["WRAPPED_ENGINE"] = database["ENGINE"]
+        database["ENGINE"] = "cap_ace_web.db_backends.latency"
+        database["LATENCY"] = {
+            "QUERY_MS": DB_LATENCY_QUERY_MS,
+            "CONNECT_MS": DB_LATENCY_CONNECT_MS,
+            "JITTER_MS": DB_LATENCY_JITTER_MS,
+        }
+
+# Slow query log
+# Queries slower than the threshold are logged with their view, redacted
+# parameters and an EXPLAIN plan (first occurrence per SQL fingerprint).
+# Serverless functions can only write to the temp directory.
+# Set SLOW_QUERY_THRESHOLD_MS to an empty value to turn the log off.
+SLOW_QUERY_THRESHOLD_MS = config(
+    "SLOW_QUERY_THRESHOLD_MS", default="100", cast=lambda value: float(value) if value else None
+)
+SLOW_QUERY_LOG_FILE = config(
+    "SLOW_QUERY_LOG_FILE", default=os.path.join(tempfile.gettempdir(), "cap_ace_slow_queries.log")
+)
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 3
+
+# Caching
+# cap_ace_web/cache.py keeps a small LRU in each process in front of the
+# shared cache below. CACHE_BACKEND is "locmem" (default, per process),
+# "file" (CACHE_LOCATION is a directory shared by processes on one machine)
+# or "redis" (CACHE_LOCATION is a redis:// URL, needs the redis package).
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem")
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": config(
+            "CACHE_LOCATION",
+            default=os.path.join(tempfile.gettempdir(), "cap_ace_cache") if CACHE_BACKEND == "file" else "",
+        ),
+    }
+}
+CACHE_DEFAULT_TIMEOUT = config("CACHE_DEFAULT_TIMEOUT", default=300, cast=int)
+# Entries kept in the in-process LRU, and how long they (and namespace
+# versions) may be served before checking the shared cache again
+LOCAL_CACHE_MAX_ENTRIES = config("LOCAL_CACHE_MAX_ENTRIES", default=1000, cast=int)
+LOCAL_CACHE_TTL = config("LOCAL_CACHE_TTL", default=5, cast=float)
+# How long other processes wait for a value being computed elsewhere
+CACHE_LOCK_TIMEOUT = 10
+
+# Content snapshot (off unless CONTENT_SNAPSHOT_PATH is set)
+# `python manage.py compile_content` writes every question into one memory
+# mapped file and the game views read questions from it instead of the
+# database. The file is checked for a new version every
+# CONTENT_SNAPSHOT_CHECK_SECONDS and ignored after a question is edited until
+# it is compiled again. Edits only reach other processes through a shared
+# cache, so the snapshot is only served with CACHE_BACKEND "file" or "redis".
+CONTENT_SNAPSHOT_PATH = config("CONTENT_SNAPSHOT_PATH", default="")
+CONTENT_SNAPSHOT_CHECK_SECONDS = config("CONTENT_SNAPSHOT_CHECK_SECONDS", default=5, cast=float)
+
+# Quiz sessions (quiz_views.py): how long a session token stays valid, in
+# seconds, and the most questions one session may hold
+QUIZ_SESSION_MAX_AGE = config("QUIZ_SESSION_MAX_AGE", default=2 * 60 * 60, cast=int)
+QUIZ_SESSION_MAX_QUESTIONS = 50
+
+# How long the question an MC/FIB answer picks for the next page stays
+# reserved (game_views.py), in seconds
+RESERVED_QUESTION_MAX_AGE = config("RESERVED_QUESTION_MAX_AGE", default=30 * 60, cast=int)
+
+# Answer attempt log (attempts.py): attempts are buffered in process and
+# written with one bulk INSERT once ATTEMPT_BUFFER_SIZE are waiting or the
+# oldest has waited ATTEMPT_BUFFER_SECONDS; answers paying out XP are written
+# with the award. ATTEMPT_FLUSH_EACH_REQUEST writes the buffer at the end of
+# every request instead, for deployments that can't lose what a frozen
+# serverless instance still held. Batches the database can't take are
+# appended to ATTEMPT_SPILL_PATH and written with a later batch.
+ATTEMPT_FLUSH_EACH_REQUEST = config("ATTEMPT_FLUSH_EACH_REQUEST", default=False, cast=bool)
+ATTEMPT_BUFFER_SIZE = config("ATTEMPT_BUFFER_SIZE", default=50, cast=int)
+ATTEMPT_BUFFER_SECONDS = config("ATTEMPT_BUFFER_SECONDS", default=30, cast=float)
+ATTEMPT_SPILL_PATH = config(
+    "ATTEMPT_SPILL_PATH", default=os.path.join(tempfile.gettempdir(), "cap_ace_attempts.jsonl")
+)
+# Per-question statistics (rollups.py) count attempts up to the highest id seen at
+# least this long ago, by when every batch holding a lower id has committed
+ROLLUP_SETTLE_SECONDS = config("ROLLUP_SETTLE_SECONDS", default=60, cast=float)
+
+# Add a Server-Timing header with connection handshake, health check and query time,
+# for staff only unless DEBUG is on: it tells anyone how busy the database is
+SERVER_TIMING = config("SERVER_TIMING", default=False, cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
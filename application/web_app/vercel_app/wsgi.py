@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vercel_app.settings')
 
 app = get_wsgi_application()
+
+# Connect while the function instance initializes, so the first request
+# of a cold start doesn't pay the database handshake
+from django.conf import settings
+
+if settings.DB_PREWARM:
+    from cap_ace_web.db_connections import prewarm_connections
+
+    prewarm_connections()
+
+# Map the content snapshot (if configured) before the first request as well
+from cap_ace_web.content_store import get_store
+
+get_store()